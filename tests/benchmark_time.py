@@ -0,0 +1,212 @@
+"""
+Microbenchmarks of yfc_time hot functions, across the exchanges in tests.
+
+Offline: exchange calendars are seeded into a temporary cache folder
+before timing. Results written as JSON, so compare against a baseline
+in review:
+
+    python -m tests.benchmark_time -o before.json
+    python -m tests.benchmark_time -o after.json --compare before.json
+
+'warm' cases time repeat calls with in-memory caches populated,
+'cold' cases clear in-memory caches before every call (cache folder kept).
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time as _time
+from datetime import datetime, date, time, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import exchange_calendars as xcal
+
+from .context import yfc_cache_manager as yfcm
+from .context import yfc_dat as yfcd
+from .context import yfc_time as yfct
+from .context import yfc_utils as yfcu
+
+import yfinance_cache
+
+
+exchanges = {"NMS": "America/New_York",
+             "ASX": "Australia/Sydney",
+             "NZE": "Pacific/Auckland",
+             "TLV": "Asia/Jerusalem"}
+
+# Same months as market tests
+bench_start = date(2022, 2, 1)
+bench_end = date(2022, 3, 1)
+n_batch = 1000
+
+
+def _clear_memory_caches():
+    yfct.ClearScheduleCaches()
+    yfct.sessionIndexCache.clear()
+
+
+def _seed(exchange):
+    yfct.SetExchangeTzName(exchange, exchanges[exchange])
+    yfct.GetExchangeSessionIndex(exchange, date(2021, 1, 1), date(2023, 12, 31))
+    for interval in [yfcd.Interval.Mins5, yfcd.Interval.Hours1]:
+        for y in [2021, 2022, 2023]:
+            yfct.GetExchangeScheduleIntervals(exchange, interval, date(y, 1, 1), date(y+1, 1, 1))
+
+
+def _cases(exchange):
+    # Yield (name, variant, n_items, func)
+    tz = ZoneInfo(exchanges[exchange])
+    start_dt = datetime.combine(bench_start, time(0), tz)
+    end_dt = datetime.combine(bench_end, time(0), tz)
+    h1 = yfcd.Interval.Hours1
+    d1 = yfcd.Interval.Days1
+
+    rng = np.random.default_rng(0)
+    intervals_1h = yfct.GetExchangeScheduleIntervals(exchange, h1, start_dt, end_dt)
+    intervals_1d = yfct.GetExchangeScheduleIntervals(exchange, d1, bench_start, bench_end)
+    idx = np.sort(rng.integers(0, len(intervals_1h), n_batch))
+    offsets = pd.to_timedelta(rng.integers(0, 3600, n_batch), unit='s')
+    ts = np.array((intervals_1h.left[idx] + offsets).to_pydatetime())
+    starts_1h = np.array(intervals_1h.left[idx].to_pydatetime())
+    starts_1d = np.array(intervals_1d.left)
+    ts1 = ts[n_batch//2]
+    fetch_dts = starts_1h + timedelta(minutes=5)
+    repaired = np.full(n_batch, False)
+    dt_now = end_dt + timedelta(days=2)
+    max_age = timedelta(hours=4)
+    f_known = rng.random(len(intervals_1h)) < 0.9
+    known_1h = list(intervals_1h.left[f_known].to_pydatetime())
+    sched = yfct.GetExchangeSchedule(exchange, date(2020, 1, 1), date(2023, 1, 1))
+
+    yield "GetExchangeSchedule", "warm", 1, lambda: yfct.GetExchangeSchedule(exchange, bench_start, bench_end)
+    yield "GetExchangeSchedule", "cold", 1, lambda: (_clear_memory_caches(), yfct.GetExchangeSchedule(exchange, bench_start, bench_end))
+    yield "GetExchangeScheduleIntervals-1h", "warm", 1, lambda: yfct.GetExchangeScheduleIntervals(exchange, h1, start_dt, end_dt)
+    yield "GetExchangeScheduleIntervals-1h", "cold", 1, lambda: (_clear_memory_caches(), yfct.GetExchangeScheduleIntervals(exchange, h1, start_dt, end_dt))
+    yield "GetExchangeScheduleIntervals-5m", "cold", 1, lambda: (_clear_memory_caches(), yfct.GetExchangeScheduleIntervals(exchange, yfcd.Interval.Mins5, start_dt, end_dt))
+    yield "GetExchangeScheduleIntervals-1d", "warm", 1, lambda: yfct.GetExchangeScheduleIntervals(exchange, d1, bench_start, bench_end)
+    yield "GetTimestampCurrentInterval-1h", "warm", 1, lambda: yfct.GetTimestampCurrentInterval(exchange, ts1, h1)
+    yield "GetTimestampCurrentInterval-1d", "warm", 1, lambda: yfct.GetTimestampCurrentInterval(exchange, ts1, d1)
+    yield "GetTimestampCurrentInterval_batch-1h", "warm", n_batch, lambda: yfct.GetTimestampCurrentInterval_batch(exchange, ts, h1)
+    yield "GetTimestampNextInterval-1h", "warm", 1, lambda: yfct.GetTimestampNextInterval(exchange, ts1, h1)
+    yield "GetTimestampNextInterval_batch-1h", "warm", n_batch, lambda: yfct.GetTimestampNextInterval_batch(exchange, ts, h1)
+    yield "CalcIntervalLastDataDt-1h", "warm", 1, lambda: yfct.CalcIntervalLastDataDt(exchange, starts_1h[0], h1)
+    yield "CalcIntervalLastDataDt_batch-1h", "warm", n_batch, lambda: yfct.CalcIntervalLastDataDt_batch(exchange, starts_1h, h1)
+    yield "CalcIntervalLastDataDt_batch-1d", "warm", len(starts_1d), lambda: yfct.CalcIntervalLastDataDt_batch(exchange, starts_1d, d1)
+    yield "IsPriceDatapointExpired-1h", "warm", 1, lambda: yfct.IsPriceDatapointExpired(starts_1h[0], fetch_dts[0], False, max_age, exchange, h1, dt_now=dt_now)
+    yield "IsPriceDatapointExpired_batch-1h", "warm", n_batch, lambda: yfct.IsPriceDatapointExpired_batch(starts_1h, fetch_dts, repaired, max_age, exchange, h1, dt_now=dt_now)
+    yield "IdentifyMissingIntervalRanges-1h", "warm", len(intervals_1h), lambda: yfct.IdentifyMissingIntervalRanges(exchange, start_dt, end_dt, h1, known_1h)
+    yield "ChunkDatesIntoYfFetches", "warm", len(sched), lambda: yfcu.ChunkDatesIntoYfFetches(sched, 60, 2)
+
+
+def _time_func(func, repeat, min_time):
+    # Like timeit.autorange(): find loop count so each repeat takes >= min_time
+    func()
+    n = 1
+    while True:
+        t0 = _time.perf_counter()
+        for _ in range(n):
+            func()
+        t = _time.perf_counter() - t0
+        if t >= min_time:
+            break
+        n *= 2 if t == 0 else max(2, int(min_time / t * 1.2))
+    timings = [t / n]
+    for _ in range(repeat-1):
+        t0 = _time.perf_counter()
+        for _ in range(n):
+            func()
+        timings.append((_time.perf_counter() - t0) / n)
+    return n, timings
+
+
+def run(exchange_list, name_filter=None, repeat=5, min_time=0.1, quiet=False):
+    results = []
+    for exchange in exchange_list:
+        _seed(exchange)
+        for name, variant, n_items, func in _cases(exchange):
+            if name_filter is not None and name_filter not in name:
+                continue
+            loops, timings = _time_func(func, repeat, min_time)
+            r = {"name": name, "variant": variant, "exchange": exchange,
+                 "n_items": n_items, "loops": loops,
+                 "min_us": min(timings)*1e6, "median_us": float(np.median(timings))*1e6}
+            results.append(r)
+            if not quiet:
+                print(f"{exchange:4} {name:38} {variant:5} {r['median_us']:12.1f}us")
+    return results
+
+
+def _result_key(r):
+    return (r["name"], r["variant"], r["exchange"])
+
+
+def compare(results, baseline, tolerance):
+    # Return list of regressions, median slower than baseline by > tolerance
+    base = {_result_key(r): r for r in baseline["results"]}
+    regressions = []
+    print("")
+    print(f"{'':4} {'':38} {'':5} {'baseline':>12} {'new':>12} {'ratio':>7}")
+    for r in results:
+        b = base.get(_result_key(r))
+        if b is None:
+            continue
+        ratio = r["median_us"] / b["median_us"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = " SLOWER"
+            regressions.append((r, b, ratio))
+        print(f"{r['exchange']:4} {r['name']:38} {r['variant']:5} {b['median_us']:10.1f}us {r['median_us']:10.1f}us {ratio:7.2f}{flag}")
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark yfc_time functions")
+    parser.add_argument("-o", "--output", help="write results JSON to this file")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline, default 0.25")
+    parser.add_argument("--exchanges", nargs="+", default=list(exchanges.keys()), choices=list(exchanges.keys()))
+    parser.add_argument("-k", "--filter", help="only run benchmarks with name containing this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per repeat")
+    args = parser.parse_args(args)
+
+    tempCacheDir = tempfile.TemporaryDirectory()
+    yfcm.SetCacheDirpath(tempCacheDir.name)
+    yfcm._option_manager.session.offline = True
+    _clear_memory_caches()
+    try:
+        results = run(args.exchanges, args.filter, args.repeat, args.min_time)
+    finally:
+        yfcm._option_manager.session.offline = False
+        _clear_memory_caches()
+        yfcm.ResetCacheDirpath()
+        tempCacheDir.cleanup()
+
+    out = {"meta": {"yfinance_cache": yfinance_cache.__version__,
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "exchange_calendars": xcal.__version__,
+                    "machine": platform.machine(),
+                    "date": datetime.now().isoformat(timespec="seconds")},
+           "results": results}
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(out, f, indent=1)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print(f"\n{len(regressions)} benchmarks slower than baseline by > {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Benchmark yfc_utils.VerifyPricesDf on synthetic multi-decade tables.
+
+Offline, same JSON output and --compare as benchmark_time:
+
+    python -m tests.benchmark_verify -o before.json
+    python -m tests.benchmark_verify -o after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from .context import yfc_dat as yfcd
+from .context import yfc_utils as yfcu
+from .benchmark_time import _time_func, compare
+
+import yfinance_cache
+
+
+def make_tables(years, interval=yfcd.Interval.Days1, n_diffs=0, seed=0):
+    # Return (cached, Yahoo) tables as VerifyPricesDf receives them,
+    # with dividends and a split. 'n_diffs' rows get price/volume/dividend diffs.
+    rng = np.random.default_rng(seed)
+    tz = ZoneInfo("America/New_York")
+    freq = "W-MON" if interval == yfcd.Interval.Week else "B"
+    idx = pd.date_range(end="2024-12-31", periods=int(years*(52 if freq == "W-MON" else 252)), freq=freq, tz=tz)
+    n = len(idx)
+
+    close = 50.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    openp = close * (1 + rng.normal(0, 0.005, n))
+    high = np.maximum(openp, close) * 1.01
+    low = np.minimum(openp, close) * 0.99
+    volume = rng.integers(1e5, 1e7, n)
+    divs = np.zeros(n)
+    divs[np.arange(n//8, n, n//(years*4))] = 0.25
+    splits = np.zeros(n)
+    splits[n//2] = 2.0
+    # Div-adjustment factor, cumulative back from latest
+    f_div = divs != 0
+    adj = np.ones(n)
+    adj[f_div] = 1.0 - divs[f_div] / close[f_div]
+    cdf = np.cumprod(adj[::-1])[::-1]
+    cdf = np.append(cdf[1:], 1.0)
+
+    df_yf = pd.DataFrame({"Open": openp, "High": high, "Low": low, "Close": close,
+                          "Volume": volume, "Dividends": divs, "Stock Splits": splits,
+                          "Repaired?": False}, index=idx)
+    if interval == yfcd.Interval.Week:
+        for c in ["Open", "High", "Low", "Close"]:
+            df_yf["Adj "+c] = df_yf[c].to_numpy() * cdf
+    else:
+        df_yf["Adj Close"] = close * cdf
+
+    fetch_dt = pd.Timestamp("2025-01-02", tz="UTC")
+    h = df_yf[["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits", "Repaired?"]].copy()
+    h["Final?"] = True
+    h["C-Check?"] = True
+    h["FetchDate"] = fetch_dt
+    h["CSF"] = 1.0
+    h["CDF"] = cdf
+    h["LastDivAdjustDt"] = fetch_dt
+    h["LastSplitAdjustDt"] = fetch_dt
+
+    if n_diffs > 0:
+        rows = rng.choice(n, n_diffs, replace=False)
+        for i, r in enumerate(rows):
+            c = ["Close", "Volume", "Dividends", "Open"][i % 4]
+            if c == "Volume":
+                h.iloc[r, h.columns.get_loc(c)] = int(h[c].iloc[r] * 1.5)
+            elif c == "Dividends":
+                h.iloc[r, h.columns.get_loc(c)] = 0.1
+            else:
+                h.iloc[r, h.columns.get_loc(c)] *= 1.01
+    return h, df_yf
+
+
+def _cases(years):
+    d1 = yfcd.Interval.Days1
+    wk = yfcd.Interval.Week
+    h, df_yf = make_tables(years, d1)
+    yield "VerifyPricesDf-1d", "match", len(h), lambda: yfcu.VerifyPricesDf(h, df_yf, d1, quiet=True)
+    h2, df_yf2 = make_tables(years, d1, n_diffs=40)
+    yield "VerifyPricesDf-1d", "diffs", len(h2), lambda: yfcu.VerifyPricesDf(h2, df_yf2, d1, quiet=True)
+    yield "VerifyPricesDf-1d", "exit-first", len(h2), lambda: yfcu.VerifyPricesDf(h2, df_yf2, d1, quiet=True, exit_first_error=True)
+    h3, df_yf3 = make_tables(years, wk)
+    yield "VerifyPricesDf-1wk", "match", len(h3), lambda: yfcu.VerifyPricesDf(h3, df_yf3, wk, quiet=True)
+
+
+def run(years, name_filter=None, repeat=5, min_time=0.1, quiet=False):
+    results = []
+    for name, variant, n_items, func in _cases(years):
+        if name_filter is not None and name_filter not in name:
+            continue
+        loops, timings = _time_func(func, repeat, min_time)
+        r = {"name": name, "variant": variant, "exchange": "-",
+             "n_items": n_items, "loops": loops,
+             "min_us": min(timings)*1e6, "median_us": float(np.median(timings))*1e6}
+        results.append(r)
+        if not quiet:
+            print(f"{name:38} {variant:10} {n_items:6} rows {r['median_us']:12.1f}us")
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark VerifyPricesDf")
+    parser.add_argument("-o", "--output", help="write results JSON to this file")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline, default 0.25")
+    parser.add_argument("--years", type=int, default=30, help="table length, default 30 years")
+    parser.add_argument("-k", "--filter", help="only run benchmarks with name containing this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per repeat")
+    args = parser.parse_args(args)
+
+    results = run(args.years, args.filter, args.repeat, args.min_time)
+
+    out = {"meta": {"yfinance_cache": yfinance_cache.__version__,
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "machine": platform.machine(),
+                    "years": args.years,
+                    "date": datetime.now().isoformat(timespec="seconds")},
+           "results": results}
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(out, f, indent=1)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print(f"\n{len(regressions)} benchmarks slower than baseline by > {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
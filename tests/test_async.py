@@ -0,0 +1,115 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+from zoneinfo import ZoneInfo
+
+from .context import yfc_cache_manager as yfcm
+from .context import yfc_dat as yfcd
+from .context import yfc_time as yfct
+from .context import yfc_utils as yfcu
+from .context import yfc_history_store as yfhs
+from .context import yfc_prices_manager as yfcp
+from .context import yfc_async, yfc_multi, yfc_ticker
+from .utils import make_cached_1d_prices
+
+
+class Test_Yfc_Async(unittest.TestCase):
+
+    def setUp(self):
+        self.tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(self.tempCacheDir.name)
+
+    def tearDown(self):
+        self.tempCacheDir.cleanup()
+
+    def test_cache_only(self):
+        yfcu.CheckFetchAllowed("INTC", "info")
+        with yfcu.CacheOnly():
+            with self.assertRaises(yfcd.CacheMissException):
+                yfcu.CheckFetchAllowed("INTC", "info")
+            # Nothing cached so Ticker must fetch info
+            with self.assertRaises(yfcd.CacheMissException):
+                yfc_ticker.Ticker("INTC")
+        yfcu.CheckFetchAllowed("INTC", "info")
+
+    def test_adownload(self):
+        # Tickers starting 'F' are not in cache
+        lock = threading.Lock()
+        n_fetching = [0, 0]  # now, max
+        fetched = []
+
+        def _download_one(ticker, **kwargs):
+            try:
+                yfcu.CheckFetchAllowed(ticker, "prices")
+            except yfcd.CacheMissException:
+                if ticker.startswith("F"):
+                    raise
+            else:
+                with lock:
+                    n_fetching[0] += 1
+                    n_fetching[1] = max(n_fetching)
+                    fetched.append(ticker)
+                time.sleep(0.05)
+                with lock:
+                    n_fetching[0] -= 1
+            idx = pd.DatetimeIndex(["2024-01-02", "2024-01-03"])
+            return pd.DataFrame({"Close": [1.0, 2.0]}, index=idx)
+
+        tickers = [f"F{i}" for i in range(12)] + [f"C{i}" for i in range(20)]
+        with mock.patch.object(yfc_multi, "download_one", _download_one), \
+             mock.patch.object(yfc_async.yfc_ticker, "Ticker"):
+            df = asyncio.run(yfc_async.adownload(tickers, max_concurrency=3))
+
+        self.assertEqual(sorted(fetched), sorted(t for t in tickers if t.startswith("F")))
+        self.assertLessEqual(n_fetching[1], 3)
+        self.assertEqual(df.shape, (2, len(tickers)))
+        self.assertEqual(set(df["Close"].columns), set(tickers))
+
+    def test_miss_continues(self):
+        # Cache miss doesn't repeat cache work: Ticker created & prices
+        # loaded once, then fetch continues with them
+        ticker, exchange, tz = "TEST", "NMS", "America/New_York"
+        yfct.SetExchangeTzName(exchange, tz)
+        md = {"FetchDate": pd.Timestamp.now(), "LastCheck": pd.Timestamp.now()}
+        yfcm.StoreCacheDatum(ticker, "info", {"exchange": exchange, "exchangeTimezoneName": tz,
+                                              "firstTradeDateEpochUtc": 0}, metadata=md)
+        start_d, end_d = yfct.MapPeriodToDates(exchange, pd.Timedelta("30D"), yfcd.Interval.Days1)
+        df = make_cached_1d_prices(exchange, ZoneInfo(tz), start_d, end_d, pd.Timestamp.now(tz))
+        yfhs.StoreCacheHistory(ticker, "history-1d", df)
+
+        def _get(self, *args, **kwargs):
+            # Sync must fetch
+            yfcu.CheckFetchAllowed(ticker, "prices")
+            return self._sliceAndAdjust(None, None, False, False)
+
+        init, load = yfc_ticker.Ticker.__init__, yfcp.PriceHistory._getCachedPrices
+        with mock.patch.object(yfcp.PriceHistory, "_get", autospec=True, side_effect=_get), \
+             mock.patch.object(yfc_ticker.Ticker, "__init__", autospec=True, side_effect=init) as m_init, \
+             mock.patch.object(yfcp.PriceHistory, "_getCachedPrices", autospec=True, side_effect=load) as m_load:
+            r = asyncio.run(yfc_async.adownload([ticker], period="10d", return_format="dict"))
+            self.assertFalse(r[ticker].empty)
+            self.assertEqual(m_init.call_count, 1)
+            self.assertEqual(m_load.call_count, 1)
+
+            dat = yfc_ticker.Ticker(ticker)
+            m_load.reset_mock()
+            h = asyncio.run(dat.ahistory(period="10d", limiter=asyncio.Semaphore(1)))
+            self.assertFalse(h.empty)
+            self.assertEqual(m_load.call_count, 1)
+
+    def test_adownload_error(self):
+        def _download_one(ticker, **kwargs):
+            raise Exception(f"{ticker} failed")
+
+        with mock.patch.object(yfc_multi, "download_one", _download_one):
+            with self.assertRaises(Exception):
+                asyncio.run(yfc_async.adownload(["A", "B"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
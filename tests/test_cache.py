@@ -3,6 +3,7 @@ import unittest
 from .context import yfc_cache_manager as yfcm
 from .context import yfc_dat as yfcd
 from .context import yfc_utils as yfcu
+from .context import yfc_ticker
 
 import os, shutil, tempfile
 import json, pickle
@@ -13,6 +14,20 @@ from zoneinfo import ZoneInfo
 import pandas as pd
 
 from pprint import pprint
+import multiprocessing
+
+
+def _hold_lock(dp, ticker, seconds, ready):
+    yfcm.SetCacheDirpath(dp)
+    with yfcm.CacheLock(ticker, "balance_sheet"):
+        ready.set()
+        sleep(seconds)
+
+
+def _store_packed(dp, ticker, objName, n):
+    yfcm.SetCacheDirpath(dp)
+    for i in range(n):
+        yfcm.StoreCacheDatum(ticker, objName, i)
 
 class Test_Yfc_Cache(unittest.TestCase):
 
@@ -251,5 +266,221 @@ class Test_Yfc_Cache(unittest.TestCase):
         self.assertEqual(obj, value)
         self.assertEqual(mdc, {key:val2})
 
+    def test_cache_memory(self):
+        df = pd.DataFrame({"a": [1.0, 2.0]})
+        yfcm.StoreCacheDatum(self.ticker, self.objName, df)
+
+        stats0 = yfcm.GetMemCacheStats()
+        df1 = yfcm.ReadCacheDatum(self.ticker, self.objName)
+        stats1 = yfcm.GetMemCacheStats()
+        self.assertEqual(stats1["misses"] - stats0["misses"], 1)
+        df2 = yfcm.ReadCacheDatum(self.ticker, self.objName)
+        stats2 = yfcm.GetMemCacheStats()
+        self.assertEqual(stats2["misses"], stats1["misses"])
+        self.assertGreater(stats2["hits"], stats1["hits"])
+
+        # Returned data shares read-only arrays with cache, so
+        # modifying in-place raises, but replacing columns doesn't modify cache
+        self.assertGreaterEqual(yfcm.GetMemCacheStats()["bytes"], df.memory_usage(index=True, deep=True).sum())
+        with self.assertRaises(ValueError):
+            df1.loc[0, "a"] = 99.0
+        df1["a"] = 99.0
+        df1.index.name = "x"
+        df3 = yfcm.ReadCacheDatum(self.ticker, self.objName)
+        self.assertTrue(df3.equals(df2))
+        self.assertIsNone(df3.index.name)
+        df3 = df3.copy()
+        df3.loc[0, "a"] = 99.0
+
+        # Change file outside cache manager
+        fp = os.path.join(yfcm.GetCacheDirpath(), self.ticker, self.objName+".pkl")
+        with open(fp, 'wb') as f:
+            pickle.dump({"data": pd.DataFrame({"a": [3.0, 4.0, 5.0]})}, f, 4)
+        df4 = yfcm.ReadCacheDatum(self.ticker, self.objName)
+        self.assertEqual(df4.shape[0], 3)
+
+        # Packed membership check uses memory cache too
+        yfcm.StoreCacheDatum(self.ticker, "balance_sheet", 123)
+        self.assertTrue(yfcm.IsDatumCached(self.ticker, "balance_sheet"))
+        stats0 = yfcm.GetMemCacheStats()
+        self.assertFalse(yfcm.IsDatumCached(self.ticker, "cashflow"))
+        self.assertEqual(yfcm.GetMemCacheStats()["hits"] - stats0["hits"], 1)
+
+        # Disable
+        yfcm._option_manager.storage.memory_cache_mb = 0
+        yfcm.ClearMemCache()
+        yfcm.ReadCacheDatum(self.ticker, self.objName)
+        self.assertEqual(yfcm.GetMemCacheStats()["entries"], 0)
+
+    def test_cache_public_writable(self):
+        # Public getters return data user can modify, even if cached read-only
+        yfcm._option_manager.session.offline = True
+        try:
+            tz = "America/New_York"
+            dt_now = pd.Timestamp.now(tz)
+            yfcm.StoreCacheDatum(self.ticker, "info", {"exchange": "NMS", "exchangeTimezoneName": tz,
+                                                       "firstTradeDateEpochUtc": 0},
+                                 metadata={"FetchDate": pd.Timestamp.now(), "LastCheck": pd.Timestamp.now()})
+            df = pd.DataFrame({"a": [1.0, 2.0]})
+            md = {"FetchDate": pd.Timestamp.now(), "LastCheck": pd.Timestamp.now()}
+            yfcm.StoreCacheDatum(self.ticker, "major_holders", df, metadata=md)
+            fin = pd.DataFrame({pd.Timestamp("2023-12-31"): [1.0, 2.0]}, index=["x", "y"])
+            yfcm.StoreCacheDatum(self.ticker, "income_stmt", fin,
+                                 metadata={"FetchDates": {fin.columns[0]: dt_now}, "LastFetch": dt_now})
+            idx = pd.date_range(dt_now.normalize() - pd.Timedelta(days=5), periods=3, freq="D")
+            shares = pd.DataFrame({"Shares": pd.array([100, 100, 100], dtype="Int64")}, index=idx)
+            yfcm.StoreCacheDatum(self.ticker, "shares", shares, metadata={"LastFetch": dt_now})
+            yfcm.StoreCacheDatum(self.ticker, "options", ("2030-01-18",), metadata={"FetchDate": pd.Timestamp.now()})
+            yfcm.StoreCacheDatum(self.ticker, "option_chain", {"2030-01-18": {"calls": df, "puts": df, "underlying": {},
+                                                                              "metadata": {"FetchDate": pd.Timestamp.now()}}})
+
+            for i in range(2):
+                # Twice, second from memory cache
+                dat = yfc_ticker.Ticker(self.ticker)
+                tables = {"major_holders": dat.major_holders,
+                          "income_stmt": dat.income_stmt,
+                          "shares": dat.get_shares(),
+                          "calls": dat.option_chain("2030-01-18").calls,
+                          "puts": dat.option_chain("2030-01-18").puts}
+                for k, t in tables.items():
+                    with self.subTest(i=i, table=k):
+                        t.iloc[0, 0] = 99
+                        t.iloc[:, 0] *= 2
+                self.assertEqual(yfcm.ReadCacheDatum(self.ticker, "major_holders")["a"].iloc[0], 1.0)
+                self.assertEqual(yfcm.ReadCacheDatum(self.ticker, "income_stmt").iloc[0, 0], 1.0)
+                self.assertEqual(yfcm.ReadCacheDatum(self.ticker, "shares")["Shares"].iloc[0], 100)
+                self.assertEqual(dat.major_holders["a"].iloc[0], 1.0)
+                dat.info["exchange"] = "x"
+                self.assertEqual(dat.info["exchange"], "NMS")
+        finally:
+            yfcm._option_manager.session.offline = False
+
+    def test_cache_corrupt(self):
+        df = pd.DataFrame({"a": [1.0, 2.0]})
+        fp = os.path.join(yfcm.GetCacheDirpath(), self.ticker, self.objName+".pkl")
+
+        # Truncated file
+        yfcm.StoreCacheDatum(self.ticker, self.objName, df)
+        # No temporary files left behind
+        self.assertEqual([f for f in os.listdir(os.path.dirname(fp)) if not f.endswith(".lock")], [self.objName+".pkl"])
+        with open(fp, 'rb') as f:
+            b = f.read()
+        with open(fp, 'wb') as f:
+            f.write(b[:len(b)//2])
+        with self.assertLogs(level='WARNING'):
+            self.assertFalse(yfcm.IsDatumCached(self.ticker, self.objName))
+        self.assertFalse(os.path.isfile(fp))
+
+        # Checksum
+        yfcm._option_manager.storage.checksum = True
+        yfcm.StoreCacheDatum(self.ticker, self.objName, df)
+        self.assertTrue(yfcm.ReadCacheDatum(self.ticker, self.objName).equals(df))
+        with open(fp, 'rb') as f:
+            b = bytearray(f.read())
+        b[len(b)//2] ^= 0xFF
+        with open(fp, 'wb') as f:
+            f.write(b)
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(yfcm.ReadCacheDatum(self.ticker, self.objName))
+        self.assertFalse(os.path.isfile(fp))
+
+    def test_cache_metadata_sidecar(self):
+        value = pd.DataFrame({"a": [1.0, 2.0]})
+        yfcm.StoreCacheDatum(self.ticker, self.objName, value, metadata={"k1": 1})
+        fp = os.path.join(yfcm.GetCacheDirpath(), self.ticker, self.objName+".pkl")
+        fp_md = os.path.join(yfcm.GetCacheDirpath(), self.ticker, self.objName+".meta.pkl")
+        self.assertTrue(os.path.isfile(fp_md))
+
+        # Updating metadata doesn't touch data file
+        mtime = os.stat(fp).st_mtime_ns
+        sleep(0.01)
+        yfcm.WriteCacheMetadata(self.ticker, self.objName, "k2", 2)
+        self.assertEqual(os.stat(fp).st_mtime_ns, mtime)
+        self.assertEqual(yfcm.ReadCacheMetadata(self.ticker, self.objName, "k2"), 2)
+        obj, md = yfcm.ReadCacheDatum(self.ticker, self.objName, return_metadata_too=True)
+        self.assertTrue(obj.equals(value))
+        self.assertEqual(md, {"k1": 1, "k2": 2})
+
+        # Deleting datum deletes sidecar
+        yfcm.StoreCacheDatum(self.ticker, self.objName, None)
+        self.assertFalse(os.path.isfile(fp))
+        self.assertFalse(os.path.isfile(fp_md))
+
+    def test_cache_metadata_old_layout(self):
+        # Metadata stored inside data file
+        value = pd.DataFrame({"a": [1.0, 2.0]})
+        fp = os.path.join(yfcm.GetCacheDirpath(), self.ticker, self.objName+".pkl")
+        os.makedirs(os.path.dirname(fp))
+        with open(fp, 'wb') as f:
+            pickle.dump({"data": value, "metadata": {"k1": 1}}, f, 4)
+        self.assertEqual(yfcm.ReadCacheMetadata(self.ticker, self.objName, "k1"), 1)
+
+        yfcm.WriteCacheMetadata(self.ticker, self.objName, "k2", 2)
+        obj, md = yfcm.ReadCacheDatum(self.ticker, self.objName, return_metadata_too=True)
+        self.assertTrue(obj.equals(value))
+        self.assertEqual(md, {"k1": 1, "k2": 2})
+
+        # Packed
+        var1 = "balance_sheet" ; var2 = "cashflow"
+        fp = os.path.join(yfcm.GetCacheDirpath(), self.ticker, "annuals.pkl")
+        with open(fp, 'wb') as f:
+            pickle.dump({var1: {"data": 1, "metadata": {"k1": 1}}, var2: {"data": 2, "metadata": {"k1": 2}}}, f, 4)
+        yfcm.WriteCacheMetadata(self.ticker, var1, "k2", 2)
+        self.assertEqual(yfcm.ReadCacheDatum(self.ticker, var1, True), (1, {"k1": 1, "k2": 2}))
+        self.assertEqual(yfcm.ReadCacheDatum(self.ticker, var2, True), (2, {"k1": 2}))
+
+    @unittest.skipIf(yfcm.fcntl is None, "fcntl not available")
+    def test_cache_lock(self):
+        ctx = multiprocessing.get_context("fork")
+        dp = yfcm.GetCacheDirpath()
+
+        # Re-entrant in same thread, and shared locks don't block
+        with yfcm.CacheLock(self.ticker):
+            with yfcm.CacheLock(self.ticker, exclusive=False):
+                yfcm.StoreCacheDatum(self.ticker, "balance_sheet", 1)
+        self.assertEqual(yfcm.ReadCacheDatum(self.ticker, "balance_sheet"), 1)
+
+        # Can't upgrade, flock() would drop shared lock if upgrade failed
+        with yfcm.CacheLock(self.ticker, exclusive=False):
+            with self.assertRaises(Exception):
+                with yfcm.CacheLock(self.ticker):
+                    pass
+        with yfcm.CacheLock(self.ticker, timeout=0.1):
+            pass
+
+        # Other process holds lock
+        yfcm.ResetLockStats()
+        ready = ctx.Event()
+        p = ctx.Process(target=_hold_lock, args=(dp, self.ticker, 1.0, ready))
+        p.start()
+        ready.wait(10)
+        with self.assertRaises(yfcd.CacheLockTimeoutException):
+            with yfcm.CacheLock(self.ticker, "cashflow", timeout=0.1):
+                pass
+        with yfcm.CacheLock(self.ticker, "major_holders", timeout=0.1):
+            # Different file not blocked
+            pass
+        self.assertEqual(yfcm.ReadCacheDatum(self.ticker, "balance_sheet"), 1)
+        p.join()
+        stats = yfcm.GetLockStats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertGreaterEqual(stats["contended"], 1)
+        self.assertGreater(stats["wait_seconds"], 0.0)
+
+    @unittest.skipIf(yfcm.fcntl is None, "fcntl not available")
+    def test_cache_lock_packed_processes(self):
+        # Processes updating same packed file must not lose each other's updates
+        ctx = multiprocessing.get_context("fork")
+        dp = yfcm.GetCacheDirpath()
+        names = yfcm.packed_data_cats["annuals"]
+        procs = [ctx.Process(target=_store_packed, args=(dp, self.ticker, n, 20)) for n in names]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+        for n in names:
+            self.assertEqual(yfcm.ReadCacheDatum(self.ticker, n), 19)
+
 if __name__ == '__main__':
     unittest.main()
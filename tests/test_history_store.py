@@ -0,0 +1,149 @@
+import unittest
+
+from .context import yfc_cache_manager as yfcm
+from .context import yfc_history_store as yfhs
+
+import os, tempfile
+
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    have_pyarrow = True
+except ModuleNotFoundError:
+    have_pyarrow = False
+
+
+class Test_Yfc_History_Store(unittest.TestCase):
+
+    def setUp(self):
+        self.ticker = "INTC"
+        self.key = "history-1d"
+        self.tz = ZoneInfo("America/New_York")
+
+        self.tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(self.tempCacheDir.name)
+
+    def tearDown(self):
+        self.tempCacheDir.cleanup()
+
+    def _make_df(self, start, n):
+        idx = pd.date_range(start, periods=n, freq='B', tz=self.tz, name='Date')
+        idx.freq = None
+        df = pd.DataFrame(index=idx)
+        df["Close"] = np.arange(n, dtype=float) + 10.0
+        df["Volume"] = np.arange(n, dtype='int64')
+        df["Final?"] = True
+        df["FetchDate"] = pd.Timestamp("2024-06-01 12:00", tz=self.tz).as_unit("ns")
+        return df
+
+    def _check_roundtrip(self, fmt):
+        yfcm._option_manager.storage.history_format = fmt
+        df = self._make_df("2024-01-01", 20)
+        self.assertFalse(yfhs.IsHistoryCached(self.ticker, self.key))
+        yfhs.StoreCacheHistory(self.ticker, self.key, df)
+        self.assertTrue(yfhs.IsHistoryCached(self.ticker, self.key))
+
+        df2 = yfhs.ReadCacheHistory(self.ticker, self.key)
+        pd.testing.assert_frame_equal(df, df2)
+        self.assertIsInstance(df2.index.tz, ZoneInfo)
+        self.assertIsInstance(df2["FetchDate"].dt.tz, ZoneInfo)
+
+        # Read subset
+        start = df.index[5] ; end = df.index[10]
+        df2 = yfhs.ReadCacheHistory(self.ticker, self.key, columns=["Close"], start=start, end=end)
+        pd.testing.assert_frame_equal(df[["Close"]].iloc[5:10], df2)
+
+        # Append
+        df_new = self._make_df(df.index[-1] + pd.Timedelta("1D"), 5)
+        self.assertTrue(yfhs.AppendCacheHistory(self.ticker, self.key, df_new, df.shape[0]))
+        df2 = yfhs.ReadCacheHistory(self.ticker, self.key)
+        pd.testing.assert_frame_equal(pd.concat([df, df_new]), df2)
+
+        # Append rejected if cache not as expected
+        self.assertFalse(yfhs.AppendCacheHistory(self.ticker, self.key, df_new, df.shape[0]))
+
+        yfhs.StoreCacheHistory(self.ticker, self.key, None)
+        self.assertFalse(yfhs.IsHistoryCached(self.ticker, self.key))
+
+    def test_pickle(self):
+        self._check_roundtrip("pickle")
+        fp = os.path.join(self.tempCacheDir.name, self.ticker, self.key+".pkl")
+        self.assertFalse(os.path.isfile(fp))
+
+    def test_segmented(self):
+        self._check_roundtrip("segmented")
+
+    @unittest.skipIf(not have_pyarrow, "pyarrow not installed")
+    def test_parquet(self):
+        self._check_roundtrip("parquet")
+
+    @unittest.skipIf(not have_pyarrow, "pyarrow not installed")
+    def test_feather(self):
+        self._check_roundtrip("feather")
+
+    @unittest.skipIf(not have_pyarrow, "pyarrow not installed")
+    def test_migrate(self):
+        df = self._make_df("2024-01-01", 20)
+        yfcm._option_manager.storage.history_format = "pickle"
+        yfhs.StoreCacheHistory(self.ticker, self.key, df)
+        fp = os.path.join(self.tempCacheDir.name, self.ticker, self.key+".pkl")
+        self.assertTrue(os.path.isfile(fp))
+
+        yfcm._option_manager.storage.history_format = "parquet"
+        self.assertTrue(yfhs.IsHistoryCached(self.ticker, self.key))
+        self.assertFalse(os.path.isfile(fp))
+        df2 = yfhs.ReadCacheHistory(self.ticker, self.key)
+        pd.testing.assert_frame_equal(df, df2)
+
+    def test_segmented_tail(self):
+        yfcm._option_manager.storage.history_format = "segmented"
+        dp = os.path.join(self.tempCacheDir.name, self.ticker, self.key)
+        df = self._make_df("2024-01-01", 20)
+        df.loc[df.index[-1], "Final?"] = False
+        yfhs.StoreCacheHistory(self.ticker, self.key, df)
+        # Non-final row in separate segment
+        self.assertEqual(sorted(os.listdir(dp)), ["manifest.json", "part-00000-19.pkl", "part-00001-1.pkl"])
+
+        # Refresh last row and add new rows. Big segment untouched.
+        df_new = self._make_df(df.index[-1], 4)
+        df_new.loc[df_new.index[-1], "Final?"] = False
+        self.assertTrue(yfhs.ReplaceCacheHistoryTail(self.ticker, self.key, df_new, 19, 20))
+        self.assertEqual(sorted(os.listdir(dp)), ["manifest.json", "part-00000-19.pkl", "part-00002-3.pkl", "part-00003-1.pkl"])
+        df2 = yfhs.ReadCacheHistory(self.ticker, self.key)
+        pd.testing.assert_frame_equal(pd.concat([df.iloc[:19], df_new]), df2)
+
+        # Replace from middle of a segment
+        df_new2 = df2.iloc[10:].copy()
+        df_new2["Close"] = 1.0
+        self.assertTrue(yfhs.ReplaceCacheHistoryTail(self.ticker, self.key, df_new2, 10, 23))
+        df3 = yfhs.ReadCacheHistory(self.ticker, self.key)
+        pd.testing.assert_frame_equal(pd.concat([df2.iloc[:10], df_new2]), df3)
+
+        # Compaction keeps non-final tail separate
+        for i in range(yfhs.segments_compact_threshold):
+            df_new = self._make_df(df3.index[-1] + pd.Timedelta("1D"), 2)
+            df_new.loc[df_new.index[-1], "Final?"] = False
+            self.assertTrue(yfhs.ReplaceCacheHistoryTail(self.ticker, self.key, df_new, df3.shape[0]-1, df3.shape[0]))
+            df3 = pd.concat([df3.iloc[:-1], df_new])
+        self.assertLessEqual(len(os.listdir(dp)), yfhs.segments_compact_threshold+1)
+        pd.testing.assert_frame_equal(df3, yfhs.ReadCacheHistory(self.ticker, self.key))
+        yfhs.CompactCacheHistory(self.ticker, self.key)
+        self.assertEqual(len(os.listdir(dp)), 3)
+        pd.testing.assert_frame_equal(df3, yfhs.ReadCacheHistory(self.ticker, self.key))
+
+    def test_unchanged_rows(self):
+        df = self._make_df("2024-01-01", 20)
+        h1 = yfhs.HashHistoryRows(df)
+        df2 = df.copy()
+        df2.loc[df2.index[12], "Close"] = 0.0
+        h2 = yfhs.HashHistoryRows(df2)
+        self.assertEqual(yfhs.CountUnchangedRows(h1, h1), 20)
+        self.assertEqual(yfhs.CountUnchangedRows(h1, h2), 12)
+        self.assertEqual(yfhs.CountUnchangedRows(h1[:5], h2), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 from pprint import pprint
 
+import pandas as pd
+
 from .context import yfc_dat as yfcd
 from .context import yfc_time as yfct
 
@@ -327,6 +329,30 @@ class TestMissingIntervals_USA(unittest.TestCase):
             pprint(answer)
             raise
 
+    def test_IdentifyMissingIntervalRanges_merging(self):
+        interval = yfcd.Interval.Hours1
+        start_dt = dtc(date(2022, 2, 14), time(9, 30), self.market_tz)
+        end_dt = dtc(date(2022, 2, 19), time(0), self.market_tz)
+        intervals = yfct.GetExchangeScheduleIntervals(self.exchange, interval, start_dt, end_dt)
+        # Missing: 0, 3, 10-11, 20, last
+        f_known = pd.Series(True, index=range(len(intervals)))
+        f_known[[0, 3, 10, 11, 20, len(intervals)-1]] = False
+        known = intervals.left[f_known.to_numpy()]
+
+        ranges = yfct.IdentifyMissingIntervalRanges(self.exchange, start_dt, end_dt, interval, list(known.to_pydatetime()), minDistanceThreshold=0)
+        answer = [(intervals[0].left, intervals[0].right),
+                  (intervals[3].left, intervals[3].right),
+                  (intervals[10].left, intervals[11].right),
+                  (intervals[20].left, intervals[20].right),
+                  (intervals[-1].left, intervals[-1].right)]
+        self.assertEqual(ranges, answer)
+
+        ranges = yfct.IdentifyMissingIntervalRanges(self.exchange, start_dt, end_dt, interval, known, minDistanceThreshold=6)
+        answer = [(intervals[0].left, intervals[11].right),
+                  (intervals[20].left, intervals[20].right),
+                  (intervals[-1].left, intervals[-1].right)]
+        self.assertEqual(ranges, answer)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+from unittest import mock
+import tempfile
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from .context import yfc_cache_manager as yfcm
+from .context import yfc_dat as yfcd
+from .context import yfc_time as yfct
+from .context import yfc_history_store as yfhs
+from .context import yfc_prices_manager as yfcp
+from .context import yfc_multi
+from .utils import make_cached_1d_prices
+
+
+class Test_Multi_Batch(unittest.TestCase):
+
+    def setUp(self):
+        self.tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(self.tempCacheDir.name)
+
+        self.tickers = ["AAA", "BBB"]
+        self.exchange = "NMS"
+        self.tz_name = "America/New_York"
+        self.tz = ZoneInfo(self.tz_name)
+        yfct.SetExchangeTzName(self.exchange, self.tz_name)
+
+        # Cached tables of last month, missing last 3 sessions
+        start_d, end_d = yfct.MapPeriodToDates(self.exchange, pd.Timedelta("30D"), yfcd.Interval.Days1)
+        df = make_cached_1d_prices(self.exchange, self.tz, start_d, end_d + timedelta(days=1), pd.Timestamp.now(self.tz))
+        self.idx = df.index
+        df = df.iloc[:-3]
+        for tkr in self.tickers:
+            yfhs.StoreCacheHistory(tkr, "history-1d", df)
+            yfcm.StoreCacheDatum(tkr, "info", {"exchange": self.exchange, "exchangeTimezoneName": self.tz_name,
+                                               "firstTradeDateEpochUtc": int(self.idx[0].timestamp())},
+                                 metadata={"FetchDate": pd.Timestamp.now(), "LastCheck": pd.Timestamp.now()})
+            yfcm.StoreCacheDatum(tkr, "history_metadata", {"currency": "GBP", "yf_currency": "GBp",
+                                                            "listingDate": self.idx[0].date()})
+
+    def tearDown(self):
+        for tkr in self.tickers:
+            yfcp.ClearPrefetchedPrices(tkr, yfcd.Interval.Days1)
+        self.tempCacheDir.cleanup()
+
+    def _no_reconstruct(self):
+        # Repair can't reconstruct NaN row from finer data
+        return mock.patch.object(yfcp.PriceHistory, "_reconstruct_intervals_batch", autospec=True,
+                                 side_effect=lambda self, df, tag=-1: df)
+
+    def _yf_download(self, tickers, start, end, **kwargs):
+        idx = self.idx[(self.idx.date >= start) & (self.idx.date < end)]
+        cols = ["Open", "High", "Low", "Close", "Adj Close", "Volume", "Dividends", "Stock Splits", "Repaired?"]
+        dfs = {}
+        for tkr in tickers:
+            dfs[tkr] = pd.DataFrame(index=idx, data={c: 1000.0 for c in cols})
+            dfs[tkr][["Dividends", "Stock Splits"]] = 0.0
+            dfs[tkr]["Repaired?"] = False
+        # AAA has genuine NaN row, yfinance returns it with keepna
+        dfs["AAA"].loc[self.idx[-2], [c for c in cols if c != "Repaired?"]] = float("nan")
+        # BBB missing first day, so download aligns with NaN row
+        dfs["BBB"] = dfs["BBB"].iloc[1:]
+        return pd.concat(dfs, axis=1)
+
+    def test_prefetch_grouped(self):
+        with mock.patch.object(yfc_multi.yf, "download", side_effect=self._yf_download) as m:
+            prefetched = yfc_multi._prefetch_prices(self.tickers, "1d", None, None, None)
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(sorted(m.call_args.args[0]), self.tickers)
+        self.assertEqual(sorted(prefetched.keys()), self.tickers)
+
+        start_d, end_d, df, yf_currency = prefetched["AAA"]
+        self.assertEqual(yf_currency, "GBp")
+        self.assertLess(start_d, self.idx[-3].date())
+        self.assertGreater(end_d, self.idx[-1].date())
+        # Only rows added by alignment removed, not genuine NaN row
+        self.assertEqual(df["Close"].isna().sum(), 1)
+        self.assertTrue(pd.isna(df.loc[self.idx[-2], "Close"]))
+        self.assertFalse(prefetched["BBB"][2]["Close"].isna().any())
+        self.assertEqual(prefetched["BBB"][2].shape[0], df.shape[0]-1)
+        self.assertEqual(str(df.index.tz), self.tz_name)
+
+        # Up-to-date tickers not fetched
+        with mock.patch.object(yfc_multi, "_find_missing_range", return_value=None):
+            with mock.patch.object(yfc_multi.yf, "download") as m:
+                self.assertEqual(yfc_multi._prefetch_prices(self.tickers, "1d", None, None, None), {})
+                m.assert_not_called()
+
+    def test_fetch_uses_prefetch(self):
+        manager = yfcp.HistoriesManager("AAA", self.exchange, self.tz_name, None, None)
+        hist = manager.GetHistory(yfcd.Interval.Days1)
+        start = self.idx[-4].date()
+        end = self.idx[-1].date() + timedelta(days=1)
+
+        # Without prefetch, fetch from Yahoo
+        with mock.patch.object(hist.dat, "history", side_effect=AssertionError("fetched from Yahoo")):
+            with self.assertRaises(AssertionError):
+                hist.get(start, end)
+
+        with mock.patch.object(yfc_multi.yf, "download", side_effect=self._yf_download):
+            prefetched = yfc_multi._prefetch_prices(self.tickers, "1d", None, None, None)
+        yfcp.SetPrefetchedPrices("AAA", yfcd.Interval.Days1, *prefetched["AAA"])
+        with mock.patch.object(hist.dat, "history", side_effect=AssertionError("fetched from Yahoo")), \
+             self._no_reconstruct():
+            df = hist.get(start, end)
+        self.assertEqual(df.index[0].date(), start)
+        self.assertEqual(df.index[-1].date(), self.idx[-1].date())
+        # Scaled from GBp
+        self.assertTrue((df["Close"].iloc[1:].dropna() == 10.0).all())
+
+    def test_download_keepna(self):
+        # Genuine NaN row survives batching, only rows added aligning tickers are dropped
+        start = self.idx[-4].date()
+        dt_nan = self.idx[-2].tz_localize(None)
+        with mock.patch.object(yfc_multi.yf, "download", side_effect=self._yf_download), \
+             mock.patch.object(yfcp.yf.Ticker, "history", side_effect=AssertionError("fetched from Yahoo")), \
+             self._no_reconstruct():
+            dfs = yfc_multi.download(self.tickers, threads=False, progress=False, start=start,
+                                     keepna=True, return_format='dict')
+            df = dfs["AAA"]
+            self.assertEqual(df.index[-1].date(), self.idx[-1].date())
+            self.assertTrue(df.loc[dt_nan, ["Open", "High", "Low", "Close"]].isna().all())
+            self.assertEqual(dfs["BBB"].shape[0], df.shape[0])
+            self.assertFalse(dfs["BBB"]["Close"].isna().any())
+
+            df = yfc_multi.download(self.tickers, threads=False, progress=False, start=start,
+                                    keepna=False, return_format='dict')["AAA"]
+            self.assertNotIn(dt_nan, df.index)
+            self.assertEqual(df.index[-1].date(), self.idx[-1].date())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from .context import yfc_multi
+
+
+class Test_Multi_Combine(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.tickers = ["BBB", "AAA", "CCC"]
+        self.dfs = {}
+        for i, tkr in enumerate(self.tickers):
+            tz = "Europe/London" if tkr == "CCC" else "America/New_York"
+            idx = pd.date_range("2022-01-03", periods=20, freq="B", tz=tz)
+            idx = idx[rng.random(20) < 0.8]
+            n = len(idx)
+            df = pd.DataFrame(index=idx, data={"Open": rng.random(n), "Close": rng.random(n),
+                                               "Volume": rng.integers(0, 1000, n),
+                                               "Repaired?": np.zeros(n, dtype=bool),
+                                               "FetchDate": pd.Timestamp.now(tz)})
+            if i == 0:
+                df["Capital Gains"] = 0.0
+            self.dfs[tkr] = df
+
+    def _dfs(self):
+        return {tkr: df.copy() for tkr, df in self.dfs.items()}
+
+    def _expected(self, ignore_tz, group_by):
+        # Align with pandas reindex & concat
+        dfs = self._dfs()
+        yfc_multi._align_tz(dfs, ignore_tz)
+        idx = dfs[self.tickers[0]].index
+        for df in dfs.values():
+            idx = idx.union(df.index)
+        dfs = {tkr: df.reindex(idx) for tkr, df in dfs.items()}
+        data = pd.concat(dfs.values(), axis=1, keys=dfs.keys())
+        if group_by == 'column':
+            data.columns = data.columns.swaplevel(0, 1)
+            data = data.sort_index(level=0, axis=1)
+        return data
+
+    def test_wide(self):
+        for ignore_tz in [True, False]:
+            for group_by in ['column', 'ticker']:
+                with self.subTest(ignore_tz=ignore_tz, group_by=group_by):
+                    data = yfc_multi._combine_dfs(self._dfs(), self.tickers, ignore_tz, group_by)
+                    pd.testing.assert_frame_equal(data, self._expected(ignore_tz, group_by), check_freq=False)
+
+    def test_long_and_dict(self):
+        data = yfc_multi._combine_dfs(self._dfs(), self.tickers, True, 'column', 'dict')
+        self.assertEqual(list(data.keys()), self.tickers)
+        self.assertIsNone(data["AAA"].index.tz)
+
+        data = yfc_multi._combine_dfs(self._dfs(), self.tickers, False, 'column', 'long')
+        self.assertEqual(data.index.names[0], 'Ticker')
+        self.assertEqual(data.shape[0], sum(df.shape[0] for df in self.dfs.values()))
+        self.assertEqual(str(data.loc["CCC"].index.tz), "America/New_York")
+        pd.testing.assert_series_equal(data.loc["AAA", "Close"], self.dfs["AAA"]["Close"], check_names=False)
+
+        with self.assertRaises(ValueError):
+            yfc_multi.download(self.tickers, return_format='xyz')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,17 @@
 import multiprocessing
 import unittest
+from unittest import mock
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
 
 from yfinance_cache import yfc_dat
 from yfinance_cache import yfc_multi
+from yfinance_cache import yfc_cache_manager as yfcm
+from yfinance_cache import yfc_prices_manager as yfcp
+from yfinance_cache import yfc_time as yfct
 
 
 def _check_worker_locks(_):
@@ -12,6 +21,15 @@ def _check_worker_locks(_):
         return yfc_multi._progress_queue is not None
 
 
+def _check_worker_sessions(dp):
+    yfcm.SetCacheDirpath(dp)
+    with mock.patch.object(yfct, "GetCalendarViaCache", side_effect=Exception("worker loaded calendar")):
+        sched = yfct.GetExchangeSchedule("NMS", date(2024, 1, 2), date(2024, 2, 1))
+        yfct.GetExchangeScheduleIntervals("NMS", yfc_dat.Interval.Days1, date(2024, 1, 2), date(2024, 2, 1))
+        yfct.CalcIntervalLastDataDt("NMS", date(2024, 1, 3), yfc_dat.Interval.Days1)
+    return len(sched), isinstance(yfct.sessionIndexCache["NMS"].array, np.memmap)
+
+
 class TestMultiprocessingLocks(unittest.TestCase):
     def test_normal_exchange_lock_does_not_start_a_process(self):
         before = {p.pid for p in multiprocessing.active_children()}
@@ -43,5 +61,61 @@ class TestMultiprocessingLocks(unittest.TestCase):
                     queue.join_thread()
 
 
+class TestSharedSessions(unittest.TestCase):
+    def setUp(self):
+        self.tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(self.tempCacheDir.name)
+
+    def tearDown(self):
+        self.tempCacheDir.cleanup()
+
+    def test_workers_map_parent_sessions(self):
+        yfct.SetExchangeTzName("NMS", "America/New_York")
+        yfct.PrepareSharedSessionIndexes(start_d=date(2024, 1, 2))
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(1) as pool:
+            result = pool.map(_check_worker_sessions, [self.tempCacheDir.name])
+        self.assertEqual(result, [(21, True)])
+
+    def test_sessions_start_from_listing(self):
+        for tkr, listed in [("AAA", date(2015, 3, 2)), ("BBB", date(2019, 6, 3))]:
+            yfcm.StoreCacheDatum(tkr, "info", {"exchange": "NMS"})
+            yfcm.StoreCacheDatum(tkr, "history_metadata", {"listingDate": listed})
+        self.assertEqual(yfc_multi._sessions_start(["AAA", "BBB", "CCC"], None), {"NMS": date(2015, 3, 2)})
+        self.assertEqual(yfc_multi._sessions_start(["AAA", "BBB"], "2020-01-02"), {"NMS": date(2020, 1, 2)})
+
+
+class TestThreads(unittest.TestCase):
+    def setUp(self):
+        self.tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(self.tempCacheDir.name)
+
+    def tearDown(self):
+        self.tempCacheDir.cleanup()
+
+    def test_download_rejects_bad_executor(self):
+        with self.assertRaises(ValueError):
+            yfc_multi.download("INTC", executor="fibers")
+
+    def test_histories_manager_one_history_per_key(self):
+        manager = yfcp.HistoriesManager("INTC", "NMS", "America/New_York", None, None)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            histories = list(pool.map(lambda _: manager.GetHistory("Events"), range(32)))
+        self.assertTrue(all(h is histories[0] for h in histories))
+
+    def test_packed_datum_threads(self):
+        # Threads updating same packed file must not lose each other's updates
+        names = yfcm.packed_data_cats["annuals"]
+
+        def _store(objName):
+            for i in range(20):
+                yfcm.StoreCacheDatum("INTC", objName, i)
+
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            list(pool.map(_store, names))
+        for n in names:
+            self.assertEqual(yfcm.ReadCacheDatum("INTC", n), 19)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -3,6 +3,7 @@ import unittest
 from .context import yfc_dat as yfcd
 from .context import yfc_time as yfct
 
+import numpy as np
 from datetime import datetime, date, time, timedelta
 from zoneinfo import ZoneInfo
 
@@ -388,5 +389,47 @@ class Test_PriceDataAging_1H(unittest.TestCase):
                 pprint(response)
                 raise
 
+    def test_IsPriceDatapointExpired_batch(self):
+        interval = yfcd.Interval.Hours1
+        yf_lag = timedelta(minutes=1)
+
+        interval_start_dts = []
+        fetch_dts = []
+        for d in [self.monday, self.tuesday, self.friday]:
+            for h in range(9, 16):
+                dt = datetime.combine(d, time(h, 30), self.market_tz)
+                interval_start_dts.append(dt)
+                fetch_dts.append(dt + timedelta(minutes=5))
+        interval_start_dts = np.array(interval_start_dts)
+        repaired = np.full(len(fetch_dts), False)
+        repaired[-1] = True
+
+        dt_nows = [datetime.combine(self.monday, time(13, 31), self.market_tz),
+                   datetime.combine(self.tuesday, time(9, 31), self.market_tz),
+                   datetime.combine(self.saturday, time(12), self.market_tz)]
+        for dt_now in dt_nows:
+            for max_age in [timedelta(minutes=20), timedelta(hours=4)]:
+                for expire_on_candle_close in [False, True]:
+                    responses = yfct.IsPriceDatapointExpired_batch(interval_start_dts, fetch_dts, repaired, max_age, self.exchange, interval, triggerExpiryOnClose=expire_on_candle_close, yf_lag=yf_lag, dt_now=dt_now)
+                    for i in range(len(fetch_dts)):
+                        answer = yfct.IsPriceDatapointExpired(interval_start_dts[i], fetch_dts[i], repaired[i], max_age, self.exchange, interval, triggerExpiryOnClose=expire_on_candle_close, yf_lag=yf_lag, dt_now=dt_now)
+                        try:
+                            self.assertEqual(responses[i], answer)
+                        except:
+                            print("interval_start_dt = {}".format(interval_start_dts[i]))
+                            print("fetch_dt = {}".format(fetch_dts[i]))
+                            print("max_age = {}".format(max_age))
+                            print("dt_now = {}".format(dt_now))
+                            print("expire_on_candle_close = {}".format(expire_on_candle_close))
+                            raise
+
+        # Timestamp outside of interval
+        interval_start_dts = np.array([datetime.combine(self.saturday, time(9, 30), self.market_tz)])
+        fetch_dts = [interval_start_dts[0]]
+        with self.assertRaises(yfcd.TimestampOutsideIntervalException):
+            yfct.IsPriceDatapointExpired_batch(interval_start_dts, fetch_dts, False, timedelta(hours=1), self.exchange, interval, dt_now=dt_nows[-1])
+        responses = yfct.IsPriceDatapointExpired_batch(interval_start_dts, fetch_dts, False, timedelta(hours=1), self.exchange, interval, dt_now=dt_nows[-1], expire_outside=[True])
+        self.assertTrue(responses[0])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,175 @@
+import unittest
+from unittest import mock
+import threading
+import tempfile
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from .context import yfc_cache_manager as yfcm
+from .context import yfc_dat as yfcd
+from .context import yfc_time as yfct
+from .context import yfc_history_store as yfhs
+from .context import yfc_prices_manager as yfcp
+from .context import yfc_ticker
+from .utils import make_cached_1d_prices
+
+
+class Test_PriceHistory_FastPath(unittest.TestCase):
+
+    def setUp(self):
+        self.tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(self.tempCacheDir.name)
+        yfcm._option_manager.session.offline = True
+
+        self.ticker = "TEST"
+        self.exchange = "NMS"
+        self.tz_name = "America/New_York"
+        self.tz = ZoneInfo(self.tz_name)
+        yfct.SetExchangeTzName(self.exchange, self.tz_name)
+
+        # Table of last month, up-to-date
+        start_d, end_d = yfct.MapPeriodToDates(self.exchange, pd.Timedelta("30D"), yfcd.Interval.Days1)
+        dt_now = pd.Timestamp.now(self.tz)
+        df = make_cached_1d_prices(self.exchange, self.tz, start_d, end_d, dt_now, csf=0.5, cdf=0.9)
+        idx = df.index
+        last_data_dt = yfct.CalcIntervalLastDataDt(self.exchange, idx[-1].date(), yfcd.Interval.Days1)
+        df.loc[idx[-1], "Final?"] = dt_now >= last_data_dt
+        yfhs.StoreCacheHistory(self.ticker, "history-1d", df)
+        self.idx = idx
+
+    def tearDown(self):
+        yfcm._option_manager.session.offline = False
+        self.tempCacheDir.cleanup()
+
+    def _get_history(self):
+        manager = yfcp.HistoriesManager(self.ticker, self.exchange, self.tz_name, None, None)
+        return manager.GetHistory(yfcd.Interval.Days1)
+
+    def test_fast_path(self):
+        hist = self._get_history()
+        max_age = timedelta(hours=4)
+        period = pd.Timedelta("10D")
+        start = self.idx[3].date()
+        h1 = hist.get(period=period, max_age=max_age)
+        h2 = hist.get(start=start, max_age=max_age, adjust_splits=True, adjust_divs=True)
+        self.assertIsNotNone(hist._fresh)
+        self.assertGreater(hist._fresh["until"], pd.Timestamp.now("UTC"))
+
+        with mock.patch.object(hist, "_get", side_effect=AssertionError("sync not skipped")):
+            pd.testing.assert_frame_equal(hist.get(period=period, max_age=max_age), h1)
+            pd.testing.assert_frame_equal(hist.get(start=start, max_age=max_age, adjust_splits=True, adjust_divs=True), h2)
+            # Larger max_age also fresh
+            pd.testing.assert_frame_equal(hist.get(period=period, max_age=timedelta(days=1)), h1)
+
+            # Doesn't wait for sync in another thread
+            locked, release = threading.Event(), threading.Event()
+            def _sync():
+                with hist._lock:
+                    locked.set()
+                    release.wait(10)
+            t = threading.Thread(target=_sync)
+            t.start()
+            locked.wait(10)
+            try:
+                pd.testing.assert_frame_equal(hist.get(period=period, max_age=max_age), h1)
+            finally:
+                release.set()
+                t.join()
+
+        # Fresh state persists for new process
+        hist = self._get_history()
+        self.assertEqual(hist._fresh, yfcm.ReadCacheDatum(self.ticker, "fresh-1d"))
+        with mock.patch.object(hist, "_get", side_effect=AssertionError("sync not skipped")):
+            pd.testing.assert_frame_equal(hist.get(period=period, max_age=max_age), h1)
+
+    def test_fast_path_not_used(self):
+        hist = self._get_history()
+        max_age = timedelta(hours=4)
+        hist.get(start=self.idx[3].date(), max_age=max_age)
+
+        with mock.patch.object(hist, "_get", return_value=None) as m:
+            # Before synced range
+            hist.get(start=self.idx[0].date()-timedelta(days=7), max_age=max_age)
+            self.assertEqual(m.call_count, 1)
+            # Period not mapped to dates yet
+            hist.get(period=pd.Timedelta("5D"), max_age=max_age)
+            self.assertEqual(m.call_count, 2)
+            # Smaller max_age
+            hist.get(start=self.idx[3].date(), max_age=timedelta(minutes=30))
+            self.assertEqual(m.call_count, 3)
+
+            # Other expiry rule
+            hist.get(start=self.idx[3].date(), max_age=max_age, trigger_at_market_close=True)
+            self.assertEqual(m.call_count, 4)
+
+        # New events
+        hist.get(start=self.idx[3].date(), max_age=max_age)
+        yfcm.StoreCacheDatum(self.ticker, "new_divs", pd.DataFrame())
+        with mock.patch.object(hist, "_get", return_value=None) as m:
+            hist.get(start=self.idx[3].date(), max_age=max_age)
+            self.assertEqual(m.call_count, 1)
+
+    def test_ticker_history_fast_path(self):
+        md = {"FetchDate": pd.Timestamp.now(), "LastCheck": pd.Timestamp.now()}
+        info = {"exchange": self.exchange, "exchangeTimezoneName": self.tz_name,
+                "firstTradeDateEpochUtc": int(pd.Timestamp(self.idx[0]).timestamp())}
+        yfcm.StoreCacheDatum(self.ticker, "info", info, metadata=md)
+        dat = yfc_ticker.Ticker(self.ticker)
+        start = self.idx[3].date()
+        h1 = dat.history(start=start)
+        h2 = dat.history(period="10d", adjust_divs=False)
+
+        # Warm call skips exchange & schedule setup, not just sync
+        with mock.patch.object(dat, "_getExchangeAndTzAndListingDay", side_effect=AssertionError("setup not skipped")), \
+             mock.patch.object(yfct, "SetExchangeTzName", side_effect=AssertionError("setup not skipped")), \
+             mock.patch.object(yfct, "GetExchangeSchedule", side_effect=AssertionError("setup not skipped")), \
+             mock.patch.object(yfcp.PriceHistory, "_get", side_effect=AssertionError("sync not skipped")):
+            pd.testing.assert_frame_equal(dat.history(start=start), h1)
+            pd.testing.assert_frame_equal(dat.history(period="10d", adjust_divs=False), h2)
+
+    def test_sync_lock_scope(self):
+        hist = self._get_history()
+
+        # Sync doesn't hold table lock, so others can read & write meanwhile
+        def _get(*args, **kwargs):
+            r = {}
+            def _lock():
+                try:
+                    with yfcm.CacheLock(self.ticker, timeout=0.1), yfcm.CacheLock(self.ticker, "history-1d", timeout=0.1):
+                        r["locked"] = True
+                except yfcd.CacheLockTimeoutException:
+                    r["locked"] = False
+            t = threading.Thread(target=_lock)
+            t.start()
+            t.join()
+            self.assertTrue(r["locked"])
+        with mock.patch.object(hist, "_get", side_effect=_get) as m:
+            hist.get(start=self.idx[0].date()-timedelta(days=7))
+            self.assertEqual(m.call_count, 1)
+
+        # Another process appended a row since loaded: write merges, newest row wins
+        h_other = hist.h.copy()
+        dt_later = h_other["FetchDate"].iloc[-1] + timedelta(minutes=1)
+        h_other.loc[h_other.index[-2], ["Close", "FetchDate"]] = [20.0, dt_later]
+        row = h_other.iloc[-1:].copy()
+        row.index = row.index + timedelta(days=7)
+        h_other = pd.concat([h_other, row])
+        yfhs.StoreCacheHistory(self.ticker, "history-1d", h_other)
+
+        h = hist.h.copy()
+        h.loc[h.index[-1], ["Close", "FetchDate"]] = [30.0, dt_later]
+        h.loc[h.index[-2], "Close"] = 40.0
+        hist._updatedCachedPrices(h)
+        h_disk = yfhs.ReadCacheHistory(self.ticker, "history-1d")
+        self.assertEqual(h_disk.shape[0], h.shape[0]+1)
+        self.assertEqual(h_disk["Close"].iloc[-1], 10.5)
+        self.assertEqual(h_disk["Close"].iloc[-2], 30.0)
+        self.assertEqual(h_disk["Close"].iloc[-3], 20.0)
+        pd.testing.assert_frame_equal(hist.h, h_disk, check_freq=False)
+        self.assertEqual(hist._h_version, yfhs.GetHistoryVersion(self.ticker, "history-1d"))
+
+
+if __name__ == '__main__':
+    unittest.main()
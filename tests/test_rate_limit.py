@@ -0,0 +1,97 @@
+import unittest
+from unittest import mock
+import multiprocessing
+import tempfile
+import time
+
+from .context import yfc_cache_manager as yfcm
+from .context import yfc_dat as yfcd
+from .context import yfc_rate_limit as yfcrl
+
+
+def _acquire(dp, n):
+    yfcm.SetCacheDirpath(dp)
+    for i in range(n):
+        yfcrl.Acquire("prices")
+
+
+class Test_Yfc_RateLimit(unittest.TestCase):
+
+    def setUp(self):
+        self.tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(self.tempCacheDir.name)
+        yfcrl.ResetRateLimitStats()
+        self.burst_seconds = yfcrl.burst_seconds
+        yfcrl.burst_seconds = 0.1
+
+    def tearDown(self):
+        yfcrl.burst_seconds = self.burst_seconds
+        for k in yfcrl.categories + ["max_wait"]:
+            setattr(yfcm._option_manager.rate_limits, k, None)
+        self.tempCacheDir.cleanup()
+
+    def test_unlimited(self):
+        for i in range(5):
+            yfcrl.Acquire("prices")
+        stats = yfcrl.GetRateLimitStats()
+        self.assertEqual(stats["prices"]["requests"], 5)
+        self.assertEqual(stats["prices"]["waited"], 0)
+
+        with self.assertRaises(ValueError):
+            yfcrl.Acquire("news")
+        with self.assertRaises(ValueError):
+            yfcm._option_manager.rate_limits.prices = -1
+
+    def test_limited(self):
+        yfcm._option_manager.rate_limits.prices = 600  # 10/second
+        t0 = time.perf_counter()
+        for i in range(4):
+            yfcrl.Acquire("prices")
+        t = time.perf_counter() - t0
+        self.assertGreaterEqual(t, 0.25)
+        stats = yfcrl.GetRateLimitStats()
+        self.assertEqual(stats["prices"]["requests"], 4)
+        self.assertEqual(stats["prices"]["waited"], 3)
+
+        # Other categories unaffected
+        yfcrl.Acquire("options")
+        self.assertEqual(yfcrl.GetRateLimitStats()["options"]["waited"], 0)
+
+        yfcm._option_manager.rate_limits.max_wait = 0.05
+        time.sleep(0.2)  # let bucket refill
+        yfcrl.Acquire("prices")
+        with self.assertRaises(yfcd.RateLimitException):
+            yfcrl.Acquire("prices")
+        self.assertEqual(yfcrl.GetRateLimitStats()["prices"]["rejected"], 1)
+
+    def test_lease(self):
+        # Tokens taken in batches, so state not written every request
+        yfcm._option_manager.rate_limits.prices = 6000  # 100/second, bucket holds 10
+        with mock.patch.object(yfcm, "StoreCacheDatum", wraps=yfcm.StoreCacheDatum) as m:
+            for i in range(10):
+                yfcrl.Acquire("prices")
+            self.assertEqual(m.call_count, 1)
+            self.assertEqual(yfcrl.GetRateLimitStats()["prices"]["waited"], 0)
+            yfcrl.Acquire("prices")
+            self.assertEqual(m.call_count, 2)
+        self.assertEqual(yfcrl.GetRateLimitStats()["prices"]["waited"], 1)
+
+    def test_shared_between_processes(self):
+        yfcm._option_manager.rate_limits.prices = 1200  # 20/second
+        ctx = multiprocessing.get_context("fork")
+        t0 = time.perf_counter()
+        procs = [ctx.Process(target=_acquire, args=(yfcm.GetCacheDirpath(), 3)) for i in range(2)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+        t = time.perf_counter() - t0
+        # 6 requests, 1 immediate then 20/second
+        self.assertGreaterEqual(t, 0.2)
+        state = yfcm.ReadCacheDatum("_YFC_", "rate_limits")
+        self.assertLess(state["prices"]["tokens"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
 import unittest
+from unittest import mock
+import tempfile
+import os
 
 from .context import yfc_dat as yfcd
 from .context import yfc_time as yfct
+from .context import yfc_cache_manager as yfcm
 
 import pandas as pd
 from datetime import datetime, date, time, timedelta
@@ -68,5 +72,177 @@ class TestTimeUtils(unittest.TestCase):
         idx = dii.get_indexer(week6_days)
         self.assertEqual(list(idx), [-1]*len(week6_days))
 
+    def test_SessionIndex(self):
+        tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(tempCacheDir.name)
+        yfct.sessionIndexCache.clear()
+        try:
+            yfct.SetExchangeTzName(self.exchange, 'America/New_York')
+            si = yfct.GetExchangeSessionIndex(self.exchange, date(2022, 2, 1))
+            self.assertTrue(si.covers(2022, 2022))
+            sched = yfct.GetExchangeSchedule(self.exchange, date(2022, 1, 1), date(2023, 1, 1))
+            self.assertTrue((si.get_day_indexer(sched.index.asi8) >= 0).all())
+
+            # Saturday, Monday open, Monday before open, Monday close
+            dts = [datetime.combine(date(2022, 2, 5), time(12), self.market_tz),
+                   datetime.combine(date(2022, 2, 7), time(12), self.market_tz),
+                   datetime.combine(date(2022, 2, 7), time(9), self.market_tz),
+                   datetime.combine(date(2022, 2, 7), self.exchangeCloseTime, self.market_tz)]
+            ns = pd.DatetimeIndex(dts).asi8
+            monday = si.get_day_indexer(pd.Timestamp(date(2022, 2, 7)).value)[0]
+            self.assertEqual(list(si.get_session_indexer(ns)), [-1, monday, -1, -1])
+            self.assertEqual(list(si.get_prev_indexer(ns)), [monday-1, monday, monday-1, monday])
+            self.assertEqual(list(si.get_next_indexer(ns)), [monday, monday+1, monday, monday+1])
+
+            # New process loads from file
+            yfct.sessionIndexCache.clear()
+            si2 = yfct.GetExchangeSessionIndex(self.exchange, date(2022, 2, 1))
+            self.assertTrue((si.array == si2.array).all())
+            self.assertIs(yfct.sessionIndexCache[self.exchange], si2)
+        finally:
+            yfct.sessionIndexCache.clear()
+            yfcm.ResetCacheDirpath()
+            tempCacheDir.cleanup()
+
+    def test_CalendarPersistence(self):
+        tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(tempCacheDir.name)
+        yfct.sessionIndexCache.clear()
+        yfct.ClearScheduleCaches()
+        try:
+            yfct.SetExchangeTzName(self.exchange, 'America/New_York')
+            si = yfct.GetExchangeSessionIndex(self.exchange, date(2022, 6, 1))
+            self.assertEqual(si.years, (2022, 2022))
+
+            # Only missing years fetched
+            get_calendar = yfct.xcal.get_calendar
+            with mock.patch.object(yfct.xcal, "get_calendar", side_effect=get_calendar) as m:
+                si = yfct.GetExchangeSessionIndex(self.exchange, date(2022, 6, 1), date(2023, 6, 1))
+                self.assertEqual(m.call_count, 1)
+                self.assertEqual(m.call_args.kwargs["start"], date(2023, 1, 1))
+            self.assertEqual(si.years, (2022, 2023))
+
+            # Intraday intervals calculated without xcal
+            yfct.sessionIndexCache.clear()
+            with mock.patch.object(yfct.xcal, "get_calendar", side_effect=Exception("xcal used")):
+                ti = yfct._CalcIntradayIntervals(self.exchange, yfcd.Interval.Hours1, date(2022, 2, 7), date(2022, 2, 8), False)
+            self.assertEqual(len(ti), 7)
+            self.assertEqual(ti[0].left, pd.Timestamp(datetime.combine(date(2022, 2, 7), self.exchangeOpenTime, self.market_tz)))
+
+            # Same as xcal
+            cal = yfct.xcal.get_calendar(yfcd.exchangeToXcalExchange[self.exchange], start=date(2022, 1, 1), end=date(2022, 12, 31))
+            si = yfct.GetExchangeSessionIndex(self.exchange, date(2022, 2, 1))
+            for period, align in [("1h", "-30m"), ("90m", "-30m"), ("15m", "-15m"), ("1m", "-1m")]:
+                ti = cal.trading_index("2022-02-01", "2022-03-31", period=period, intervals=True, force_close=True, align=align)
+                lefts, rights = yfct._SessionIndexTradingIntervals(si, date(2022, 2, 1), date(2022, 4, 1), pd.Timedelta(period), False, align)
+                self.assertTrue((lefts == ti.left.asi8).all())
+                self.assertTrue((rights == ti.right.asi8).all())
+        finally:
+            yfct.sessionIndexCache.clear()
+            yfct.ClearScheduleCaches()
+            yfcm.ResetCacheDirpath()
+            tempCacheDir.cleanup()
+
+    def test_ExchangeMetadata(self):
+        tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(tempCacheDir.name)
+        try:
+            yfct.SetExchangeTzName(self.exchange, 'America/New_York')
+            self.assertEqual(yfcm.ReadCacheDatum("exchange-"+self.exchange, "tz"), 'America/New_York')
+            lag = yfct.GetExchangeDataDelay(self.exchange)
+            self.assertEqual(lag, yfcd.exchangeToYfLag[self.exchange])
+
+            # Later calls don't touch disk
+            with mock.patch.object(yfct.yfcm, "ReadCacheDatum", side_effect=AssertionError("disk read")):
+                yfct.SetExchangeTzName(self.exchange, 'America/New_York')
+                self.assertEqual(yfct.GetExchangeTzName(self.exchange), 'America/New_York')
+                self.assertEqual(yfct.GetExchangeDataDelay(self.exchange), lag)
+                with self.assertRaises(Exception):
+                    yfct.SetExchangeTzName(self.exchange, 'Europe/London')
+        finally:
+            yfcm.ResetCacheDirpath()
+            tempCacheDir.cleanup()
+
+    def test_IntervalsPersistence(self):
+        tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(tempCacheDir.name)
+        yfct.sessionIndexCache.clear()
+        yfct.ClearScheduleCaches()
+        try:
+            yfct.SetExchangeTzName(self.exchange, 'America/New_York')
+            interval = yfcd.Interval.Hours1
+            start_d, end_d = date(2022, 2, 7), date(2022, 2, 12)
+            intervals = yfct.GetExchangeScheduleIntervals(self.exchange, interval, start_d, end_d)
+            self.assertEqual(len(intervals), 5*7)
+            fp = yfct._IntervalsFilepath(self.exchange, interval, 2022, False)
+            self.assertTrue(os.path.isfile(fp))
+
+            # New process loads from file
+            yfct.ClearScheduleCaches()
+            with mock.patch.object(yfct, "_CalcIntradayIntervals", side_effect=Exception("recalculated")):
+                intervals2 = yfct.GetExchangeScheduleIntervals(self.exchange, interval, start_d, end_d)
+            self.assertTrue(intervals.equals(intervals2))
+
+            # Recalculated if sessions change
+            yfct.ClearScheduleCaches()
+            with mock.patch.object(yfct, "_intervalsVersion", -1):
+                calc = yfct._CalcIntradayIntervals
+                with mock.patch.object(yfct, "_CalcIntradayIntervals", side_effect=calc) as m:
+                    intervals2 = yfct.GetExchangeScheduleIntervals(self.exchange, interval, start_d, end_d)
+                    self.assertEqual(m.call_count, 1)
+            self.assertTrue(intervals.equals(intervals2))
+        finally:
+            yfct.sessionIndexCache.clear()
+            yfct.ClearScheduleCaches()
+            yfcm.ResetCacheDirpath()
+            tempCacheDir.cleanup()
+
+    def test_ScheduleCache(self):
+        tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(tempCacheDir.name)
+        yfct.sessionIndexCache.clear()
+        yfct.ClearScheduleCaches()
+        try:
+            yfct.SetExchangeTzName(self.exchange, 'America/New_York')
+            stats0 = yfct.GetScheduleCacheStats()["schedules"]
+            s1 = yfct.GetExchangeSchedule(self.exchange, date(2022, 2, 1), date(2022, 3, 1))
+            s2 = yfct.GetExchangeSchedule(self.exchange, date(2022, 3, 1), date(2022, 4, 1))
+            stats = yfct.GetScheduleCacheStats()["schedules"]
+            self.assertEqual(stats["misses"] - stats0["misses"], 1)
+            self.assertEqual(stats["hits"] - stats0["hits"], 1)
+            self.assertEqual(stats["entries"], 1)
+            self.assertGreater(stats["bytes"], 0)
+            yfct.GetCalendarViaCache(self.exchange, 2022, 2022)
+            self.assertGreater(yfct.GetScheduleCacheStats()["calendars"]["bytes"], 0)
+
+            # Extending calendar invalidates
+            yfct.GetExchangeScheduleIntervals(self.exchange, yfcd.Interval.Days1, date(2022, 2, 1), date(2022, 3, 1))
+            yfct.GetExchangeSessionIndex(self.exchange, date(2021, 6, 1))
+            stats = yfct.GetScheduleCacheStats()
+            self.assertEqual(stats["schedules"]["entries"], 0)
+            self.assertEqual(stats["intervals"]["entries"], 0)
+            self.assertEqual(stats["calendars"]["entries"], 0)
+            self.assertEqual(stats["schedules"]["invalidations"] - stats0["invalidations"], 1)
+            pd.testing.assert_frame_equal(yfct.GetExchangeSchedule(self.exchange, date(2022, 2, 1), date(2022, 3, 1)), s1)
+
+            # Bounded
+            nbytes = yfct.GetScheduleCacheStats()["schedules"]["bytes"]
+            yfcm._option_manager.calendar.cache_mb = nbytes * 1.5 / (1024*1024)
+            yfct.GetExchangeSchedule(self.exchange, date(2021, 2, 1), date(2021, 3, 1))
+            stats = yfct.GetScheduleCacheStats()["schedules"]
+            self.assertEqual(stats["entries"], 1)
+            self.assertEqual(stats["evictions"] - stats0["evictions"], 1)
+            pd.testing.assert_frame_equal(yfct.GetExchangeSchedule(self.exchange, date(2022, 3, 1), date(2022, 4, 1)), s2)
+
+            with self.assertRaises(ValueError):
+                yfcm._option_manager.calendar.cache_mb = -1
+        finally:
+            yfcm._option_manager.calendar.cache_mb = yfct.cache_mb_default
+            yfct.sessionIndexCache.clear()
+            yfct.ClearScheduleCaches()
+            yfcm.ResetCacheDirpath()
+            tempCacheDir.cleanup()
+
+
 if __name__ == '__main__':
     unittest.main()
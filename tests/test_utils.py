@@ -1,6 +1,27 @@
 import unittest
 
+import numpy as np
+import pandas as pd
+
 from .context import yfc_utils as yfcu
+from .context import yfc_dat as yfcd
+
+
+def _chunk_group_indices(steps, maxDays):
+    # Reference: walk schedule one session at a time
+    starts = [0] ; ends = []
+    grpSize = steps[0]
+    i = 1
+    while i < len(steps):
+        if grpSize + steps[i] <= maxDays:
+            grpSize += steps[i]
+        else:
+            ends.append(i)
+            i -= 2
+            starts.append(i)
+            grpSize = steps[i]
+        i += 1
+    return starts, ends
 
 class TestUtils(unittest.TestCase):
 
@@ -46,6 +67,95 @@ class TestUtils(unittest.TestCase):
 
         self.assertEqual(yfcu.CalculateRounding(1.0, 4), 3)
 
+    def test_chunkDatesIntoYfFetches(self):
+        rng = np.random.default_rng(0)
+        for maxDays in [7, 30, 60, 730]:
+            for n in [2, 5, 50, 400]:
+                idx = pd.bdate_range("2020-01-02", periods=n)
+                idx = idx.delete(rng.choice(np.arange(1, n-1), size=n//20, replace=False))
+                tz = "America/New_York"
+                sched = pd.DataFrame({"open": idx.tz_localize(tz) + pd.Timedelta(hours=9.5),
+                                      "close": idx.tz_localize(tz) + pd.Timedelta(hours=16)}, index=idx)
+                groups = yfcu.ChunkDatesIntoYfFetches(sched, maxDays, 2)
+
+                steps = np.ones(len(idx), dtype=int)
+                steps[1:] = (idx[1:] - idx[:-1]).days
+                starts, ends = _chunk_group_indices(steps, maxDays)
+                idx = idx.tz_localize(tz)
+                self.assertEqual(len(groups), len(starts))
+                for i in range(len(groups)):
+                    self.assertEqual(groups[i]["fetch start"], idx[starts[i]])
+                    self.assertEqual(groups[i]["core start"], idx[starts[i]+1])
+                    if i < len(ends):
+                        self.assertEqual(groups[i]["core end"], idx[ends[i]-1])
+                        self.assertEqual(groups[i]["fetch end"], idx[ends[i]])
+                    else:
+                        self.assertEqual(groups[i]["core end"], max(idx[-1], idx[starts[i]+1]+pd.Timedelta(days=1)))
+
+        # Schedule with consecutive gaps > maxDays can't be chunked
+        idx = pd.DatetimeIndex(["2020-01-02", "2020-01-10", "2020-01-20", "2020-01-21"])
+        sched = pd.DataFrame({"close": idx.tz_localize("UTC")}, index=idx)
+        with self.assertRaises(Exception):
+            yfcu.ChunkDatesIntoYfFetches(sched, 7, 2)
+
+    def test_verifyPricesDf(self):
+        idx = pd.date_range("2020-01-06", periods=20, freq="B", tz="America/New_York")
+        df_yf = pd.DataFrame({"Open": 10.0, "High": 11.0, "Low": 9.0, "Close": 10.5, "Adj Close": 10.5,
+                              "Volume": 1000, "Dividends": 0.0, "Stock Splits": 0.0, "Repaired?": False}, index=idx)
+        dt = pd.Timestamp("2020-03-01", tz="UTC")
+        h = df_yf.drop("Adj Close", axis=1).copy()
+        h["Final?"] = True
+        h["FetchDate"] = dt
+        h["CDF"] = 1.0
+        h["LastDivAdjustDt"] = dt
+        h["LastSplitAdjustDt"] = dt
+        d1 = yfcd.Interval.Days1
+
+        f = yfcu.VerifyPricesDf(h, df_yf, d1, quiet=True)
+        self.assertFalse(f.any())
+        self.assertTrue(f.index.equals(h.index))
+
+        # Price difference
+        h2 = h.copy()
+        h2.loc[idx[3], "Close"] = 10.6
+        f = yfcu.VerifyPricesDf(h2, df_yf, d1, quiet=True)
+        self.assertEqual(list(f.index[f]), [idx[3]])
+        self.assertEqual(f.name, ";Prices")
+        # - tolerated if Yahoo repaired
+        df_yf2 = df_yf.copy()
+        df_yf2.loc[idx[3], "Repaired?"] = True
+        self.assertFalse(yfcu.VerifyPricesDf(h2, df_yf2, d1, quiet=True).any())
+        # - ignored if not final or Yahoo missing row
+        h2.loc[idx[3], "Final?"] = False
+        self.assertFalse(yfcu.VerifyPricesDf(h2, df_yf, d1, quiet=True).any())
+        self.assertFalse(yfcu.VerifyPricesDf(h2.assign(**{"Final?": True}), df_yf.drop(idx[3]), d1, quiet=True).any())
+
+        # Volume difference, ignored if Yahoo volume = 0
+        h2 = h.copy()
+        h2.loc[idx[5], "Volume"] = 2000
+        f = yfcu.VerifyPricesDf(h2, df_yf, d1, quiet=True)
+        self.assertEqual(list(f.index[f]), [idx[5]])
+        self.assertEqual(f.name, ";Volume")
+        df_yf2 = df_yf.copy()
+        df_yf2.loc[idx[5], "Volume"] = 0
+        self.assertFalse(yfcu.VerifyPricesDf(h2, df_yf2, d1, quiet=True).any())
+
+        # Dividend missing from cache
+        df_yf2 = df_yf.copy()
+        df_yf2.loc[idx[10], "Dividends"] = 0.1
+        df_yf2.loc[:idx[9], "Adj Close"] = 10.4
+        f = yfcu.VerifyPricesDf(h, df_yf2, d1, quiet=True, exit_first_error=True)
+        self.assertEqual(list(f.index[f]), [idx[10]])
+        self.assertEqual(f.name, ";Dividends")
+        # - present but bad div-adjustment
+        h2 = h.copy()
+        h2.loc[idx[10], "Dividends"] = 0.1
+        f = yfcu.VerifyPricesDf(h2, df_yf2, d1, quiet=True)
+        self.assertEqual(list(f.index[f]), list(idx[:10]))
+        self.assertEqual(f.name, ";Dividends")
+        h2.loc[:idx[9], "CDF"] = 10.4/10.5
+        self.assertFalse(yfcu.VerifyPricesDf(h2, df_yf2, d1, quiet=True).any())
+
 
 if __name__ == '__main__':
     unittest.main()
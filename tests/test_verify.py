@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+import tempfile
+import os
+import json
+
+from .context import yfc_cache_manager as yfcm
+from .context import yfc_ticker as yfc
+
+
+class _FakeTicker:
+    # Verifies instantly: fails if ticker in 'failing', records each call
+    failing = set()
+    calls = []
+
+    def __init__(self, ticker, session=None):
+        self.ticker = ticker
+        self._verify_results = {}
+
+    def verify_cached_prices(self, **kwargs):
+        _FakeTicker.calls.append(self.ticker)
+        v = self.ticker not in _FakeTicker.failing
+        self._verify_results = {"1d": v}
+        return v
+
+
+class Test_VerifyCachedTickers(unittest.TestCase):
+
+    def setUp(self):
+        self.tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(self.tempCacheDir.name)
+        self.tkrs = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+        for tkr in self.tkrs:
+            os.makedirs(os.path.join(self.tempCacheDir.name, tkr))
+        _FakeTicker.failing = set()
+        _FakeTicker.calls = []
+        self.patch = mock.patch.object(yfc, "Ticker", _FakeTicker)
+        self.patch.start()
+
+        self.journal_fp = os.path.join(self.tempCacheDir.name, "_YFC_", "verify_journal.jsonl")
+        self.report_fp = os.path.join(self.tempCacheDir.name, "_YFC_", "verify_report.json")
+
+    def tearDown(self):
+        self.patch.stop()
+        yfcm.ResetCacheDirpath()
+        self.tempCacheDir.cleanup()
+
+    def test_report(self):
+        _FakeTicker.failing = {"CCC"}
+        for threads in [None, 3]:
+            report = yfc.verify_cached_tickers_prices(halt_on_fail=False, threads=threads)
+            self.assertEqual(list(report["tickers"].keys()), self.tkrs)
+            self.assertEqual(report["counts"], {"pass": 4, "fail": 1, "delisted": 0})
+            self.assertEqual(report["tickers"]["CCC"], {"status": "fail", "intervals": {"1d": False}})
+            self.assertEqual(report["tickers"]["AAA"], {"status": "pass", "intervals": {"1d": True}})
+            self.assertFalse(os.path.isfile(self.journal_fp))
+            self.assertTrue(os.path.isfile(self.report_fp))
+            self.assertEqual(yfcm.ReadCacheDatum("_YFC_", "verify_report")["tickers"], report["tickers"])
+
+    def test_resume(self):
+        _FakeTicker.failing = {"CCC"}
+        with self.assertRaises(Exception):
+            yfc.verify_cached_tickers_prices(halt_on_fail=True)
+        self.assertTrue(os.path.isfile(self.journal_fp))
+        with open(self.journal_fp) as f:
+            lines = [json.loads(x) for x in f.readlines()]
+        self.assertEqual([x["ticker"] for x in lines[1:]], ["AAA", "BBB"])
+
+        # Resume skips already-verified, and tolerates truncated last line
+        with open(self.journal_fp, 'a') as f:
+            f.write('{"ticker": "DD')
+        _FakeTicker.failing = set()
+        _FakeTicker.calls = []
+        report = yfc.verify_cached_tickers_prices(halt_on_fail=True, threads=2)
+        self.assertEqual(sorted(_FakeTicker.calls), ["CCC", "DDD", "EEE"])
+        self.assertEqual(report["counts"]["pass"], 5)
+        self.assertFalse(os.path.isfile(self.journal_fp))
+
+        # Different parameters = fresh start
+        _FakeTicker.failing = {"CCC"}
+        with self.assertRaises(Exception):
+            yfc.verify_cached_tickers_prices(halt_on_fail=True)
+        _FakeTicker.calls = []
+        yfc.verify_cached_tickers_prices(rtol=0.01, halt_on_fail=False)
+        self.assertEqual(sorted(set(_FakeTicker.calls)), self.tkrs)
+
+
+if __name__ == '__main__':
+    unittest.main()
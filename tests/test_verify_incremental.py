@@ -0,0 +1,98 @@
+import unittest
+from unittest import mock
+import tempfile
+from datetime import date
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from .context import yfc_cache_manager as yfcm
+from .context import yfc_dat as yfcd
+from .context import yfc_time as yfct
+from .context import yfc_history_store as yfhs
+from .context import yfc_prices_manager as yfcp
+from .utils import make_cached_1d_prices
+
+
+class Test_VerifyIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.tempCacheDir = tempfile.TemporaryDirectory()
+        yfcm.SetCacheDirpath(self.tempCacheDir.name)
+        yfcm._option_manager.session.offline = True
+
+        self.ticker = "TEST"
+        self.exchange = "NMS"
+        self.tz_name = "America/New_York"
+        self.tz = ZoneInfo(self.tz_name)
+        yfct.SetExchangeTzName(self.exchange, self.tz_name)
+
+        # 3 years of final 1d prices, and matching Yahoo prices
+        dt = pd.Timestamp("2024-01-10", tz=ZoneInfo("UTC"))
+        df = make_cached_1d_prices(self.exchange, self.tz, date(2021, 1, 1), date(2024, 1, 1), dt)
+        yfhs.StoreCacheHistory(self.ticker, "history-1d", df)
+        self.df_yf = df[["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits", "Repaired?"]].copy()
+        self.df_yf.insert(4, "Adj Close", self.df_yf["Close"])
+        idx = df.index
+        self.idx = idx
+
+        manager = yfcp.HistoriesManager(self.ticker, self.exchange, self.tz_name, None, None)
+        self.hist = manager.GetHistory(yfcd.Interval.Days1)
+        self.fetch_starts = []
+
+        def _history(start, end, **kwargs):
+            self.fetch_starts.append(start)
+            start_dt = pd.Timestamp(start).tz_localize(self.tz)
+            end_dt = pd.Timestamp(end).tz_localize(self.tz)
+            return self.df_yf.loc[start_dt:end_dt-pd.Timedelta(1)].copy()
+        self.hist.dat = mock.Mock()
+        self.hist.dat.history.side_effect = _history
+
+    def tearDown(self):
+        yfcm._option_manager.session.offline = False
+        self.tempCacheDir.cleanup()
+
+    def _verify(self):
+        self.fetch_starts = []
+        return self.hist._verifyCachedPrices(correct=False)
+
+    def test_incremental(self):
+        self.assertTrue(self._verify())
+        self.assertEqual(len(self.fetch_starts), 1)
+        self.assertLess(self.fetch_starts[0], self.idx[0].date())
+
+        # Nothing changed so nothing fetched
+        self.assertTrue(self._verify())
+        self.assertEqual(len(self.fetch_starts), 0)
+
+        # Changed row means fetch from start of its year
+        h = self.hist.h.copy()
+        h.loc[self.idx[400], "CDF"] = 0.99
+        self.hist._updatedCachedPrices(h)
+        self.assertFalse(self._verify())
+        self.assertEqual(len(self.fetch_starts), 1)
+        self.assertEqual(self.fetch_starts[0].year, 2022)
+        self.assertGreater(self.fetch_starts[0], self.idx[0].date())
+        # - failure not recorded
+        self.assertFalse(self._verify())
+        self.assertEqual(len(self.fetch_starts), 1)
+
+        h.loc[self.idx[400], "CDF"] = 1.0
+        self.hist._updatedCachedPrices(h)
+        self.assertTrue(self._verify())
+        self.assertTrue(self._verify())
+        self.assertEqual(len(self.fetch_starts), 0)
+
+        # Stricter tolerance, or verified too long ago, means fetch everything
+        self.fetch_starts = []
+        self.assertTrue(self.hist._verifyCachedPrices(rtol=0.00001))
+        self.assertLess(self.fetch_starts[0], self.idx[0].date())
+        verified = yfcm.ReadCacheDatum(self.ticker, self.hist.verified_key)
+        verified["segments"][2023] = (verified["segments"][2023][0], pd.Timestamp("2020-01-01", tz="UTC"))
+        yfcm.StoreCacheDatum(self.ticker, self.hist.verified_key, verified)
+        self.assertTrue(self._verify())
+        self.assertEqual(self.fetch_starts[0].year, 2023)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,24 @@
 import numpy as np
+import pandas as pd
 import unittest
 from pprint import pprint
 
 import os
 import time
+
+from .context import yfc_time as yfct
+
+
+def make_cached_1d_prices(exchange, tz, start_d, end_d, fetch_dt, csf=1.0, cdf=1.0):
+    # Daily price table in cache format, one row per session, all final
+    sched = yfct.GetExchangeSchedule(exchange, start_d, end_d)
+    idx = pd.DatetimeIndex([pd.Timestamp(dt.date()).tz_localize(tz) for dt in sched["open"]])
+    return pd.DataFrame(index=idx, data={"Open": 10.0, "High": 11.0, "Low": 9.0, "Close": 10.5,
+                                         "Volume": 1000, "Dividends": 0.0, "Stock Splits": 0.0,
+                                         "Final?": True, "C-Check?": True, "Repaired?": False,
+                                         "FetchDate": fetch_dt, "CSF": csf, "CDF": cdf,
+                                         "LastDivAdjustDt": fetch_dt, "LastSplitAdjustDt": fetch_dt})
+
 def take_directory_snapshot(directory_path):
     snapshot = {}
     for root, dirs, files in os.walk(directory_path):
@@ -7,8 +7,10 @@ with open(os.path.join(os.path.dirname(__file__), 'VERSION'), 'r') as f:
 from .yfc_dat import Period, Interval, AmbiguousComparisonException
 from .yfc_ticker import Ticker, verify_cached_tickers_prices
 from .yfc_multi import download
+from .yfc_async import adownload
 from .yfc_logging import EnableLogging, DisableLogging
 from .yfc_cache_manager import _option_manager as options
+from .yfc_upgrade import migrate_history_storage
 
 
 from .yfc_upgrade import _tidy_upgrade_history
@@ -0,0 +1,85 @@
+import asyncio
+import concurrent.futures
+from functools import partial
+
+from . import yfc_dat as yfcd
+from . import yfc_utils as yfcu
+from . import yfc_multi
+from . import yfc_ticker
+
+# Threads that serve requests from cache. Cache reads are fast,
+# so few needed, and they never wait on fetches.
+cache_workers = 4
+
+
+def _download_one_cached(ticker, **kwargs):
+    # Returns (True, prices) if fresh in cache. Else (False, Ticker) so
+    # fetch can continue with what's already loaded, Ticker None if
+    # even that wasn't cached.
+    dat = None
+    with yfcu.CacheOnly():
+        try:
+            dat = yfc_ticker.Ticker(ticker, session=kwargs.get('session'))
+            return True, yfc_multi.download_one(ticker, dat=dat, **kwargs)
+        except yfcd.CacheMissException:
+            return False, dat
+
+
+async def adownload(tickers,
+            max_concurrency=8,  # max number of tickers fetching from Yahoo at once
+            ignore_tz=None,
+            interval="1d", group_by='column',
+            max_age=None,  # defaults to half of interval
+            period=None,
+            start=None, end=None, prepost=False, actions=True,
+            adjust_splits=True, adjust_divs=True,
+            keepna=False,
+            rounding=False,
+            session=None,
+            return_format='wide'):
+    # Async version of download(). First each ticker is served from cache
+    # in a worker thread. Only if ticker must fetch from Yahoo does it wait
+    # for one of 'max_concurrency' fetch slots, so event loop is never
+    # blocked and number of threads is bounded.
+
+    if return_format not in ['wide', 'long', 'dict']:
+        raise ValueError(f"'return_format' must be 'wide', 'long' or 'dict', not '{return_format}'")
+    yfcu.TypeCheckInt(max_concurrency, "max_concurrency")
+    if max_concurrency < 1:
+        raise ValueError(f"'max_concurrency' must be >= 1, not {max_concurrency}")
+
+    tickers, ignore_tz, period = yfc_multi._prepare_args(tickers, ignore_tz, interval, period, start, end)
+    dl_args = {'period':period, 'interval':interval,
+               'max_age':max_age,
+               'start':start, 'end':end, 'prepost':prepost,
+               'actions':actions, 'adjust_divs':adjust_divs,
+               'adjust_splits':adjust_splits, 'keepna':keepna,
+               'rounding':rounding, 'session':session}
+
+    loop = asyncio.get_running_loop()
+    limiter = asyncio.Semaphore(max_concurrency)
+    cache_pool = concurrent.futures.ThreadPoolExecutor(max_workers=cache_workers)
+    fetch_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def _one(tkr):
+        hit, r = await loop.run_in_executor(cache_pool, partial(_download_one_cached, tkr, **dl_args))
+        if hit:
+            return r
+        async with limiter:
+            # Continue with Ticker loaded in cache pass
+            return await loop.run_in_executor(fetch_pool, partial(yfc_multi.download_one, tkr, dat=r, **dl_args))
+
+    tasks = [asyncio.ensure_future(_one(tkr)) for tkr in tickers]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+    finally:
+        # Don't block event loop waiting for threads
+        cache_pool.shutdown(wait=False, cancel_futures=True)
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+
+    dfs = {tickers[i]:results[i] for i in range(len(tickers))}
+    return yfc_multi._combine_dfs(dfs, tickers, ignore_tz, group_by, return_format)
@@ -1,8 +1,23 @@
 import os
 import pickle
 import json
+import copy
+import threading
+import tempfile
+import zlib
+import logging
+import time
+import sys
+from contextlib import contextmanager
+from collections import OrderedDict
 import platformdirs
+import numpy as np
 import pandas as pd
+try:
+    import fcntl
+except ImportError:
+    # Windows: only threads of this process are locked out
+    fcntl = None
 
 # Handle Windows reserved filenames for tickers
 _WINDOWS_RESERVED_NAMES = {"CON","PRN","AUX","NUL","COM1","COM2","COM3","COM4","COM5","COM6","COM7","COM8","COM9","LPT1","LPT2","LPT3","LPT4","LPT5","LPT6","LPT7","LPT8","LPT9"}
@@ -31,6 +46,9 @@ packed_data_cats["analysis"]   = ['sustainability', 'recommendations', 'recommen
 quarterly_objects = packed_data_cats["quarterlys"]
 annual_objects    = packed_data_cats["annuals"]
 
+# Storage formats for price tables, see yfc_history_store
+history_formats = ["pickle", "segmented", "parquet", "feather"]
+
 verbose = False
 # verbose = True
 
@@ -39,6 +57,397 @@ verbose = False
 global cacheDirpath
 
 
+class _MemCache:
+    # LRU of unpickled/decoded cache files, to avoid re-reading same file
+    # many times. Each entry is validated against file stat, so changes
+    # by other processes are detected. Size measured by decoded object
+    # size. Cached arrays are made read-only, see _copy_datum().
+
+    def __init__(self):
+        self._d = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _max_bytes(self):
+        mb = _option_manager.storage.memory_cache_mb
+        if mb is None:
+            mb = memory_cache_mb_default
+        return mb * 1024 * 1024
+
+    def _pop(self, key):
+        e = self._d.pop(key, None)
+        if e is not None:
+            self.nbytes -= e[2]
+
+    def get(self, key, fp, loader):
+        try:
+            st = os.stat(fp)
+        except FileNotFoundError:
+            self.invalidate(key)
+            raise
+        sig = (st.st_mtime_ns, st.st_ino, st.st_size)
+        with self._lock:
+            e = self._d.get(key)
+            if e is not None and e[0] == sig:
+                self._d.move_to_end(key)
+                self.hits += 1
+                return e[1]
+            self._pop(key)
+            self.misses += 1
+
+        obj = loader(fp)
+
+        max_bytes = self._max_bytes()
+        nbytes = _ObjSize(obj)
+        if nbytes > max_bytes:
+            return obj
+        _Freeze(obj)
+        with self._lock:
+            self._pop(key)
+            self._d[key] = (sig, obj, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > max_bytes:
+                k = next(iter(self._d))
+                self._pop(k)
+                self.evictions += 1
+        return obj
+
+    def invalidate(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._d.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._d), "bytes": self.nbytes}
+
+
+memory_cache_mb_default = 256
+_mem_cache = _MemCache()
+
+
+def GetMemCacheStats():
+    return _mem_cache.stats()
+
+
+def ClearMemCache():
+    _mem_cache.clear()
+
+
+def _ObjSize(x):
+    # Approximate in-memory size of decoded object
+    if isinstance(x, pd.DataFrame):
+        return int(x.memory_usage(index=True, deep=True).sum())
+    elif isinstance(x, pd.Series):
+        return int(x.memory_usage(index=True, deep=True))
+    elif isinstance(x, pd.Index):
+        return int(x.memory_usage(deep=True))
+    elif isinstance(x, np.ndarray):
+        return x.nbytes
+    elif isinstance(x, dict):
+        return sys.getsizeof(x) + sum(_ObjSize(k) + _ObjSize(v) for k, v in x.items())
+    elif isinstance(x, (list, tuple, set)):
+        return sys.getsizeof(x) + sum(_ObjSize(v) for v in x)
+    return sys.getsizeof(x)
+
+
+def _freeze_array(a):
+    if isinstance(a, np.ndarray):
+        a.flags.writeable = False
+    elif hasattr(a, "_ndarray"):
+        # pandas array backed by NumPy, e.g. tz-aware datetimes
+        a._ndarray.flags.writeable = False
+
+
+def _Freeze(x):
+    # Make arrays of cached object read-only, so a caller modifying
+    # values in-place raises instead of corrupting cache.
+    if isinstance(x, pd.DataFrame):
+        for b in x._mgr.blocks:
+            _freeze_array(b.values)
+    elif isinstance(x, pd.Series):
+        _freeze_array(x.array)
+    elif isinstance(x, np.ndarray):
+        x.flags.writeable = False
+    elif isinstance(x, dict):
+        for v in x.values():
+            _Freeze(v)
+    elif isinstance(x, (list, tuple)):
+        for v in x:
+            _Freeze(v)
+
+
+def _copy_datum(x):
+    # Cached objects are shared. Containers are copied so caller can modify
+    # them, but DataFrames/arrays are shallow copies of read-only data:
+    # adding/replacing columns is fine, modify values in-place needs .copy().
+    # Public API must return WritableCopy().
+    if isinstance(x, (pd.DataFrame, pd.Series)):
+        c = x.copy(deep=False)
+        # Index/columns objects shared, so their names too
+        c.index = c.index.view()
+        if isinstance(c, pd.DataFrame):
+            c.columns = c.columns.view()
+        return c
+    elif isinstance(x, np.ndarray):
+        return x.view()
+    elif isinstance(x, dict):
+        return {k: _copy_datum(v) for k, v in x.items()}
+    elif isinstance(x, list):
+        return [_copy_datum(v) for v in x]
+    elif isinstance(x, set):
+        return set(x)
+    return x
+
+
+def WritableCopy(x):
+    # Copy of data returned by ReadCacheDatum() that user can modify
+    # in-place. Use at public API, internal code can share read-only.
+    if isinstance(x, (pd.DataFrame, pd.Series, np.ndarray)):
+        return x.copy()
+    elif isinstance(x, dict):
+        return {k: WritableCopy(v) for k, v in x.items()}
+    elif isinstance(x, list):
+        return [WritableCopy(v) for v in x]
+    elif isinstance(x, tuple):
+        if hasattr(x, '_fields'):
+            # namedtuple
+            return type(x)(*[WritableCopy(v) for v in x])
+        return tuple(WritableCopy(v) for v in x)
+    return x
+
+
+def _FileName(objectName):
+    # Name of file (without extension) that stores object
+    if IsObjectInPackedData(objectName):
+        return GetPackedDataCat(objectName)
+    return objectName
+
+
+def _MetaFileName(objectName):
+    return _FileName(objectName) + ".meta"
+
+
+@contextmanager
+def OpenAtomic(fp, mode='wb'):
+    # Write to temporary file then move over 'fp', so a killed
+    # process can't leave a truncated file.
+    fd, tmp_fp = tempfile.mkstemp(dir=os.path.dirname(fp), prefix="."+os.path.basename(fp)+".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_fp, fp)
+    except BaseException:
+        if os.path.isfile(tmp_fp):
+            os.remove(tmp_fp)
+        raise
+
+
+# Optional checksum appended to pickle files. pickle.load() stops
+# at end of pickle, so file still readable without checking.
+_checksum_magic = b"YFCCRC"
+_checksum_len = len(_checksum_magic) + 4
+
+
+def _WriteFile(ticker, name, fp, d):
+    if fp.endswith(".json"):
+        with OpenAtomic(fp, 'w') as outData:
+            json.dump(d, outData, default=yfcu.JsonEncodeValue)
+    else:
+        b = pickle.dumps(d, 4)
+        if _option_manager.storage.checksum:
+            b += _checksum_magic + zlib.crc32(b).to_bytes(4, 'big')
+        with OpenAtomic(fp, 'wb') as outData:
+            outData.write(b)
+    _mem_cache.invalidate((ticker, name))
+
+
+def _DeleteFile(ticker, name, fp):
+    os.remove(fp)
+    _mem_cache.invalidate((ticker, name))
+
+
+def _load_json(fp):
+    with open(fp, 'r') as inData:
+        try:
+            return json.load(inData, object_hook=yfcu.JsonDecodeDict)
+        except json.JSONDecodeError as e:
+            raise yfcd.CorruptCacheFileException(fp, str(e))
+
+
+def _load_pickle(fp):
+    with open(fp, 'rb') as inData:
+        b = inData.read()
+    if len(b) == 0:
+        raise yfcd.CorruptCacheFileException(fp, "empty")
+    if len(b) > _checksum_len and b[-_checksum_len:-4] == _checksum_magic:
+        if zlib.crc32(b[:-_checksum_len]) != int.from_bytes(b[-4:], 'big'):
+            raise yfcd.CorruptCacheFileException(fp, "checksum mismatch")
+    try:
+        return pickle.loads(b)
+    except (EOFError, pickle.UnpicklingError) as e:
+        raise yfcd.CorruptCacheFileException(fp, str(e))
+
+
+def _LoadFile(ticker, name, fp, loader):
+    # Note: returned object is shared with memory cache, don't modify
+    try:
+        return _mem_cache.get((ticker, name), fp, loader)
+    except yfcd.CorruptCacheFileException as e:
+        # Discard, will be re-fetched
+        logging.getLogger(__name__).warning(f"{e} - deleting")
+        _DeleteFile(ticker, name, fp)
+        return None
+
+
+# Advisory reader/writer locks, so multiple processes can share cache.
+# One lock per ticker folder (for multi-file updates like price history),
+# and one per file (data + its metadata sidecar). Order is always
+# ticker lock before file lock, so no deadlock. A shared lock can't be
+# upgraded to exclusive, release it first.
+# Within a process, a lock is re-entrant for the holding thread, and
+# other threads wait.
+
+lock_timeout_default = 120  # seconds
+
+
+class _PathLock:
+    def __init__(self, fp):
+        self.fp = fp
+        self.rlock = threading.RLock()
+        self.fd = None
+        self.depth = 0
+        self.exclusive = False
+
+
+_path_locks = {}
+_path_locks_lock = threading.Lock()
+_lock_stats = {"acquired": 0, "contended": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+
+def GetLockStats():
+    with _path_locks_lock:
+        return dict(_lock_stats)
+
+
+def ResetLockStats():
+    with _path_locks_lock:
+        for k in _lock_stats:
+            _lock_stats[k] = 0.0 if k.endswith("seconds") else 0
+
+
+def _GetLockFilepath(ticker, objectName=None):
+    if objectName is None:
+        fn = ".lock"
+    else:
+        fn = "." + _FileName(objectName) + ".lock"
+    return os.path.join(get_ticker_folder_path(ticker), fn)
+
+
+def _flock(pl, exclusive, deadline):
+    # Return True if had to wait
+    op = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    waited = False
+    sleep = 0.001
+    while True:
+        try:
+            fcntl.flock(pl.fd, op | fcntl.LOCK_NB)
+            return waited
+        except BlockingIOError:
+            waited = True
+            if time.monotonic() >= deadline:
+                raise yfcd.CacheLockTimeoutException(pl.fp, _lock_timeout())
+            time.sleep(sleep)
+            sleep = min(sleep*2, 0.05)
+
+
+def _lock_timeout():
+    t = _option_manager.storage.lock_timeout
+    return lock_timeout_default if t is None else t
+
+
+@contextmanager
+def CacheLock(ticker, objectName=None, exclusive=True, timeout=None):
+    # objectName=None -> lock whole ticker
+    fp = _GetLockFilepath(ticker, objectName)
+    if timeout is None:
+        timeout = _lock_timeout()
+    t0 = time.monotonic()
+    deadline = t0 + timeout
+
+    with _path_locks_lock:
+        pl = _path_locks.get(fp)
+        if pl is None:
+            pl = _PathLock(fp)
+            _path_locks[fp] = pl
+
+    waited = False
+    if not pl.rlock.acquire(blocking=False):
+        waited = True
+        if not pl.rlock.acquire(timeout=max(0.0, deadline-time.monotonic())):
+            with _path_locks_lock:
+                _lock_stats["timeouts"] += 1
+            raise yfcd.CacheLockTimeoutException(fp, timeout)
+    try:
+        if fcntl is not None:
+            if pl.fd is None:
+                if exclusive:
+                    os.makedirs(os.path.dirname(fp), exist_ok=True)
+                # Reader of uncached ticker has nothing to protect,
+                # so don't create a folder for it
+                if exclusive or os.path.isdir(os.path.dirname(fp)):
+                    pl.fd = os.open(fp, os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        waited = _flock(pl, exclusive, deadline) or waited
+                    except BaseException:
+                        os.close(pl.fd)
+                        pl.fd = None
+                        raise
+                    pl.exclusive = exclusive
+            elif exclusive and not pl.exclusive:
+                # flock() upgrade is not atomic: on failure the shared lock
+                # is dropped. So caller must take exclusive lock up front.
+                raise Exception(f"Cannot upgrade shared lock to exclusive: {fp}")
+    except yfcd.CacheLockTimeoutException:
+        pl.rlock.release()
+        with _path_locks_lock:
+            _lock_stats["timeouts"] += 1
+        raise
+    except BaseException:
+        pl.rlock.release()
+        raise
+    pl.depth += 1
+
+    wait = time.monotonic() - t0
+    with _path_locks_lock:
+        _lock_stats["acquired"] += 1
+        if waited:
+            _lock_stats["contended"] += 1
+            _lock_stats["wait_seconds"] += wait
+            _lock_stats["max_wait_seconds"] = max(_lock_stats["max_wait_seconds"], wait)
+
+    try:
+        yield
+    finally:
+        pl.depth -= 1
+        if pl.depth == 0 and pl.fd is not None:
+            fcntl.flock(pl.fd, fcntl.LOCK_UN)
+            os.close(pl.fd)
+            pl.fd = None
+            pl.exclusive = False
+        pl.rlock.release()
+
+
 def GetCacheDirpath():
     global cacheDirpath
     return cacheDirpath
@@ -58,6 +467,8 @@ def SetCacheDirpath(dp):
     global _option_manager
     _option_manager = OptionsManager()
 
+    _mem_cache.clear()
+
 
 def IsObjectInPackedData(objectName):
     for k in packed_data_cats.keys():
@@ -128,32 +539,44 @@ def GetFilepathPacked(ticker, objectName):
     return fp
 
 
+def GetMetaFilepath(ticker, objectName):
+    # Metadata & expiry are stored in small sidecar file, so can be
+    # read and updated without touching data
+    return os.path.join(get_ticker_folder_path(ticker), _MetaFileName(objectName)) + ".pkl"
+
+
+def GetDatumVersion(ticker, objectName):
+    # Changes whenever datum is written, e.g. by another process.
+    # Cheaper than reading datum.
+    fp = GetFilepath(ticker, objectName)
+    if fp is None:
+        return None
+    try:
+        st = os.stat(fp)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
 def IsDatumCached(ticker, objectName):
     if verbose:
         print("IsDatumCached({0}, {1})".format(ticker, objectName))
 
-    fp = GetFilepath(ticker, objectName)
-    if fp is None or (not os.path.isfile(fp)):
-        return False
+    with CacheLock(ticker, objectName, exclusive=False):
+        fp = GetFilepath(ticker, objectName)
+        if fp is None or (not os.path.isfile(fp)):
+            return False
 
-    if IsObjectInPackedData(objectName):
-        if os.path.isfile(fp):
-            with open(fp, 'rb') as inData:
-                packedData = pickle.load(inData)
-            return objectName in packedData.keys()
-    else:
-        if os.path.isfile(fp):
-            if os.path.getsize(fp) == 0:
-                # Corrupt
-                os.remove(fp)
-                return False
-            else:
-                return True
+        if IsObjectInPackedData(objectName):
+            packedData = _ReadPackedData(ticker, objectName)
+            return (packedData is not None) and (objectName in packedData.keys())
         else:
-            return False
+            # Read to check not corrupt. Memory cache means next read is free.
+            return _ReadData(ticker, objectName) is not None
 
 
 def _ReadData(ticker, objectName):
+    # Note: returned dict is shared with memory cache, don't modify
     d = None
 
     fp = GetFilepath(ticker, objectName)
@@ -161,11 +584,11 @@ def _ReadData(ticker, objectName):
         return None
 
     if fp.endswith(".json"):
-        with open(fp, 'r') as inData:
-            d = json.load(inData, object_hook=yfcu.JsonDecodeDict)
+        d = _LoadFile(ticker, objectName, fp, _load_json)
     else:
-        with open(fp, 'rb') as inData:
-            d = pickle.load(inData)
+        d = _LoadFile(ticker, objectName, fp, _load_pickle)
+        if d is None:
+            return None
         if not isinstance(d, dict):
             raise Exception("Pickled '{}/{}' data should be dict, but is {}".format(ticker, objectName, type(d)))
         if "data" not in d.keys():
@@ -175,16 +598,92 @@ def _ReadData(ticker, objectName):
 
 
 def _ReadPackedData(ticker, objectName):
+    # Note: returned dict is shared with memory cache, don't modify
     d = None
     fp = GetFilepath(ticker, objectName)
     if os.path.isfile(fp):
-        with open(fp, 'rb') as inData:
-            d = pickle.load(inData)
+        d = _LoadFile(ticker, _FileName(objectName), fp, _load_pickle)
+        if d is None:
+            return None
         if not isinstance(d, dict):
             raise Exception("Pickled '{}/{}' packed-data should be dict, but is {}".format(ticker, objectName, type(d)))
     return d
 
 
+def _ReadMetaFile(ticker, objectName):
+    # Note: returned dict is shared with memory cache, don't modify
+    fp = GetMetaFilepath(ticker, objectName)
+    if not os.path.isfile(fp):
+        return None
+    return _LoadFile(ticker, _MetaFileName(objectName), fp, _load_pickle)
+
+
+def _ReadMeta(ticker, objectName):
+    # Return (metadata, expiry). Note: metadata shared with memory cache, don't modify
+    m = _ReadMetaFile(ticker, objectName)
+    if m is not None:
+        if IsObjectInPackedData(objectName):
+            m = m.get(objectName, {})
+        return m.get("metadata"), m.get("expiry")
+
+    # Old layout: stored with data
+    if IsObjectInPackedData(objectName):
+        d = _ReadPackedData(ticker, objectName)
+        d = None if d is None else d.get(objectName)
+    else:
+        d = _ReadData(ticker, objectName)
+    if d is None:
+        return None, None
+    return d.get("metadata"), d.get("expiry")
+
+
+def _WriteMeta(ticker, objectName, metadata, expiry):
+    fp = GetMetaFilepath(ticker, objectName)
+    name = _MetaFileName(objectName)
+    if IsObjectInPackedData(objectName):
+        m = _ReadMetaFile(ticker, objectName)
+        if m is None:
+            # Move any old-layout metadata of other objects into sidecar
+            m = {}
+            pkData = _ReadPackedData(ticker, objectName)
+            if pkData is not None:
+                for k, objData in pkData.items():
+                    if "metadata" in objData or "expiry" in objData:
+                        m[k] = {"metadata": objData.get("metadata"), "expiry": objData.get("expiry")}
+        else:
+            m = dict(m)
+        if metadata is None and expiry is None:
+            if objectName in m:
+                del m[objectName]
+        else:
+            m[objectName] = {"metadata": metadata, "expiry": expiry}
+    else:
+        if metadata is None and expiry is None:
+            m = {}
+        else:
+            m = {"metadata": metadata, "expiry": expiry}
+
+    if len(m) == 0:
+        if os.path.isfile(fp):
+            _DeleteFile(ticker, name, fp)
+    else:
+        _WriteFile(ticker, name, fp, m)
+
+
+def _DeleteDatum(ticker, objectName, fp):
+    _DeleteFile(ticker, objectName, fp)
+    fp = GetMetaFilepath(ticker, objectName)
+    if os.path.isfile(fp):
+        _DeleteFile(ticker, _MetaFileName(objectName), fp)
+
+
+def _IsExpired(expiry):
+    if expiry is None:
+        return False
+    dtnow = pd.Timestamp.now("UTC").replace(tzinfo=ZoneInfo("UTC"))
+    return dtnow >= expiry
+
+
 def ReadCacheDatum(ticker, objectName, return_metadata_too=False):
     if verbose:
         print("ReadCacheDatum({0}, {1})".format(ticker, objectName))
@@ -192,29 +691,37 @@ def ReadCacheDatum(ticker, objectName, return_metadata_too=False):
     if IsObjectInPackedData(objectName):
         return ReadCachePackedDatum(ticker, objectName, return_metadata_too)
 
-    data = None ; md = None
-    d = _ReadData(ticker, objectName)
-    if d is not None:
-        data   = d["data"]
-        md     = d["metadata"] if "metadata" in d else None
-        expiry = d["expiry"]   if "expiry"   in d else None
-
-        if expiry is not None:
-            dtnow = pd.Timestamp.now("UTC").replace(tzinfo=ZoneInfo("UTC"))
-            if dtnow >= expiry:
+    expired = False
+    with CacheLock(ticker, objectName, exclusive=False):
+        data = None ; md = None
+        fp = GetFilepath(ticker, objectName)
+        if fp is not None and os.path.isfile(fp):
+            md, expiry = _ReadMeta(ticker, objectName)
+            expired = _IsExpired(expiry)
+        if expired:
+            md = None
+        elif fp is not None and os.path.isfile(fp):
+            d = _ReadData(ticker, objectName)
+            if d is not None:
+                data = _copy_datum(d["data"])
+                md = copy.deepcopy(md)
+                if expiry is not None:
+                    if md is None:
+                        md = {"__expiry__": expiry}
+                    else:
+                        md["__expiry__"] = expiry
+            else:
+                md = None
+
+    if expired:
+        # Exclusive lock taken after shared released, because flock()
+        # can't upgrade atomically. So re-check expiry.
+        with CacheLock(ticker, objectName):
+            fp = GetFilepath(ticker, objectName)
+            if fp is not None and os.path.isfile(fp) and _IsExpired(_ReadMeta(ticker, objectName)[1]):
                 if verbose:
                     print("Deleting expired datum '{0}/{1}'".format(ticker, objectName))
-                fp = GetFilepath(ticker, objectName)
-                os.remove(fp)
-                if return_metadata_too:
-                    return None, None
-                else:
-                    return None
-
-            if md is None:
-                md = {"__expiry__": expiry}
-            else:
-                md["__expiry__"] = expiry
+                _DeleteDatum(ticker, objectName, fp)
 
     if return_metadata_too:
         return data, md
@@ -229,32 +736,37 @@ def ReadCachePackedDatum(ticker, objectName, return_metadata_too=False):
     if not IsObjectInPackedData(objectName):
         raise Exception("Don't call packed-data function on non-packed data '{0}'".format(objectName))
 
-    data = None ; md = None
-    pkData = _ReadPackedData(ticker, objectName)
-    if (pkData is not None) and (objectName in pkData):
-        objData = pkData[objectName]
-        data   = objData["data"]
-        md     = objData["metadata"] if "metadata" in objData else None
-        expiry = objData["expiry"]   if "expiry"   in objData else None
-
-        if expiry is not None:
-            dtnow = pd.Timestamp.now("UTC").replace(tzinfo=ZoneInfo("UTC"))
-            if dtnow >= expiry:
+    expired = False
+    with CacheLock(ticker, objectName, exclusive=False):
+        data = None ; md = None
+        pkData = _ReadPackedData(ticker, objectName)
+        if (pkData is not None) and (objectName in pkData):
+            md, expiry = _ReadMeta(ticker, objectName)
+            expired = _IsExpired(expiry)
+        if expired:
+            md = None
+        elif (pkData is not None) and (objectName in pkData):
+            data = _copy_datum(pkData[objectName]["data"])
+            md = copy.deepcopy(md)
+            if expiry is not None:
+                if md is None:
+                    md = {"__expiry__": expiry}
+                else:
+                    md["__expiry__"] = expiry
+
+    if expired:
+        # Exclusive lock taken after shared released, see ReadCacheDatum()
+        with CacheLock(ticker, objectName):
+            pkData = _ReadPackedData(ticker, objectName)
+            if (pkData is not None) and (objectName in pkData) and _IsExpired(_ReadMeta(ticker, objectName)[1]):
                 if verbose:
                     print("Deleting expired packed datum '{0}/{1}'".format(ticker, objectName))
+                pkData = dict(pkData)
                 del pkData[objectName]
                 fp = GetFilepath(ticker, objectName)
-                with open(fp, 'wb') as outData:
-                    pickle.dump(pkData, outData, 4)
-                if return_metadata_too:
-                    return None, None
-                else:
-                    return None
-
-            if md is None:
-                md = {"__expiry__": expiry}
-            else:
-                md["__expiry__"] = expiry
+                _WriteFile(ticker, _FileName(objectName), fp, pkData)
+                if os.path.isfile(GetMetaFilepath(ticker, objectName)):
+                    _WriteMeta(ticker, objectName, None, None)
 
     if return_metadata_too:
         return data, md
@@ -262,14 +774,7 @@ def ReadCachePackedDatum(ticker, objectName, return_metadata_too=False):
         return data
 
 
-def StoreCacheDatum(ticker, objectName, datum, expiry=None, metadata=None):
-    if verbose:
-        print("StoreCacheDatum({0}, {1})".format(ticker, objectName))
-
-    if IsObjectInPackedData(objectName):
-        StoreCachePackedDatum(ticker, objectName, datum, metadata=metadata)
-        return
-
+def _CheckMetadataAndExpiry(metadata, expiry):
     if (metadata is not None) and not isinstance(metadata, dict):
         raise Exception("'metadata' must be dict of scalars")
     if expiry is not None:
@@ -278,52 +783,50 @@ def StoreCacheDatum(ticker, objectName, datum, expiry=None, metadata=None):
             expiry = pd.Timestamp.now("UTC").replace(tzinfo=ZoneInfo("UTC")) + yfcd.intervalToTimedelta[expiry]
         if not isinstance(expiry, datetime):
             raise Exception("'expiry' must be datetime or yfcd.Interval")
+    return expiry
+
+
+def StoreCacheDatum(ticker, objectName, datum, expiry=None, metadata=None):
+    if verbose:
+        print("StoreCacheDatum({0}, {1})".format(ticker, objectName))
+
+    if IsObjectInPackedData(objectName):
+        StoreCachePackedDatum(ticker, objectName, datum, metadata=metadata)
+        return
+
+    expiry = _CheckMetadataAndExpiry(metadata, expiry)
 
     td = get_ticker_folder_path(ticker)
-    if not os.path.isdir(td):
-        os.makedirs(td)
+    os.makedirs(td, exist_ok=True)
+
+    with CacheLock(ticker, objectName):
+        fp = GetFilepath(ticker, objectName, obj=datum, prune=True)
+        if fp is None:
+            if datum is None:
+                raise Exception(f"GetFilepath() returned None for: ticker={ticker}, objectName={objectName}, datum=None")
+            else:
+                raise Exception(f"GetFilepath() returned None for: ticker={ticker}, objectName={objectName}, datum={type(datum)}")
 
-    fp = GetFilepath(ticker, objectName, obj=datum, prune=True)
-    if fp is None:
         if datum is None:
-            raise Exception(f"GetFilepath() returned None for: ticker={ticker}, objectName={objectName}, datum=None")
-        else:
-            raise Exception(f"GetFilepath() returned None for: ticker={ticker}, objectName={objectName}, datum={type(datum)}")
+            if verbose:
+                print("- deleting {} at {}".format(objectName, fp))
+            _DeleteDatum(ticker, objectName, fp)
+            return
 
-    if datum is None:
         if verbose:
-            print("- deleting {} at {}".format(objectName, fp))
-        os.remove(fp)
-        return
+            print("- storing {} at {}".format(objectName, fp))
 
-    if verbose:
-        print("- storing {} at {}".format(objectName, fp))
+        # Persist the old metadata & expiry
+        if metadata is None or expiry is None:
+            md_old, expiry_old = _ReadMeta(ticker, objectName)
+            if metadata is None:
+                metadata = md_old
+            if expiry is None:
+                expiry = expiry_old
 
-    d = _ReadData(ticker, objectName)
-    if d is None:
-        md = None
-    else:
-        md = d["metadata"] if "metadata" in d else None
-        if expiry is None:
-            expiry = d["expiry"] if "expiry" in d else None
-
-    if metadata is None:
-        # Persist the old metadata
-        metadata = md
-
-    # Write
-    d = {"data": datum}
-    if metadata is not None:
-        d["metadata"] = metadata
-    if expiry is not None:
-        d["expiry"] = expiry
-    # TODO: use module 'safer' to avoid writes being corrupted
-    if fp.endswith(".json"):
-        with open(fp, 'w') as outData:
-            json.dump(d, outData, default=yfcu.JsonEncodeValue)
-    else:
-        with open(fp, 'wb') as outData:
-            pickle.dump(d, outData, 4)
+        # Write
+        _WriteFile(ticker, objectName, fp, {"data": datum})
+        _WriteMeta(ticker, objectName, metadata, expiry)
 
 
 def StoreCachePackedDatum(ticker, objectName, datum, expiry=None, metadata=None):
@@ -333,78 +836,45 @@ def StoreCachePackedDatum(ticker, objectName, datum, expiry=None, metadata=None)
     if not IsObjectInPackedData(objectName):
         raise Exception("Don't call packed-data function on non-packed data '{0}'".format(objectName))
 
-    if (metadata is not None):
-        if not isinstance(metadata, dict):
-            raise Exception("'metadata' must be dict of scalars")
-    if expiry is not None:
-        if isinstance(expiry, yfcd.Interval):
-            # Convert interval to actual datetime
-            expiry = pd.Timestamp.now("UTC").replace(tzinfo=ZoneInfo("UTC")) + yfcd.intervalToTimedelta[expiry]
-        if not isinstance(expiry, datetime):
-            raise Exception("'expiry' must be datetime or yfcd.Interval")
-        if (metadata is not None) and "Expiry" in metadata.keys():
-            raise Exception("'metadata' already contains 'Expiry'")
+    expiry = _CheckMetadataAndExpiry(metadata, expiry)
+    if (expiry is not None) and (metadata is not None) and "Expiry" in metadata.keys():
+        raise Exception("'metadata' already contains 'Expiry'")
 
     td = get_ticker_folder_path(ticker)
-    if not os.path.isdir(td):
-        os.makedirs(td)
+    os.makedirs(td, exist_ok=True)
 
-    # Read cached metadata
-    fp = GetFilepath(ticker, objectName)
-    pkData = _ReadPackedData(ticker, objectName)
-    if pkData is None:
-        pkData = {}
-        objData = None
-    elif objectName in pkData:
-        objData = pkData[objectName]
-        if metadata is None:
-            metadata = objData["metadata"] if "metadata" in objData else None
-        if expiry is None:
-            expiry = objData["expiry"] if "expiry" in objData else None
-    else:
-        objData = None
-        # data = None
-        # md = None
-
-    if objData is None:
-        objData = {"data": datum}
-        if metadata is not None:
-            objData["metadata"] = metadata
-        if expiry is not None:
-            objData["expiry"] = expiry
-    else:
-        objData["data"] = datum
-        if metadata is not None:
-            objData["metadata"] = metadata
-        if expiry is not None:
-            objData["expiry"] = expiry
+    with CacheLock(ticker, objectName):
+        fp = GetFilepath(ticker, objectName)
+        pkData = _ReadPackedData(ticker, objectName)
+        pkData = {} if pkData is None else dict(pkData)
+
+        # Persist the old metadata & expiry
+        if objectName in pkData and (metadata is None or expiry is None):
+            md_old, expiry_old = _ReadMeta(ticker, objectName)
+            if metadata is None:
+                metadata = md_old
+            if expiry is None:
+                expiry = expiry_old
 
-    pkData[objectName] = objData
-    with open(fp, 'wb') as outData:
-        pickle.dump(pkData, outData, 4)
+        # Sidecar must be written first, because it copies any
+        # old-layout metadata from the data file
+        _WriteMeta(ticker, objectName, metadata, expiry)
+        pkData[objectName] = {"data": datum}
+        _WriteFile(ticker, _FileName(objectName), fp, pkData)
 
 
 def ReadCacheMetadata(ticker, objectName, key):
-    md = None
-    if IsObjectInPackedData(objectName):
-        pkData = _ReadPackedData(ticker, objectName)
-        if (pkData is not None) and (objectName in pkData):
-            objData = pkData[objectName]
-            md      = objData["metadata"] if "metadata" in objData else None
-    else:
-        d = _ReadData(ticker, objectName)
-        if d is None or "metadata" not in d:
-            return None
-        md = d["metadata"]
+    with CacheLock(ticker, objectName, exclusive=False):
+        md, _ = _ReadMeta(ticker, objectName)
         if verbose:
             print("ReadCacheMetadata() read md as:")
             print(md)
-    if md is None:
-        return None
-    elif key not in md:
-        return None
-    else:
-        return md[key]
+        if md is None:
+            return None
+        elif key not in md:
+            return None
+        else:
+            return copy.deepcopy(md[key])
 
 
 def WriteCacheMetadata(ticker, objectName, key, value):
@@ -417,55 +887,52 @@ def WriteCacheMetadata(ticker, objectName, key, value):
         else:
             print(f"WriteCacheMetadata({ticker}, {objectName}, {key}) storing")
 
-    d = _ReadData(ticker, objectName)
-    if d is None:
-        d = {"data":None}
+    with CacheLock(ticker, objectName):
+        fp = GetFilepath(ticker, objectName)
+        if not os.path.isfile(fp):
+            _WriteFile(ticker, objectName, fp, {"data": None})
 
-    if "metadata" in d:
+        md, expiry = _ReadMeta(ticker, objectName)
+        md = {} if md is None else dict(md)
         if value is None:
-            if key in d["metadata"]:
-                del d["metadata"][key]
+            if key in md:
+                del md[key]
         else:
-            d["metadata"][key] = value
-    elif value is not None:
-        d["metadata"] = {key: value}
+            md[key] = value
+        if len(md) == 0:
+            md = None
 
-    if verbose:
-        print("WriteCacheMetadata() updated md to:")
-        print(d["metadata"])
+        if verbose:
+            print("WriteCacheMetadata() updated md to:")
+            print(md)
 
-    fp = GetFilepath(ticker, objectName)
-    if fp.endswith(".json"):
-        with open(fp, 'w') as outData:
-            json.dump(d, outData, default=yfcu.JsonEncodeValue)
-    else:
-        with open(fp, 'wb') as outData:
-            pickle.dump(d, outData, 4)
+        _WriteMeta(ticker, objectName, md, expiry)
 
 
 def WriteCachePackedMetadata(ticker, objectName, key, value):
     if not IsObjectInPackedData(objectName):
-        return WriteCacheMetadata(ticker, objectName)
+        return WriteCacheMetadata(ticker, objectName, key, value)
 
-    pkData = _ReadPackedData(ticker, objectName)
-    if pkData is None:
-        raise Exception("'{}/{}' not in cache, cannot add metadata".format(ticker, objectName))
-    if objectName not in pkData:
-        raise Exception("'{}/{}' not in cache, cannot add metadata".format(ticker, objectName))
+    with CacheLock(ticker, objectName):
+        pkData = _ReadPackedData(ticker, objectName)
+        if pkData is None:
+            raise Exception("'{}/{}' not in cache, cannot add metadata".format(ticker, objectName))
+        if objectName not in pkData:
+            raise Exception("'{}/{}' not in cache, cannot add metadata".format(ticker, objectName))
 
-    objData = pkData[objectName]
-    if "metadata" not in objData:
-        objData["metadata"] = {key: value}
-    else:
-        objData["metadata"][key] = value
-    fp = GetFilepath(ticker, objectName)
-    with open(fp, 'wb') as outData:
-        pickle.dump(pkData, outData, 4)
+        md, expiry = _ReadMeta(ticker, objectName)
+        md = {} if md is None else dict(md)
+        md[key] = value
+        _WriteMeta(ticker, objectName, md, expiry)
 
 
 ResetCacheDirpath()
 
 
+# Verified prices are re-verified after this long
+verify_max_age_default = '30d'
+
+
 class NestedOptions:
     def __init__(self, name, data, persistent=True):
         self.__dict__['name'] = name
@@ -479,6 +946,24 @@ class NestedOptions:
         if self.name == 'max_ages':
             # Type-check value
             pd.Timedelta(value)
+        elif self.name == 'storage' and key == 'history_format':
+            if value not in history_formats:
+                raise ValueError(f"'history_format' must be one of {history_formats}, not '{value}'")
+        elif self.name == 'storage' and key == 'checksum':
+            if not isinstance(value, bool):
+                raise ValueError(f"'checksum' must be bool, not '{value}'")
+        elif self.name == 'storage' and key == 'memory_cache_mb':
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f"'memory_cache_mb' must be number >= 0, not '{value}'")
+        elif self.name == 'calendar' and key == 'cache_mb':
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f"'cache_mb' must be number >= 0, not '{value}'")
+        elif self.name == 'rate_limits' and value is not None:
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0 or (value == 0 and key != 'max_wait'):
+                raise ValueError(f"'{key}' must be positive number or None, not '{value}'")
+        elif self.name == 'storage' and key == 'lock_timeout':
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"'lock_timeout' must be number > 0, not '{value}'")
 
         self.data[key] = value
 
@@ -492,6 +977,8 @@ class NestedOptions:
     def __repr__(self):
         return json.dumps(self.data, indent=4)
 
+_options_lock = threading.RLock()
+
 class OptionsManager:
     def __init__(self):
         self._initialised = False
@@ -515,8 +1002,14 @@ class OptionsManager:
             a.options = '1d'
             a.holdings = '91d'
             a.analysis = '91d'
+            a.verify = verify_max_age_default
             c = self.__getattr__('calendar')
             c.accept_unexpected_Yahoo_intervals = True
+            s = self.__getattr__('storage')
+            s.history_format = 'pickle'
+            s.memory_cache_mb = memory_cache_mb_default
+            s.checksum = False
+            s.lock_timeout = lock_timeout_default
             self._disable_save = False
             self._save_option()
 
@@ -526,12 +1019,18 @@ class OptionsManager:
     def _save_option(self):
         if self._disable_save:
             return
-        with open(self.option_file, 'w') as file:
+        with OpenAtomic(self.option_file, 'w') as file:
             json.dump(self.options, file, indent=4)
 
+    def _ensure_loaded(self):
+        if 'options' not in self.__dict__:
+            # Another thread may be loading
+            with _options_lock:
+                if not self._initialised:
+                    self._load_option()
+
     def __getattr__(self, key):
-        if not self._initialised:
-            self._load_option()
+        self._ensure_loaded()
 
         if key == 'session':
             # Return non-persistent NestedOptions for session category
@@ -544,8 +1043,7 @@ class OptionsManager:
             return NestedOptions(key, self.options[key], persistent=True)
 
     def __contains__(self, key):
-        if not self._initialised:
-            self._load_option()
+        self._ensure_loaded()
 
         if key == 'session':
             return True  # session category always exists
@@ -553,8 +1051,7 @@ class OptionsManager:
         return key in self.options
 
     def __repr__(self):
-        if not self._initialised:
-            self._load_option()
+        self._ensure_loaded()
 
         all_options = self.options.copy()
         if 'session' in self._tmp_options and self._tmp_options['session']:
@@ -497,6 +497,46 @@ class TimestampOutsideIntervalException(Exception):
         return (f"Failed to map '{self.ts}' to '{self.interval}' interval on exchange '{self.exchange}'")
 
 
+class CorruptCacheFileException(Exception):
+    def __init__(self, fp, reason, *args):
+        super().__init__(args)
+        self.fp = fp
+        self.reason = reason
+
+    def __str__(self):
+        return (f"Cache file '{self.fp}' is corrupt: {self.reason}")
+
+
+class CacheMissException(Exception):
+    def __init__(self, ticker, what, *args):
+        super().__init__(args)
+        self.ticker = ticker
+        self.what = what
+
+    def __str__(self):
+        return (f"{self.ticker}: must fetch {self.what} from Yahoo, but fetching disabled")
+
+
+class RateLimitException(Exception):
+    def __init__(self, category, rate, *args):
+        super().__init__(args)
+        self.category = category
+        self.rate = rate
+
+    def __str__(self):
+        return (f"Rate limit of {self.rate}/minute for '{self.category}' requests reached, and wait would exceed 'max_wait'")
+
+
+class CacheLockTimeoutException(Exception):
+    def __init__(self, fp, timeout, *args):
+        super().__init__(args)
+        self.fp = fp
+        self.timeout = timeout
+
+    def __str__(self):
+        return (f"Timed out after {self.timeout}s waiting for cache lock '{self.fp}'")
+
+
 class AmbiguousComparisonException(Exception):
     def __init__(self, value1, value2, operation, true_prob=None):
         if not isinstance(operation, str):
@@ -641,6 +681,102 @@ class DateIntervalIndex:
         return self.__str__()
 
 
+class SessionIndex:
+    # Exchange sessions as sorted int64 nanosecond arrays, so lookups are
+    # just np.searchsorted. Row 'day' is session date (tz-naive midnight),
+    # others are UTC. 'end' is close extended to end of any closing auction.
+    # Missing values (no break/auction) are NaT.
+    fields = ["day", "open", "close", "break_start", "break_end", "auction", "end"]
+    nat = np.iinfo(np.int64).min
+
+    def __init__(self, array):
+        if not isinstance(array, np.ndarray) or array.dtype != np.int64 or array.ndim != 2 or array.shape[0] != len(self.fields):
+            raise TypeError(f"'array' must be int64 np.ndarray of shape ({len(self.fields)}, n)")
+        self.array = array
+        self.days = array[0]
+        self.opens = array[1]
+        self.closes = array[2]
+        self.break_starts = array[3]
+        self.break_ends = array[4]
+        self.auctions = array[5]
+        self.ends = array[6]
+
+    @classmethod
+    def from_arrays(cls, days, opens, closes, break_starts=None, break_ends=None, auctions=None, ends=None):
+        n = len(days)
+        nats = np.full(n, cls.nat, dtype=np.int64)
+        arrays = [days, opens, closes, break_starts, break_ends, auctions, ends]
+        arrays = [nats if a is None else np.asarray(a, dtype=np.int64) for a in arrays]
+        if ends is None:
+            arrays[6] = arrays[2]
+        return cls(np.stack(arrays))
+
+    def __len__(self):
+        return self.array.shape[1]
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def years(self):
+        # First and last year. Sessions fetched in whole years
+        years = self.days[[0, -1]].astype('datetime64[ns]').astype('datetime64[Y]').astype(int) + 1970
+        return int(years[0]), int(years[1])
+
+    def covers(self, start_year, end_year):
+        if self.empty:
+            return False
+        years = self.years
+        return years[0] <= start_year and end_year <= years[1]
+
+    def get_day_indexer(self, days):
+        # Index of session on each day, -1 if none
+        days = np.atleast_1d(np.asarray(days, dtype=np.int64))
+        idx = np.searchsorted(self.days, days)
+        f = idx < len(self)
+        f[f] = self.days[idx[f]] == days[f]
+        return np.where(f, idx, -1)
+
+    def get_day_range(self, start_day, end_day):
+        # Slice of sessions with start_day <= day < end_day
+        return np.searchsorted(self.days, start_day), np.searchsorted(self.days, end_day)
+
+    def get_session_indexer(self, ts):
+        # Index of session active at each ts, -1 if none
+        ts = np.atleast_1d(np.asarray(ts, dtype=np.int64))
+        idx = np.searchsorted(self.opens, ts, side="right") - 1
+        f = idx >= 0
+        f[f] = ts[f] < self.ends[idx[f]]
+        return np.where(f, idx, -1)
+
+    def get_prev_indexer(self, ts):
+        # Index of last session opening at/before each ts, -1 if none
+        return np.searchsorted(self.opens, np.atleast_1d(np.asarray(ts, dtype=np.int64)), side="right") - 1
+
+    def get_next_indexer(self, ts):
+        # Index of first session opening after each ts, -1 if none
+        idx = np.searchsorted(self.opens, np.atleast_1d(np.asarray(ts, dtype=np.int64)), side="right")
+        return np.where(idx < len(self), idx, -1)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice) or isinstance(i, np.ndarray):
+            return SessionIndex(self.array[:, i])
+        return {f: self.array[j, i] for j, f in enumerate(self.fields)}
+
+    def __setitem__(self, i, v):
+        raise Exception("immutable")
+
+    def __str__(self):
+        if self.empty:
+            return "SessionIndex([])"
+        d0, d1 = self.days[[0, -1]].astype('datetime64[ns]').astype('datetime64[D]')
+        return f"SessionIndex({len(self)} sessions {d0} -> {d1})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
 def uniform_prob_lt(X, Y):
 
     def is_scalar(val):
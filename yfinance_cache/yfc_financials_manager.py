@@ -3,6 +3,7 @@ import yfinance as yf
 from . import yfc_dat as yfcd
 from . import yfc_cache_manager as yfcm
 from . import yfc_utils as yfcu
+from . import yfc_rate_limit as yfcrl
 
 import numpy as np
 import pandas as pd
@@ -610,6 +611,7 @@ class FinancialsManager:
                 if md is not None:
                     msg += f" (last fetch = {md['LastFetch']})"
                 print(msg)
+            yfcrl.Acquire("fundamentals")
             df_new = getattr(self.dat, name)
             df_new = df_new.astype('float')
             fetch_dt = pd.Timestamp.now("UTC").tz_convert(self.tzName)
@@ -2178,6 +2180,8 @@ class FinancialsManager:
                     if self._earnings_dates.empty:
                         self._earnings_dates = None
                     else:
+                        # Cached table is read-only, modified in-place below
+                        self._earnings_dates = self._earnings_dates.copy()
                         if not isinstance(self._earnings_dates.index, pd.DatetimeIndex):
                             # timezones mixed up
                             tz = self._earnings_dates.index[0].tzinfo
@@ -2466,6 +2470,7 @@ class FinancialsManager:
 
         repeat_fetch = False
         try:
+            yfcrl.Acquire("fundamentals")
             df = self.dat.get_earnings_dates(int(limit))
             if df is None or not isinstance(df.index, pd.DatetimeIndex):
                 repeat_fetch = True
@@ -2480,6 +2485,7 @@ class FinancialsManager:
             sleep(2)
             # Avoid cache this time, but add sleeps to maintain rate-limiting
             try:
+                yfcrl.Acquire("fundamentals")
                 df = yf.Ticker(self.ticker).get_earnings_dates(int(limit))
                 if df is not None and not isinstance(df.index, pd.DatetimeIndex):
                     df = None
@@ -2528,7 +2534,8 @@ class FinancialsManager:
 
         if self._calendars is None:
             if yfcm.IsDatumCached(self.ticker, "calendars"):
-                self._calendars = yfcm.ReadCacheDatum(self.ticker, "calendars")
+                # Cached table is read-only, modified in-place below
+                self._calendars = yfcm.ReadCacheDatum(self.ticker, "calendars").copy()
                 self._calendar = self._calendars.iloc[-1].to_dict()
                 self._calendar_clean = dict(self._calendar)
                 for k in list(self._calendar_clean.keys()):
@@ -2561,6 +2568,7 @@ class FinancialsManager:
                 msg += f" (last fetch = {self._calendar['FetchDate'].date()})"
             print(msg)
 
+        yfcrl.Acquire("fundamentals")
         c = self.dat.calendar
         fetchDate = pd.Timestamp.now()
 
@@ -0,0 +1,477 @@
+import os
+import re
+import shutil
+import pickle
+import json
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from . import yfc_cache_manager as yfcm
+from . import yfc_utils as yfcu
+
+# Storage of price tables ("history-<interval>"). Pickle stores whole table in
+# one file via cache manager. Other formats store a folder of segment files,
+# so an update only writes new & changed rows. Parquet and Feather are columnar
+# so reads can select columns, but need module 'pyarrow'.
+
+history_formats = yfcm.history_formats
+history_format_default = "pickle"
+
+segment_exts = {"segmented": "pkl", "parquet": "parquet", "feather": "feather"}
+_segment_re = re.compile(r"^part-(\d+)-(\d+)\.(\w+)$")
+segments_compact_threshold = 16
+
+verbose = False
+# verbose = True
+
+
+def GetHistoryFormat():
+    fmt = yfcm._option_manager.storage.history_format
+    if fmt is None:
+        fmt = history_format_default
+    if fmt not in history_formats:
+        raise Exception(f"yfc.options.storage.history_format must be one of {history_formats}, not '{fmt}'")
+    return fmt
+
+
+def _to_zoneinfo(df):
+    # Arrow restores timezones via tz string, which Pandas can map to pytz.
+    # YFC works with ZoneInfo, so restore that.
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is not None:
+        if not isinstance(df.index.tz, ZoneInfo):
+            df.index = df.index.tz_convert(ZoneInfo(str(df.index.tz)))
+    for c in df.columns:
+        dt = df[c].dtype
+        if isinstance(dt, pd.DatetimeTZDtype) and not isinstance(dt.tz, ZoneInfo):
+            df[c] = df[c].dt.tz_convert(ZoneInfo(str(dt.tz)))
+    return df
+
+
+def _slice(df, start, end):
+    if start is None and end is None:
+        return df
+    i0 = 0 if start is None else df.index.searchsorted(start, side="left")
+    i1 = df.shape[0] if end is None else df.index.searchsorted(end, side="left")
+    return df.iloc[i0:i1]
+
+
+def _file_version(fp):
+    # Changes whenever file is replaced
+    if fp is None:
+        return None
+    try:
+        st = os.stat(fp)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+class PickleHistoryBackend:
+    name = "pickle"
+
+    def is_cached(self, ticker, key):
+        return yfcm.IsDatumCached(ticker, key)
+
+    def read(self, ticker, key, columns=None, start=None, end=None):
+        df = yfcm.ReadCacheDatum(ticker, key)
+        if df is None:
+            return None
+        df = _slice(df, start, end)
+        if columns is not None:
+            df = df[columns]
+        # Cached table is read-only, price managers modify in-place
+        return df.copy()
+
+    def num_rows(self, ticker, key):
+        df = yfcm.ReadCacheDatum(ticker, key)
+        return 0 if df is None else df.shape[0]
+
+    def version(self, ticker, key):
+        return _file_version(yfcm.GetFilepath(ticker, key))
+
+    def write(self, ticker, key, df):
+        if df is None:
+            if yfcm.IsDatumCached(ticker, key):
+                yfcm.StoreCacheDatum(ticker, key, None)
+            return
+        yfcm.StoreCacheDatum(ticker, key, df)
+
+    def replace_tail(self, ticker, key, df, n_keep, expected_nrows):
+        # Pickle cannot append, so whole table is rewritten
+        h = yfcm.ReadCacheDatum(ticker, key)
+        nrows = 0 if h is None else h.shape[0]
+        if nrows != expected_nrows:
+            return False
+        if n_keep == nrows and df.empty:
+            return True
+        h = df if h is None else pd.concat([h.iloc[:n_keep], df])
+        yfcm.StoreCacheDatum(ticker, key, h)
+        return True
+
+    def compact(self, ticker, key):
+        pass
+
+    def delete(self, ticker, key):
+        self.write(ticker, key, None)
+
+
+class SegmentedHistoryBackend:
+    # Table stored as folder of segment files. Each segment sorted by index,
+    # and segments don't overlap. Filename also records #rows:
+    # "part-<seq>-<nrows>.<ext>"
+    #
+    # File "manifest.json" lists current segments in order. Replacing it is
+    # the commit, so if process killed mid-update the table is still valid.
+    # Files not in manifest are garbage from old or interrupted updates.
+    #
+    # Rows not final yet (Final? = False) are kept in separate tail segment,
+    # so a refresh only rewrites that small segment. When too many segments
+    # accumulate, all except tail are merged.
+
+    def __init__(self, fmt):
+        if fmt not in segment_exts:
+            raise Exception(f"Segmented format must be one of {list(segment_exts.keys())}, not '{fmt}'")
+        if fmt in ["parquet", "feather"]:
+            try:
+                import pyarrow  # noqa: F401
+            except ModuleNotFoundError:
+                raise Exception(f"Install Python module 'pyarrow' to store price history as {fmt}")
+        self.name = fmt
+        self.ext = segment_exts[fmt]
+
+    def _dirpath(self, ticker, key):
+        return os.path.join(yfcm.get_ticker_folder_path(ticker), key)
+
+    def _parts(self, ticker, key):
+        # Return list of (filepath, seq, nrows)
+        dp = self._dirpath(ticker, key)
+        manifest_fp = os.path.join(dp, "manifest.json")
+        if not os.path.isfile(manifest_fp):
+            return []
+        with open(manifest_fp, 'r') as f:
+            names = json.load(f)["parts"]
+        parts = []
+        for f in names:
+            m = _segment_re.match(f)
+            if m is None or m.group(3) != self.ext:
+                # Different format
+                return []
+            parts.append((os.path.join(dp, f), int(m.group(1)), int(m.group(2))))
+        return parts
+
+    def _next_seq(self, ticker, key):
+        seq = -1
+        for f in os.listdir(self._dirpath(ticker, key)):
+            m = _segment_re.match(f)
+            if m is not None:
+                seq = max(seq, int(m.group(1)))
+        return seq + 1
+
+    def _commit(self, ticker, key, names):
+        dp = self._dirpath(ticker, key)
+        with yfcm.OpenAtomic(os.path.join(dp, "manifest.json"), 'w') as f:
+            json.dump({"parts": names}, f)
+        for f in os.listdir(dp):
+            if f != "manifest.json" and f not in names:
+                os.remove(os.path.join(dp, f))
+
+    def _read_schema(self, fp):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self.ext == "parquet":
+            return pq.read_schema(fp)
+        with pa.memory_map(fp, 'r') as source:
+            return pa.ipc.open_file(source).schema
+
+    def _read_part(self, fp, columns, start, end):
+        if self.ext == "pkl":
+            with open(fp, 'rb') as f:
+                df = pickle.load(f)
+            df = _slice(df, start, end)
+            if columns is not None:
+                df = df[columns]
+            return df
+
+        import pyarrow.parquet as pq
+        import pyarrow.feather as pf
+        if self.ext == "parquet":
+            filters = None
+            if start is not None or end is not None:
+                idx_col = self._read_schema(fp).pandas_metadata["index_columns"][0]
+                filters = []
+                if start is not None:
+                    filters.append((idx_col, ">=", pd.Timestamp(start)))
+                if end is not None:
+                    filters.append((idx_col, "<", pd.Timestamp(end)))
+            tbl = pq.read_table(fp, columns=columns, filters=filters, use_pandas_metadata=True)
+        else:
+            if columns is not None:
+                columns = columns + self._read_schema(fp).pandas_metadata["index_columns"]
+            tbl = pf.read_table(fp, columns=columns, memory_map=True)
+        df = tbl.to_pandas()
+        if self.ext != "parquet":
+            df = _slice(df, start, end)
+        return _to_zoneinfo(df)
+
+    def _write_part(self, ticker, key, seq, df):
+        name = f"part-{seq:05d}-{df.shape[0]}.{self.ext}"
+        fp = os.path.join(self._dirpath(ticker, key), name)
+        if self.ext == "pkl":
+            with yfcm.OpenAtomic(fp, 'wb') as f:
+                pickle.dump(df, f, 4)
+            return name
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tbl = pa.Table.from_pandas(df, preserve_index=True)
+        with yfcm.OpenAtomic(fp, 'wb') as f:
+            if self.ext == "parquet":
+                pq.write_table(tbl, f)
+            else:
+                # Feather V2 = Arrow IPC file
+                with pa.ipc.new_file(f, tbl.schema) as writer:
+                    writer.write_table(tbl)
+        return name
+
+    def _write_parts(self, ticker, key, seq, df):
+        # Write rows as new segments starting at 'seq', with
+        # non-final rows separated into tail segment.
+        # Return segment filenames.
+        if df.empty:
+            return []
+        i = df.shape[0]
+        if "Final?" in df.columns:
+            f_nfinal = ~(df["Final?"].to_numpy().astype(bool))
+            if f_nfinal.any():
+                i = int(np.argmax(f_nfinal))
+        names = []
+        if i > 0:
+            names.append(self._write_part(ticker, key, seq, df.iloc[:i]))
+            seq += 1
+        if i < df.shape[0]:
+            names.append(self._write_part(ticker, key, seq, df.iloc[i:]))
+        return names
+
+    def is_cached(self, ticker, key):
+        return len(self._parts(ticker, key)) > 0
+
+    def read(self, ticker, key, columns=None, start=None, end=None):
+        parts = self._parts(ticker, key)
+        if len(parts) == 0:
+            return None
+        dfs = [self._read_part(p[0], columns, start, end) for p in parts]
+        dfs_ne = [df for df in dfs if not df.empty]
+        if len(dfs_ne) == 0:
+            return dfs[0].iloc[0:0]
+        elif len(dfs_ne) == 1:
+            return dfs_ne[0]
+        else:
+            return pd.concat(dfs_ne)
+
+    def version(self, ticker, key):
+        return _file_version(os.path.join(self._dirpath(ticker, key), "manifest.json"))
+
+    def num_rows(self, ticker, key):
+        return sum(p[2] for p in self._parts(ticker, key))
+
+    def write(self, ticker, key, df):
+        dp = self._dirpath(ticker, key)
+        if df is None:
+            if os.path.isdir(dp):
+                shutil.rmtree(dp)
+            return
+        if not os.path.isdir(dp):
+            os.makedirs(dp)
+        names = self._write_parts(ticker, key, self._next_seq(ticker, key), df)
+        self._commit(ticker, key, names)
+
+    def replace_tail(self, ticker, key, df, n_keep, expected_nrows):
+        parts = self._parts(ticker, key)
+        if len(parts) == 0:
+            if expected_nrows != 0:
+                return False
+            if not df.empty:
+                self.write(ticker, key, df)
+            return True
+        if sum(p[2] for p in parts) != expected_nrows:
+            # Cache was changed elsewhere
+            return False
+        if n_keep == expected_nrows and df.empty:
+            return True
+
+        # Find first segment containing replaced rows
+        ends = np.cumsum([p[2] for p in parts])
+        i = int(np.searchsorted(ends, n_keep, side='right'))
+        if i < len(parts):
+            n_before = 0 if i == 0 else int(ends[i-1])
+            if n_keep > n_before:
+                # Segment partly replaced, so keep its head
+                head = self._read_part(parts[i][0], None, None, None).iloc[:n_keep-n_before]
+                df = pd.concat([head, df])
+        names = [os.path.basename(p[0]) for p in parts[:i]]
+        names += self._write_parts(ticker, key, self._next_seq(ticker, key), df)
+        self._commit(ticker, key, names)
+
+        if len(names) > segments_compact_threshold:
+            self.compact(ticker, key)
+        return True
+
+    def compact(self, ticker, key):
+        # Merge all segments except tail
+        parts = self._parts(ticker, key)
+        if len(parts) <= 2:
+            return
+        df_tail = self._read_part(parts[-1][0], None, None, None)
+        if "Final?" in df_tail.columns and not df_tail["Final?"].all():
+            to_merge = parts[:-1]
+        else:
+            to_merge = parts
+        if len(to_merge) <= 1:
+            return
+        df = pd.concat([self._read_part(p[0], None, None, None) for p in to_merge])
+        names = [self._write_part(ticker, key, self._next_seq(ticker, key), df)]
+        names += [os.path.basename(p[0]) for p in parts[len(to_merge):]]
+        self._commit(ticker, key, names)
+
+    def delete(self, ticker, key):
+        self.write(ticker, key, None)
+
+
+def GetHistoryBackend(fmt=None):
+    if fmt is None:
+        fmt = GetHistoryFormat()
+    if fmt == "pickle":
+        return PickleHistoryBackend()
+    else:
+        return SegmentedHistoryBackend(fmt)
+
+
+def _GetOtherBackends(fmt):
+    backends = []
+    for f in history_formats:
+        if f == fmt:
+            continue
+        try:
+            backends.append(GetHistoryBackend(f))
+        except Exception as e:
+            if "pyarrow" not in str(e):
+                raise
+    return backends
+
+
+def MigrateHistory(ticker, key, fmt=None):
+    # Move table into format 'fmt', from whatever format it is stored in.
+    # Return True if a table was moved.
+    with yfcm.CacheLock(ticker, key):
+        if fmt is None:
+            fmt = GetHistoryFormat()
+        backend = GetHistoryBackend(fmt)
+        for b in _GetOtherBackends(fmt):
+            if b.is_cached(ticker, key):
+                if verbose:
+                    print(f"Migrating {ticker}/{key} from {b.name} to {fmt}")
+                df = b.read(ticker, key)
+                if backend.is_cached(ticker, key):
+                    raise Exception(f"{ticker}/{key} is stored as both {b.name} and {fmt}")
+                backend.write(ticker, key, df)
+                b.delete(ticker, key)
+                return True
+        return False
+
+
+def IsHistoryCached(ticker, key):
+    with yfcm.CacheLock(ticker, key, exclusive=False):
+        backend = GetHistoryBackend()
+        if backend.is_cached(ticker, key):
+            return True
+        if not os.path.isdir(yfcm.get_ticker_folder_path(ticker)):
+            return False
+        migrate = any(b.is_cached(ticker, key) for b in _GetOtherBackends(backend.name))
+    if not migrate:
+        return False
+    # Shared lock released first, MigrateHistory takes exclusive lock up
+    # front because flock() can't upgrade atomically. Re-checks inside.
+    return MigrateHistory(ticker, key) or backend.is_cached(ticker, key)
+
+
+def ReadCacheHistory(ticker, key, columns=None, start=None, end=None):
+    if columns is not None:
+        yfcu.TypeCheckIterable(columns, "columns")
+        columns = list(columns)
+    if not IsHistoryCached(ticker, key):
+        return None
+    with yfcm.CacheLock(ticker, key, exclusive=False):
+        backend = GetHistoryBackend()
+        if not backend.is_cached(ticker, key):
+            return None
+        return backend.read(ticker, key, columns, start, end)
+
+
+def StoreCacheHistory(ticker, key, df):
+    if df is not None:
+        yfcu.TypeCheckDataFrame(df, "df")
+    backend = GetHistoryBackend()
+    with yfcm.CacheLock(ticker, key):
+        if not backend.is_cached(ticker, key):
+            # Discard any copy in other format
+            for b in _GetOtherBackends(backend.name):
+                if b.is_cached(ticker, key):
+                    b.delete(ticker, key)
+        td = yfcm.get_ticker_folder_path(ticker)
+        if df is not None:
+            os.makedirs(td, exist_ok=True)
+        backend.write(ticker, key, df)
+
+
+def ReplaceCacheHistoryTail(ticker, key, df, n_keep, expected_nrows):
+    # Keep first 'n_keep' rows of cached table and replace rest with 'df',
+    # if cached table has 'expected_nrows' rows. Segmented formats only
+    # write the replaced segments.
+    # Return False if could not, then caller should store entire table.
+    yfcu.TypeCheckDataFrame(df, "df")
+    yfcu.TypeCheckInt(n_keep, "n_keep")
+    yfcu.TypeCheckInt(expected_nrows, "expected_nrows")
+    if n_keep > expected_nrows:
+        raise Exception(f"n_keep={n_keep} cannot exceed expected_nrows={expected_nrows}")
+    backend = GetHistoryBackend()
+    with yfcm.CacheLock(ticker, key):
+        if not backend.is_cached(ticker, key):
+            MigrateHistory(ticker, key)
+        td = yfcm.get_ticker_folder_path(ticker)
+        os.makedirs(td, exist_ok=True)
+        return backend.replace_tail(ticker, key, df, n_keep, expected_nrows)
+
+
+def AppendCacheHistory(ticker, key, df, expected_nrows):
+    # Append rows to end of cached table, if cached table has 'expected_nrows' rows.
+    # Return False if could not append, then caller should store entire table.
+    return ReplaceCacheHistoryTail(ticker, key, df, expected_nrows, expected_nrows)
+
+
+def CompactCacheHistory(ticker, key):
+    with yfcm.CacheLock(ticker, key):
+        if IsHistoryCached(ticker, key):
+            GetHistoryBackend().compact(ticker, key)
+
+
+def GetHistoryVersion(ticker, key):
+    # Changes whenever cached table is written, e.g. by another process
+    return GetHistoryBackend().version(ticker, key)
+
+
+def HashHistoryRows(df):
+    # Hash each row including index, to cheaply detect which rows changed
+    if df is None:
+        return None
+    return pd.util.hash_pandas_object(df, index=True).to_numpy()
+
+
+def CountUnchangedRows(hashes_old, hashes_new):
+    # How many leading rows are identical
+    if hashes_old is None or hashes_new is None:
+        return 0
+    n = min(len(hashes_old), len(hashes_new))
+    diff = np.flatnonzero(hashes_old[:n] != hashes_new[:n])
+    return n if len(diff) == 0 else int(diff[0])
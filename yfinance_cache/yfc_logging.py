@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 
 from . import yfc_cache_manager as yfcm
 
@@ -22,14 +23,17 @@ def IsLoggingEnabled():
     return yfc_logging_mode is not None
 
 loggers = {}
+_loggers_lock = threading.Lock()
 def GetLogger(tkr):
+    with _loggers_lock:
+        return _GetLogger(tkr)
+def _GetLogger(tkr):
     if tkr in loggers:
         return loggers[tkr]
 
     global yfc_logging_mode
     tkr_dp = os.path.join(yfcm.GetCacheDirpath(), tkr)
-    if not os.path.isdir(tkr_dp):
-        os.mkdir(tkr_dp)
+    os.makedirs(tkr_dp, exist_ok=True)
 
     log_fp = os.path.join(tkr_dp, "events.log")
     formatter = logging.Formatter(fmt='%(asctime)s %(levelname)-8s %(message)s',
@@ -1,13 +1,24 @@
 import multiprocessing
+import concurrent.futures
 from functools import partial
 import traceback, sys
+import warnings
+
+from datetime import timedelta
+from zoneinfo import ZoneInfo
 
 import pandas as pd
 import numpy as np
+import yfinance as yf
 
 from . import yfc_ticker
 from . import yfc_utils as yfcu
 from . import yfc_dat as yfcd
+from . import yfc_time as yfct
+from . import yfc_cache_manager as yfcm
+from . import yfc_history_store as yfhs
+from . import yfc_prices_manager as yfcp
+from . import yfc_rate_limit as yfcrl
 
 _progress_queue = None
 
@@ -18,6 +29,7 @@ def reinitialize_locks(locks, progress_queue=None):
 
 def download(tickers,
             threads=True, ignore_tz=None, 
+            executor='process',  # run 'threads' workers as processes or threads
             progress=True,
             interval="1d", group_by='column',
             max_age=None,  # defaults to half of interval
@@ -27,22 +39,25 @@ def download(tickers,
             keepna=False,
             proxy=None, rounding=False,
             debug=True, quiet=False,
-            trigger_at_market_close=False, session=None):
+            trigger_at_market_close=False, session=None,
+            batch=True,  # refresh cached tickers with grouped yf.download calls
+            return_format='wide'):  # 'wide' table, 'long' table indexed by ticker & date, or 'dict' of tables
+
+    if executor not in ['process', 'thread']:
+        raise ValueError(f"'executor' must be 'process' or 'thread', not '{executor}'")
+
+    if return_format not in ['wide', 'long', 'dict']:
+        raise ValueError(f"'return_format' must be 'wide', 'long' or 'dict', not '{return_format}'")
 
     if proxy is not None:
-        import yfinance as yf
         yf.config.network.proxy = proxy
         warnings.warn("Set proxy via new config control: yf.config.network.proxy = proxy", DeprecationWarning, stacklevel=3)
 
-    if ignore_tz is None:
-        # Set default value depending on interval
-        ignore_tz = interval[-1] not in ['m', 'h']
-        if (start is None) and (end is None) and (period is None):
-            period = "5d"
+    tickers, ignore_tz, period = _prepare_args(tickers, ignore_tz, interval, period, start, end)
 
-    # create ticker list
-    tickers = tickers if isinstance(tickers, (list, set, tuple)) else tickers.replace(',', ' ').split()
-    tickers = list(set([ticker.upper() for ticker in tickers]))
+    prefetched = {}
+    if batch and len(tickers) > 1:
+        prefetched = _prefetch_prices(tickers, interval, end, max_age, session)
 
     if progress:
         try:
@@ -51,7 +66,35 @@ def download(tickers,
         except Exception:
             have_tqdm = False
 
-    if threads:
+    if threads and executor == 'thread':
+        if threads is True:
+            threads = multiprocessing.cpu_count()
+        # Results stay in this process, so no pickling them back
+        # from workers. Locks default to thread locks.
+        partial_func = partial(download_one,
+                                period=period, interval=interval,
+                                max_age=max_age,
+                                start=start, end=end, prepost=prepost,
+                                actions=actions, adjust_divs=adjust_divs,
+                                adjust_splits=adjust_splits, keepna=keepna,
+                                rounding=rounding, session=session)
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = {pool.submit(partial_func, tkr, prefetched=prefetched.get(tkr)): tkr for tkr in tickers}
+            r = concurrent.futures.as_completed(futures)
+            if progress and have_tqdm:
+                r = tqdm.tqdm(r, total=len(tickers))
+            try:
+                for i, f in enumerate(r):
+                    results[futures[f]] = f.result()
+                    if progress and not have_tqdm:
+                        yfcu.display_progress_bar(i + 1, len(tickers))
+            except BaseException:
+                for f in futures:
+                    f.cancel()
+                raise
+        dfs = {tkr:results[tkr] for tkr in tickers}
+    elif threads:
         if threads is True:
             threads = multiprocessing.cpu_count()
         # Make every multiprocessing primitive from the same context.  This
@@ -59,9 +102,14 @@ def download(tickers,
         # the application (spawn, forkserver, or fork).
         ctx = multiprocessing.get_context()
         locks = {e: ctx.Lock() for e in yfcd.exchangeToXcalExchange}
+        # Build exchange sessions once here, workers memory-map them
+        for exchange, d in _sessions_start(tickers, start).items():
+            yfct.PrepareSharedSessionIndexes([exchange], start_d=d)
+        # Each task carries only its ticker's prefetched prices
+        tasks = [(tkr, prefetched.get(tkr)) for tkr in tickers]
         if progress:
             queue = ctx.Queue()
-            partial_func = partial(download_one_parallel,
+            partial_func = partial(_download_task, download_one_parallel,
                                     period=period, interval=interval,
                                     max_age=max_age,
                                     start=start, end=end, prepost=prepost,
@@ -69,7 +117,7 @@ def download(tickers,
                                     adjust_splits=adjust_splits, keepna=keepna,
                                     rounding=rounding, session=session)
             with ctx.Pool(processes=threads, initializer=reinitialize_locks, initargs=(locks, queue)) as pool:
-                result_async = pool.map_async(partial_func, tickers)
+                result_async = pool.map_async(partial_func, tasks)
 
                 if have_tqdm:
                     r = tqdm.tqdm(tickers)
@@ -85,7 +133,7 @@ def download(tickers,
                         yfcu.display_progress_bar(i + 1, len(tickers))
                 results = result_async.get()
         else:
-            partial_func = partial(download_one, 
+            partial_func = partial(_download_task, download_one,
                                     period=period, interval=interval,
                                     max_age=max_age,
                                     start=start, end=end, prepost=prepost,
@@ -93,7 +141,7 @@ def download(tickers,
                                     adjust_splits=adjust_splits, keepna=keepna,
                                     rounding=rounding, session=session)
             with ctx.Pool(processes=threads, initializer=reinitialize_locks, initargs=(locks,)) as pool:
-                results = pool.map(partial_func, tickers)
+                results = pool.map(partial_func, tasks)
         dfs = {tickers[i]:results[i] for i in range(len(tickers))}
     else:
         dfs = {}
@@ -102,44 +150,212 @@ def download(tickers,
                      'start':start, 'end':end, 'prepost':prepost,
                      'actions':actions, 'adjust_divs':adjust_divs,
                      'adjust_splits':adjust_splits, 'keepna':keepna,
-                     'rounding':rounding}
+                     'rounding':rounding, 'session':session}
         if progress:
             if have_tqdm:
                 for tkr in tqdm.tqdm(tickers):
-                    df = yfc_ticker.Ticker(tkr, session=session).history(**hist_args)
+                    df = download_one(tkr, prefetched=prefetched.get(tkr), **hist_args)
                     dfs[tkr] = df
             else:
                 for i in range(len(tickers)):
                     tkr = tickers[i]
-                    df = yfc_ticker.Ticker(tkr, session=session).history(**hist_args)
+                    df = download_one(tkr, prefetched=prefetched.get(tkr), **hist_args)
                     dfs[tkr] = df
                     yfcu.display_progress_bar(i + 1, len(tickers))
         else:
             for i in range(len(tickers)):
                 tkr = tickers[i]
-                df = yfc_ticker.Ticker(tkr, session=session).history(**hist_args)
+                df = download_one(tkr, prefetched=prefetched.get(tkr), **hist_args)
                 dfs[tkr] = df
 
-    
-    if len(tickers) == 1:
-        ticker = tickers[0]
-        return dfs[ticker]
+    return _combine_dfs(dfs, tickers, ignore_tz, group_by, return_format)
+
+
+def _prepare_args(tickers, ignore_tz, interval, period, start, end):
+    if ignore_tz is None:
+        # Set default value depending on interval
+        ignore_tz = interval[-1] not in ['m', 'h']
+        if (start is None) and (end is None) and (period is None):
+            period = "5d"
+
+    # create ticker list
+    tickers = tickers if isinstance(tickers, (list, set, tuple)) else tickers.replace(',', ' ').split()
+    tickers = list(set([ticker.upper() for ticker in tickers]))
+
+    return tickers, ignore_tz, period
+
+
+def _sessions_start(tickers, start):
+    # Earliest date workers need each exchange's sessions from: 'start',
+    # else earliest listing date of its tickers. None if unknown.
+    # Only reads cache, tickers not cached will fetch anyway.
+    starts = {}
+    for tkr in tickers:
+        info = yfcm.ReadCacheDatum(tkr, "info")
+        if info is None or 'exchange' not in info:
+            continue
+        exchange = info['exchange']
+        if start is not None:
+            d = pd.Timestamp(start).date()
+        else:
+            hist_md = yfcm.ReadCacheDatum(tkr, "history_metadata")
+            d = None if hist_md is None else hist_md.get('listingDate')
+        if exchange not in starts:
+            starts[exchange] = d
+        elif d is not None:
+            starts[exchange] = d if starts[exchange] is None else min(starts[exchange], d)
+    return starts
+
+
+def _find_missing_range(ticker, end, max_age):
+    # Return (start, end, tz name) of dates missing from end of ticker's
+    # cached daily prices, or None if ticker not suitable for batching:
+    # - table not cached or up-to-date
+    # - no Yahoo currency cached, i.e. not fetched since batching added
+    # - more than 14 days behind, let PriceHistory fetch with its own padding & checks
+    if not yfhs.IsHistoryCached(ticker, "history-1d"):
+        return None
+    hist_md = yfcm.ReadCacheDatum(ticker, "history_metadata")
+    if hist_md is None or 'yf_currency' not in hist_md:
+        # Don't know how to scale Yahoo currency
+        return None
+    info = yfcm.ReadCacheDatum(ticker, "info")
+    if info is None or 'exchange' not in info or 'exchangeTimezoneName' not in info:
+        return None
+    exchange, tz_name = info['exchange'], info['exchangeTimezoneName']
+    yfct.SetExchangeTzName(exchange, tz_name)
+    tz = ZoneInfo(tz_name)
+    interval = yfcd.Interval.Days1
+
+    h = yfhs.ReadCacheHistory(ticker, "history-1d", columns=['Close', 'Final?', 'Repaired?', 'FetchDate'])
+    if h is None or h.empty:
+        return None
 
-    reindex_dfs(dfs, ignore_tz)
+    # Same expiry as PriceHistory: cached table valid up to first
+    # non-final row, unless that row still fresh.
+    f_nfinal = ~(h['Final?'].to_numpy().astype(bool))
+    n_valid = h.shape[0]
+    if f_nfinal.any():
+        idx0 = np.where(f_nfinal)[0][0]
+        fetch_dt = yfct.ConvertToDatetime(h['FetchDate'].iloc[idx0], tz=tz)
+        dt_now = pd.Timestamp.now("UTC")
+        if np.isnan(h['Close'].iloc[idx0]):
+            expired = (fetch_dt + max_age) < dt_now
+        else:
+            expired = yfct.IsPriceDatapointExpired(h.index[idx0].date(), fetch_dt, bool(h['Repaired?'].iloc[idx0]), max_age, exchange, interval)
+        if expired:
+            n_valid = idx0
+
+    d_now = pd.Timestamp.now(tz).date()
+    range_end = d_now + timedelta(days=1)
+    if end is not None:
+        range_end = min(range_end, pd.Timestamp(end).date())
+    range_start = h.index[n_valid-1].date() if n_valid > 0 else h.index[0].date()
+    if range_end <= range_start or (range_end - range_start) > timedelta(days=14):
+        # Not a top-up, leave to ticker
+        return None
+    known = h.index[:n_valid].date
+    known = known[known >= range_start]
+    ranges = yfct.IdentifyMissingIntervalRanges(exchange, range_start, range_end, interval, known)
+    if ranges is None:
+        return None
+    # Pad like PriceHistory, which fetches from session before
+    start_d = pd.Timestamp(ranges[0][0]).date() - timedelta(days=7)
+    end_d = max(pd.Timestamp(ranges[-1][1]).date(), range_end)
+    return start_d, end_d, tz_name
+
+
+def _prefetch_prices(tickers, interval, end, max_age, session):
+    # Cached tickers usually only need the same last few days fetched.
+    # So find each ticker's missing range, group tickers with identical
+    # range, and fetch each group with one yf.download(). Each ticker's
+    # PriceHistory then uses its slice instead of fetching from Yahoo,
+    # and processes it as normal (repair, adjust, store). Tickers not
+    # batched (see _find_missing_range) just fetch themselves.
+    # Returns dict: ticker -> (start, end, DataFrame, Yahoo currency)
+    if interval != '1d' or yfcm._option_manager.session.offline:
+        return {}
     try:
-        data = pd.concat(dfs.values(), axis=1, sort=True, keys=dfs.keys())
-    except Exception:
-        reindex_dfs(dfs)
-        data = pd.concat(dfs.values(), axis=1, sort=True, keys=dfs.keys())
+        yfcu.CheckFetchAllowed(None, "prices")
+    except yfcd.CacheMissException:
+        return {}
 
-    if group_by == 'column':
-        data.columns = data.columns.swaplevel(0, 1)
-        data.sort_index(level=0, axis=1, inplace=True)
+    if max_age is None:
+        max_age = timedelta(hours=4)
+    else:
+        max_age = pd.Timedelta(max_age)
 
-    return data
+    groups = {}
+    for tkr in tickers:
+        try:
+            r = _find_missing_range(tkr, end, max_age)
+        except Exception:
+            # Let ticker handle itself
+            r = None
+        if r is not None:
+            groups.setdefault(r, []).append(tkr)
 
+    prefetched = {}
+    for (start_d, end_d, tz_name), group in groups.items():
+        if len(group) < 2:
+            continue
+        for _ in group:
+            yfcrl.Acquire("prices")
+        # prepost like PriceHistory for interday
+        data = yf.download(group, start=start_d, end=end_d, interval=interval, prepost=True,
+                           actions=True, keepna=True, repair=True,
+                           auto_adjust=False, back_adjust=False, rounding=False,
+                           group_by='ticker', ignore_tz=False, multi_level_index=True,
+                           threads=True, progress=False, session=session)
+        if data is None or data.empty:
+            continue
+        for tkr in group:
+            if tkr not in data.columns.get_level_values(0):
+                continue
+            df = data[tkr]
+            # Remove rows yf.download() added when aligning tickers. yfinance
+            # sets 'Repaired?' on every row it returned (repair=True), so it's
+            # NaN only on added rows. Genuine NaN rows are kept for keepna.
+            if 'Repaired?' not in df.columns:
+                continue
+            f_added = df['Repaired?'].isna()
+            df = df[~f_added].copy()
+            if df.empty:
+                continue
+            if df.index.tz is None:
+                df.index = df.index.tz_localize(tz_name)
+            else:
+                df.index = df.index.tz_convert(tz_name)
+            df['Repaired?'] = df['Repaired?'].astype(bool)
+            # Same as yf.Ticker.history() for NaN rows
+            for c in ['Dividends', 'Stock Splits']:
+                if c in df.columns:
+                    df[c] = df[c].fillna(0.0)
+            df['Volume'] = df['Volume'].fillna(0).astype('int64')
+            yf_currency = yfcm.ReadCacheDatum(tkr, "history_metadata")['yf_currency']
+            prefetched[tkr] = (start_d, end_d, df, yf_currency)
+    return prefetched
+
+
+def _combine_dfs(dfs, tickers, ignore_tz, group_by, return_format='wide'):
+    if return_format == 'wide' and len(tickers) == 1:
+        ticker = tickers[0]
+        return dfs[ticker]
+
+    _align_tz(dfs, ignore_tz)
+
+    if return_format == 'dict':
+        return dfs
+    elif return_format == 'long':
+        dfs = {tkr: df for tkr, df in dfs.items() if (df is not None) and (not df.empty)}
+        if len(dfs) == 0:
+            return pd.DataFrame()
+        return pd.concat(dfs, names=['Ticker'], sort=False)
+    else:
+        return _assemble_wide(dfs, tickers, group_by)
 
-def reindex_dfs(dfs, ignore_tz):
+
+def _align_tz(dfs, ignore_tz):
     if ignore_tz:
         for tkr in dfs.keys():
             if (dfs[tkr] is not None) and (not dfs[tkr].empty):
@@ -156,26 +372,89 @@ def reindex_dfs(dfs, ignore_tz):
                 if (dfs[tkr] is not None) and (not dfs[tkr].empty):
                     dfs[tkr].index = dfs[tkr].index.tz_convert(tz_mode)
 
-    all_indices = set()
-    for df in dfs.values():
-        all_indices.update(df.index)
-    idx = sorted(all_indices)
-    idx = pd.to_datetime(idx)
-    for key, df in dfs.items():
-        dfs[key] = df.reindex(idx)
+
+def _field_block_dtype(dtypes, has_gaps):
+    # Return (numpy dtype of block, is tz-aware datetime)
+    if all(isinstance(dt, pd.DatetimeTZDtype) for dt in dtypes):
+        return np.result_type(*[np.dtype(f"M8[{dt.unit}]") for dt in dtypes]), True
+    if not all(isinstance(dt, np.dtype) for dt in dtypes):
+        return np.dtype(object), False
+    try:
+        dtype = np.result_type(*dtypes)
+    except TypeError:
+        return np.dtype(object), False
+    if has_gaps:
+        # Same promotion as reindex
+        if dtype.kind in 'iu':
+            dtype = np.dtype('float64')
+        elif dtype.kind == 'b':
+            dtype = np.dtype(object)
+    return dtype, False
+
+
+def _assemble_wide(dfs, tickers, group_by):
+    # Build wide table without reindexing & concatenating every df, which
+    # needs several copies of all data. Instead union index built from
+    # int64 timestamps, each field written into one preallocated
+    # column-major block, and result columns are views of these blocks.
+    dfs = {tkr: dfs[tkr] for tkr in tickers if (dfs[tkr] is not None) and (not dfs[tkr].empty)}
+    if len(dfs) == 0:
+        return pd.DataFrame()
+
+    idx0 = next(iter(dfs.values())).index
+    ts = {tkr: df.index.as_unit('ns').asi8 for tkr, df in dfs.items()}
+    union = np.unique(np.concatenate(list(ts.values())))
+    n = len(union)
+    index = pd.DatetimeIndex(union.view('M8[ns]')).as_unit(idx0.unit)
+    if idx0.tz is not None:
+        index = index.tz_localize('UTC').tz_convert(idx0.tz)
+    pos = {tkr: np.searchsorted(union, ts[tkr]) for tkr in dfs.keys()}
+
+    # Columns in same order as pandas concat would give
+    field_tickers = {}
+    for tkr, df in dfs.items():
+        for f in df.columns:
+            field_tickers.setdefault(f, []).append(tkr)
+    if group_by == 'column':
+        columns = [(f, tkr) for f in sorted(field_tickers.keys()) for tkr in sorted(field_tickers[f])]
+    else:
+        columns = [(tkr, f) for tkr, df in dfs.items() for f in df.columns]
+
+    arrays = {}
+    for f, f_tickers in field_tickers.items():
+        dtypes = [dfs[tkr][f].dtype for tkr in f_tickers]
+        has_gaps = any(len(ts[tkr]) < n for tkr in f_tickers)
+        dtype, is_tz = _field_block_dtype(dtypes, has_gaps)
+        fill = np.datetime64('NaT') if dtype.kind == 'M' else np.nan
+        block = np.full((n, len(f_tickers)), fill, dtype=dtype, order='F')
+        for j, tkr in enumerate(f_tickers):
+            s = dfs[tkr][f]
+            if is_tz:
+                block[pos[tkr], j] = s.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype=dtype)
+                col = pd.DatetimeIndex(block[:, j]).tz_localize('UTC').tz_convert(s.dt.tz).array
+            else:
+                block[pos[tkr], j] = s.to_numpy(dtype=dtype)
+                col = block[:, j]
+            key = (f, tkr) if group_by == 'column' else (tkr, f)
+            arrays[key] = col
+
+    # copy=False keeps each column a view of its field block
+    data = pd.DataFrame({c: arrays[c] for c in columns}, index=index, copy=False)
+    data.columns = pd.MultiIndex.from_tuples(columns)
+    return data
 
 
 def download_one_parallel(ticker, start=None, end=None, max_age=None,
                   adjust_divs=True, adjust_splits=True,
                   actions=False, period="max", interval="1d",
                   prepost=False, rounding=False,
-                  keepna=False, session=None):
+                  keepna=False, session=None, prefetched=None):
     try:
         df = download_one(ticker, start=start, end=end, max_age=max_age,
                       adjust_divs=adjust_divs, adjust_splits=adjust_splits,
                       actions=actions, period=period, interval=interval,
                       prepost=prepost, rounding=rounding,
-                      keepna=keepna, session=session)
+                      keepna=keepna, session=session, prefetched=prefetched)
         _progress_queue.put(('success', 0))
         return df
     except Exception as e:
@@ -188,13 +467,27 @@ def download_one(ticker, start=None, end=None, max_age=None,
                   adjust_divs=True, adjust_splits=True,
                   actions=False, period="max", interval="1d",
                   prepost=False, rounding=False,
-                  keepna=False, session=None):
-    dat = yfc_ticker.Ticker(ticker, session=session)
-    df = dat.history(
-            period=period, interval=interval, max_age=max_age,
-            start=start, end=end, prepost=prepost,
-            actions=actions, adjust_divs=adjust_divs,
-            adjust_splits=adjust_splits,
-            rounding=rounding, keepna=keepna
-    )
+                  keepna=False, session=None, prefetched=None, dat=None):
+    # prefetched: this ticker's entry from _prefetch_prices()
+    # dat: Ticker to reuse, e.g. from cache-only attempt
+    if prefetched is not None:
+        yfcp.SetPrefetchedPrices(ticker, yfcd.intervalStrToEnum[interval], *prefetched)
+    try:
+        if dat is None:
+            dat = yfc_ticker.Ticker(ticker, session=session)
+        df = dat.history(
+                period=period, interval=interval, max_age=max_age,
+                start=start, end=end, prepost=prepost,
+                actions=actions, adjust_divs=adjust_divs,
+                adjust_splits=adjust_splits,
+                rounding=rounding, keepna=keepna
+        )
+    finally:
+        if prefetched is not None:
+            yfcp.ClearPrefetchedPrices(ticker, yfcd.intervalStrToEnum[interval])
     return df
+
+
+def _download_task(func, task, **kwargs):
+    ticker, prefetched = task
+    return func(ticker, prefetched=prefetched, **kwargs)
@@ -1,6 +1,8 @@
 import yfinance as yf
 
 from . import yfc_cache_manager as yfcm
+from . import yfc_history_store as yfhs
+from . import yfc_rate_limit as yfcrl
 from . import yfc_dat as yfcd
 from . import yfc_time as yfct
 from . import yfc_utils as yfcu
@@ -16,12 +18,71 @@ import dateutil
 from zoneinfo import ZoneInfo
 from pprint import pprint
 import logging
+import threading
+import zlib
 
 
 # TODOs:
 # - when filling a missing interval with NaNs, try to reconstruct first
 
 
+# Raw Yahoo prices already fetched in bulk (yfc_multi), keyed by
+# (ticker, interval). Not prepost, because PriceHistory overrides it for
+# interday. A fetch inside the range is served from here instead of Yahoo,
+# then processed as normal.
+_prefetched = {}
+_prefetched_lock = threading.Lock()
+
+
+def SetPrefetchedPrices(ticker, interval, start, end, df, yf_currency):
+    # start/end are fetch range like Yahoo: start inclusive, end exclusive
+    yfcu.TypeCheckStr(ticker, "ticker")
+    yfcu.TypeCheckInterval(interval, "interval")
+    yfcu.TypeCheckDataFrame(df, "df")
+    with _prefetched_lock:
+        _prefetched[(ticker, interval)] = (start, end, df, yf_currency)
+
+
+def ClearPrefetchedPrices(ticker, interval):
+    with _prefetched_lock:
+        _prefetched.pop((ticker, interval), None)
+
+
+def _getPrefetchedPrices(ticker, interval, start, end):
+    # Return (df, yf_currency) if prefetch covers [start, end), else None
+    with _prefetched_lock:
+        p = _prefetched.get((ticker, interval))
+    if p is None:
+        return None
+    p_start, p_end, df, yf_currency = p
+    if start < p_start or end > p_end:
+        return None
+    tz = df.index.tz
+    start_dt = pd.Timestamp(start).tz_localize(tz) if not isinstance(start, datetime) else pd.Timestamp(start).tz_convert(tz)
+    end_dt = pd.Timestamp(end).tz_localize(tz) if not isinstance(end, datetime) else pd.Timestamp(end).tz_convert(tz)
+    f = (df.index >= start_dt) & (df.index < end_dt)
+    return df[f].copy(), yf_currency
+
+
+def _MergePriceTables(h, h_other):
+    # Union of rows. Where both tables have a row, keep the one updated
+    # (fetched or adjusted) most recently, ties keep 'h'.
+    if not h_other.columns.equals(h.columns):
+        return h
+    def _updated(df):
+        cols = [c for c in ["FetchDate", "LastDivAdjustDt", "LastSplitAdjustDt"] if c in df.columns]
+        # .values of tz-aware column is UTC datetime64, fmax ignores NaT
+        return np.fmax.reduce(np.stack([df[c].values.astype('datetime64[ns]') for c in cols]), axis=0)
+    common = h.index.intersection(h_other.index)
+    f_newer = _updated(h_other.loc[common]) > _updated(h.loc[common])
+    take = common[f_newer]
+    f_other = ~h_other.index.isin(common) | h_other.index.isin(take)
+    if not f_other.any():
+        return h
+    h = pd.concat([h.drop(take), h_other[f_other]]).sort_index()
+    return h
+
+
 class HistoriesManager:
     # Intended as single to class to ensure:
     # - only one History() object exists for each timescale/data type
@@ -42,6 +103,7 @@ class HistoriesManager:
         self.listingDay = listingDay
         self.histories = {}
         self.session = session
+        self._lock = threading.RLock()
 
     def __del__(self):
         if self.logger is not None:
@@ -53,18 +115,21 @@ class HistoriesManager:
         if key not in permitted_keys:
             raise ValueError(f"key='{key}' is invalid, must be one of: {permitted_keys}")
 
-        if key not in self.histories:
-            if key in yfcd.intervalToString.keys():
-                if key == yfcd.Interval.Days1:
-                    self.histories[key] = PriceHistory(self, self.ticker, self.exchange, self.tzName, self.listingDay, key, self.session, repair=True, contiguous=True)
+        # Lock, because creating a PriceHistory loads from cache and
+        # there must be only one for each key
+        with self._lock:
+            if key not in self.histories:
+                if key in yfcd.intervalToString.keys():
+                    if key == yfcd.Interval.Days1:
+                        self.histories[key] = PriceHistory(self, self.ticker, self.exchange, self.tzName, self.listingDay, key, self.session, repair=True, contiguous=True)
+                    else:
+                        self.histories[key] = PriceHistory(self, self.ticker, self.exchange, self.tzName, self.listingDay, key, self.session, repair=True, contiguous=False)
+                elif key == "Events":
+                    self.histories[key] = EventsHistory(self, self.ticker, self.exchange, self.tzName)
                 else:
-                    self.histories[key] = PriceHistory(self, self.ticker, self.exchange, self.tzName, self.listingDay, key, self.session, repair=True, contiguous=False)
-            elif key == "Events":
-                self.histories[key] = EventsHistory(self, self.ticker, self.exchange, self.tzName)
-            else:
-                raise Exception(f"Not implemented code path for key='{key}'")
+                    raise Exception(f"Not implemented code path for key='{key}'")
 
-        return self.histories[key]
+            return self.histories[key]
 
     def LogEvent(self, level, group, msg):
         if not yfcl.IsLoggingEnabled():
@@ -425,8 +490,22 @@ class PriceHistory:
         # Load from cache
         self.cache_key = "history-"+self.istr
         self.h = self._getCachedPrices()
+        self._setStoredRows(self.h)
         self._reviewNewDivs()
 
+        # Serialises syncs of this table within process. Fast path doesn't
+        # take it, instead reads snapshot (version, table) published by sync.
+        self._lock = threading.RLock()
+        # When cached table last synced, and until when it is fresh
+        self.fresh_key = "fresh-"+self.istr
+        self._fresh = yfcm.ReadCacheDatum(self.ticker, self.fresh_key) if self.contiguous else None
+        self._snapshot = (self._h_version, self.h) if self._fresh is not None else None
+        self._synced_start = None
+        self._synced_period = None
+        # Hash of each table segment when last verified, so verify
+        # can skip segments unchanged since
+        self.verified_key = "verified-"+self.istr
+
         # A place to temporarily store new dividends, until prices have
         # been repaired, then they can be sent to EventsHistory
 
@@ -441,14 +520,25 @@ class PriceHistory:
 
     def _getCachedPrices(self):
         h = None
-        if yfcm.IsDatumCached(self.ticker, self.cache_key):
-            h = yfcm.ReadCacheDatum(self.ticker, self.cache_key)
+        if yfhs.IsHistoryCached(self.ticker, self.cache_key):
+            h = yfhs.ReadCacheHistory(self.ticker, self.cache_key)
 
         if h is not None and h.empty:
             h = None
 
         return h
 
+    def _setStoredRows(self, h, hashes=None):
+        # Remember what rows are on disk, so next update
+        # only has to write rows that changed.
+        self._h_version = yfhs.GetHistoryVersion(self.ticker, self.cache_key)
+        if yfhs.GetHistoryFormat() == "pickle" or h is None:
+            self._h_stored_hashes = None
+            self._h_stored_dtypes = None
+        else:
+            self._h_stored_hashes = yfhs.HashHistoryRows(h) if hashes is None else hashes
+            self._h_stored_dtypes = h.dtypes
+
     def _updatedCachedPrices(self, df):
         if df is not None:
             yfcu.TypeCheckDataFrame(df, "df")
@@ -463,7 +553,28 @@ class PriceHistory:
 
             if df.empty:
                 df = None
-        yfcm.StoreCacheDatum(self.ticker, self.cache_key, df)
+
+        # Lock table only for read-merge-write, not whole sync. If another
+        # process wrote table since loaded, merge instead of overwrite.
+        with yfcm.CacheLock(self.ticker, self.cache_key):
+            if df is not None and yfhs.GetHistoryVersion(self.ticker, self.cache_key) != self._h_version:
+                h_disk = self._getCachedPrices()
+                if h_disk is not None:
+                    self.manager.LogEvent("info", "write", "cached prices changed by another process, merging")
+                    df = _MergePriceTables(df, h_disk)
+                    self._h_stored_hashes = None
+
+            written = False
+            hashes = None
+            if df is not None and self._h_stored_hashes is not None and df.dtypes.equals(self._h_stored_dtypes):
+                # Only write rows that changed, usually just the new & non-final rows
+                hashes = yfhs.HashHistoryRows(df)
+                n = yfhs.CountUnchangedRows(self._h_stored_hashes, hashes)
+                if n > 0:
+                    written = yfhs.ReplaceCacheHistoryTail(self.ticker, self.cache_key, df.iloc[n:], n, len(self._h_stored_hashes))
+            if not written:
+                yfhs.StoreCacheHistory(self.ticker, self.cache_key, df)
+            self._setStoredRows(df, hashes)
 
         self.h = df
 
@@ -495,6 +606,227 @@ class PriceHistory:
                 max_age=None, trigger_at_market_close=False, repair=True, prepost=False, 
                 adjust_splits=False, adjust_divs=False, 
                 quiet=False):
+        h = self.getFresh(start, end, period, max_age, trigger_at_market_close, adjust_splits, adjust_divs)
+        if h is not None:
+            return h
+
+        # No file lock held during sync (fetching, repair), only while
+        # writing, see _updatedCachedPrices(). If another process updated
+        # prices since loaded, reload.
+        with self._lock:
+            if yfhs.GetHistoryVersion(self.ticker, self.cache_key) != self._h_version:
+                self.manager.LogEvent("info", "get", "cached prices changed by another process, reloading")
+                self.h = self._getCachedPrices()
+                self._setStoredRows(self.h)
+            elif self._snapshot is not None and self._snapshot[1] is self.h and self.h is not None:
+                # Sync can modify table in-place, but fast path is reading it
+                self.h = self.h.copy()
+            self._synced_start = None
+            self._synced_period = None
+            h = self._get(start, end, period, max_age, trigger_at_market_close, repair, prepost, adjust_splits, adjust_divs, quiet)
+            if self.contiguous and self._synced_start is not None:
+                self._updateFresh(max_age, trigger_at_market_close, period)
+            return h
+
+    def getFresh(self, start=None, end=None, period=None,
+                max_age=None, trigger_at_market_close=False,
+                adjust_splits=False, adjust_divs=False):
+        # Cached prices if fast path possible, else None. Never syncs.
+        if not self.contiguous:
+            return None
+        return self._getFresh(start, end, period, max_age, trigger_at_market_close, adjust_splits, adjust_divs)
+
+    def _defaultMaxAge(self):
+        # TODO: enforce 'max_age' value provided. Only 'None' while I dev
+        if self.interval == yfcd.Interval.Days1:
+            return timedelta(hours=4)
+        elif self.interval == yfcd.Interval.Week:
+            return timedelta(hours=60)
+        # elif self.interval == yfcd.Interval.Months1:
+        #     return timedelta(days=15)
+        # elif self.interval == yfcd.Interval.Months3:
+        #     return timedelta(days=45)
+        else:
+            return 0.5*yfcd.intervalToTimedelta[self.interval]
+
+    def _getEventsVersions(self):
+        return {k: yfcm.GetDatumVersion(self.ticker, k) for k in ["dividends", "splits", "new_divs"]}
+
+    def _getFresh(self, start, end, period, max_age, trigger_at_market_close, adjust_splits, adjust_divs):
+        # Fast path: if table was up-to-date at last sync, and nothing can have
+        # changed since, then skip sync and just slice cached table.
+        # Return None if not possible.
+        f = self._fresh
+        snap = self._snapshot
+        if f is None or snap is None or snap[1] is None:
+            return None
+        dt_now = pd.Timestamp.now("UTC")
+        if dt_now >= f["until"]:
+            return None
+        if max_age is None:
+            max_age = self._defaultMaxAge()
+        if max_age < f["max_age"]:
+            # Rows could expire sooner than calculated
+            return None
+        if f.get("trigger_at_market_close") != trigger_at_market_close:
+            # Calculated for other expiry rule
+            return None
+        if period is not None:
+            dates = f["periods"].get(str(period))
+            if dates is None:
+                return None
+            start, end = dates
+        else:
+            if start is None or isinstance(start, datetime) or isinstance(end, datetime):
+                return None
+            if end is None:
+                end = dt_now.tz_convert(self.tz).date() + timedelta(days=1)
+        if start >= end or start < f["start"]:
+            return None
+
+        if snap[0] != f["version"] or yfhs.GetHistoryVersion(self.ticker, self.cache_key) != f["version"]:
+            return None
+        if self._getEventsVersions() != f["events"]:
+            return None
+        start_dt = datetime.combine(start, time(0), self.tz)
+        end_dt = datetime.combine(end, time(0), self.tz)
+        return self._sliceAndAdjust(start_dt, end_dt, adjust_splits, adjust_divs, snap[1])
+
+    def _updateFresh(self, max_age, trigger_at_market_close, period):
+        # Calculate when cached table could next change, i.e. when sync could
+        # fetch something: a non-final row expiring, or Yahoo having a new row.
+        # Until then, get() can use fast path.
+        if max_age is None:
+            max_age = self._defaultMaxAge()
+        f = None
+        if self.h is not None and not self.h.empty:
+            f = self._calcFresh(max_age, trigger_at_market_close)
+        if f is not None:
+            # Merge with previous, if it was calculated for same table start & rule
+            f_old = self._fresh
+            if f_old is not None and f_old["h0"] == f["h0"] and pd.Timestamp.now("UTC") < f_old["until"] and \
+                    f_old.get("trigger_at_market_close") == trigger_at_market_close:
+                f["start"] = min(f["start"], f_old["start"])
+                f["periods"] = {**f_old["periods"], **f["periods"]}
+            if period is not None and self._synced_period is not None:
+                f["periods"][str(period)] = self._synced_period
+        # Publish table before its fresh record, fast path checks versions match
+        self._snapshot = (self._h_version, self.h) if f is not None else None
+        if f != self._fresh:
+            self._fresh = f
+            yfcm.StoreCacheDatum(self.ticker, self.fresh_key, f)
+
+    def _calcFresh(self, max_age, trigger_at_market_close):
+        if self.repair and not self.h["C-Check?"].all():
+            return None
+        if yfcm.ReadCacheDatum(self.ticker, "new_divs") is not None:
+            # Dividends waiting to be sent out
+            return None
+
+        tz_exchange = self.tz
+        yf_lag = yfct.GetExchangeDataDelay(self.exchange)
+        dt_now = pd.Timestamp.now("UTC")
+        d_now = dt_now.tz_convert(tz_exchange).date()
+
+        # Cap at midnight, because date-based logic changes
+        until = pd.Timestamp(datetime.combine(d_now + timedelta(days=1), time(0), tz_exchange))
+
+        # Yahoo can have new row when next session after last row opens
+        d_last = self.h.index[-1].date()
+        sched = yfct.GetExchangeSchedule(self.exchange, d_last + timedelta(days=1), d_last + timedelta(days=15))
+        if sched is None or sched.empty:
+            return None
+        until = min(until, sched["open"].iloc[0] + yf_lag)
+
+        # Non-final rows: earliest each could expire, same rules as IsPriceDatapointExpired().
+        # Same definition of non-final as sync.
+        f_na = self.h['Close'].isna().to_numpy()
+        f_repair = self.h["Repaired?"].to_numpy() | f_na
+        f_repair[self.h['FetchDate'] > (self.h.index + self.itd + timedelta(days=7))] = False
+        f_nfinal = (~self.h["Final?"].to_numpy()) | f_repair
+        idx = np.where(f_nfinal)[0]
+        if len(idx) > 0:
+            # Vectorised like IsPriceDatapointExpired_batch()
+            fetch_dt = pd.DatetimeIndex(self.h["FetchDate"].iloc[idx]).tz_convert(tz_exchange)
+            expire_dt = fetch_dt + max_age
+            f_na = f_na[idx]
+            if f_na.any():
+                until = min(until, expire_dt[f_na].min())
+            idx, fetch_dt, expire_dt = idx[~f_na], fetch_dt[~f_na], expire_dt[~f_na]
+        if len(idx) > 0:
+            interval_dts = np.array(self.h.index[idx].date)
+            lastDataDt = yfct.CalcIntervalLastDataDt_batch(self.exchange, interval_dts, self.interval, yf_lag=yf_lag, bfill=False)
+            lastDataDt = pd.to_datetime(pd.Series(lastDataDt), utc=True)
+            for i in np.where(lastDataDt.isna().to_numpy())[0]:
+                # Rare, e.g. exchange closed. Fallback to slow
+                dt = yfct.CalcIntervalLastDataDt(self.exchange, interval_dts[i], self.interval, yf_lag=yf_lag)
+                if dt is not None:
+                    lastDataDt.iloc[i] = dt
+            lastDataDt = pd.DatetimeIndex(lastDataDt).tz_convert(tz_exchange)
+            f_repair = f_repair[idx]
+            if f_repair.any():
+                lastDataDt = lastDataDt.where(~f_repair, lastDataDt + timedelta(days=7))
+            f_known = ~lastDataDt.isna()
+            # Fetched after last Yahoo update never expires
+            f_expires = ~(f_known & (fetch_dt >= lastDataDt))
+            f = f_known & f_expires
+            if f.any():
+                until = min(until, lastDataDt[f].min())
+            expire_dt = expire_dt[f_expires]
+        if len(idx) > 0 and len(expire_dt) > 0:
+            # Age only triggers expiry during or after a session, so
+            # outside session move to next open
+            check_dt = expire_dt - yf_lag
+            f_out = ~yfct.IsTimestampInActiveSession_batch(self.exchange, check_dt)
+            if f_out.any():
+                sched = yfct.GetExchangeSchedule(self.exchange, check_dt[f_out].min().date(), check_dt[f_out].max().date() + timedelta(days=15))
+                if sched is not None and not sched.empty:
+                    opens = pd.DatetimeIndex(sched["open"]).tz_convert(tz_exchange)
+                    i = opens.searchsorted(check_dt, side="left")
+                    next_open = opens[np.minimum(i, len(opens) - 1)]
+                    f = f_out & (i < len(opens)) & (next_open > expire_dt)
+                    expire_dt = expire_dt.where(~f, next_open)
+            until = min(until, expire_dt.min())
+
+        if until <= dt_now:
+            return None
+        d0 = self.h.index[0].date()
+        return {"until": until.tz_convert("UTC"),
+                "max_age": max_age,
+                "trigger_at_market_close": trigger_at_market_close,
+                "version": self._h_version,
+                "events": self._getEventsVersions(),
+                "h0": d0,
+                "start": min(d0, self._synced_start),
+                "periods": {}}
+
+    def _sliceAndAdjust(self, start_dt, end_dt, adjust_splits, adjust_divs, h=None):
+        if h is None:
+            h = self.h
+        # Hide internal columns
+        cols = [c for c in h.columns if c not in ['C-Check?', 'LastDivAdjustDt', 'LastSplitAdjustDt']]
+        if (start_dt is not None) and (end_dt is not None):
+            i0 = h.index.searchsorted(start_dt, side="left")
+            i1 = h.index.searchsorted(end_dt, side="left")
+            h_copy = h.iloc[i0:i1][cols].copy()
+        else:
+            h_copy = h[cols].copy()
+
+        if adjust_splits:
+            for c in ["Open", "High", "Low", "Close", "Dividends"]:
+                h_copy[c] *= h_copy["CSF"]
+            h_copy["Volume"] = (h_copy["Volume"]/h_copy["CSF"]).round(0).astype('int')
+            h_copy = h_copy.drop("CSF", axis=1)
+        if adjust_divs:
+            for c in ["Open", "High", "Low", "Close"]:
+                h_copy[c] *= h_copy["CDF"]
+            h_copy = h_copy.drop("CDF", axis=1)
+        return h_copy
+
+    def _get(self, start=None, end=None, period=None, 
+                max_age=None, trigger_at_market_close=False, repair=True, prepost=False, 
+                adjust_splits=False, adjust_divs=False, 
+                quiet=False):
         if start is None and end is None and period is None:
             raise ValueError("Must provide value for one of: 'start', 'end', 'period'")
         if start is not None:
@@ -508,18 +840,8 @@ class PriceHistory:
         yfcu.TypeCheckBool(adjust_splits, "adjust_splits")
         yfcu.TypeCheckBool(adjust_divs, "adjust_divs")
 
-        # TODO: enforce 'max_age' value provided. Only 'None' while I dev
         if max_age is None:
-            if self.interval == yfcd.Interval.Days1:
-                max_age = timedelta(hours=4)
-            elif self.interval == yfcd.Interval.Week:
-                max_age = timedelta(hours=60)
-            # elif self.interval == yfcd.Interval.Months1:
-            #     max_age = timedelta(days=15)
-            # elif self.interval == yfcd.Interval.Months3:
-            #     max_age = timedelta(days=45)
-            else:
-                max_age = 0.5*yfcd.intervalToTimedelta[self.interval]
+            max_age = self._defaultMaxAge()
 
         # YFC cannot handle pre- and post-market intraday
         prepost = self.interday
@@ -572,6 +894,7 @@ class PriceHistory:
         end_d = None ; end_dt = None
         if period is not None:
             start_d, end_d = yfct.MapPeriodToDates(self.exchange, period, self.interval)
+            self._synced_period = (start_d, end_d)
             period = None
             if self.interday:
                 start = start_d
@@ -624,6 +947,8 @@ class PriceHistory:
         else:
             if (not isinstance(start, datetime)) and (not isinstance(end, datetime)):
                 raise TypeError(f"'start' and 'end' must be datetime type not {type(start)}, {type(end)}")
+        if self.contiguous:
+            self._synced_start = start
 
         if self.listingDay is not None:
             listing_date = self.listingDay
@@ -716,20 +1041,11 @@ class PriceHistory:
                 f_repair[self.h['FetchDate'] > cutoff_dts] = False
                 if f_repair.any():
                     f_nfinal = f_nfinal | f_repair
-                for idx in np.where(f_nfinal)[0]:
-                    # repaired = False
-                    repaired = f_repair[idx]
-                    h_interval_dt = h_interval_dts[idx]
-                    fetch_dt = yfct.ConvertToDatetime(self.h["FetchDate"].iloc[idx], tz=tz_exchange)
-                    try:
-                        expired_idx = yfct.IsPriceDatapointExpired(h_interval_dt, fetch_dt, repaired, max_age, self.exchange, self.interval, yf_lag=yf_lag, triggerExpiryOnClose=trigger_at_market_close)
-                    except yfcd.TimestampOutsideIntervalException as e:
-                        if f_na[idx0]:
-                            # YFC must have inserted a row of NaNs, wrongly thinking exchange should have been open here.
-                            expired_idx = True
-                        else:
-                            raise e
-                    expired[idx] = expired_idx
+                idx = np.where(f_nfinal)[0]
+                if len(idx) > 0:
+                    # If row of NaNs not in an interval, YFC must have inserted it,
+                    # wrongly thinking exchange should have been open here.
+                    expired[idx] = yfct.IsPriceDatapointExpired_batch(h_interval_dts[idx], self.h["FetchDate"].iloc[idx], f_repair[idx], max_age, self.exchange, self.interval, yf_lag=yf_lag, triggerExpiryOnClose=trigger_at_market_close, expire_outside=f_na[idx])
                 if expired.any():
                     self.h = self.h.drop(self.h.index[expired])
                     h_interval_dts = h_interval_dts[~expired]
@@ -1056,7 +1372,7 @@ class PriceHistory:
                 yfcm.WriteCacheMetadata(self.ticker, "new_divs", "locked", 1)
                 yfcl.TracePrint("sending out new dividends ...")
                 # TODO: remove duplicates from _newDivs (possible when restoring file file)
-                divs_df = cached_new_divs
+                divs_df = cached_new_divs.copy()
                 divs_df["Close before"] = np.nan
                 for dt in divs_df.index:
                     if dt == self.h.index[0]:
@@ -1104,22 +1420,9 @@ class PriceHistory:
             raise Exception("Adj Close in self.h")
 
         if (start is not None) and (end is not None):
-            h_copy = self.h.loc[start_dt:end_dt-timedelta(milliseconds=1)].copy()
+            h_copy = self._sliceAndAdjust(start_dt, end_dt, adjust_splits, adjust_divs)
         else:
-            h_copy = self.h.copy()
-
-        if adjust_splits:
-            for c in ["Open", "High", "Low", "Close", "Dividends"]:
-                h_copy[c] *= h_copy["CSF"]
-            h_copy["Volume"] = (h_copy["Volume"]/h_copy["CSF"]).round(0).astype('int')
-            h_copy = h_copy.drop("CSF", axis=1)
-        if adjust_divs:
-            for c in ["Open", "High", "Low", "Close"]:
-                h_copy[c] *= h_copy["CDF"]
-            h_copy = h_copy.drop("CDF", axis=1)
-
-        # Hide internal columns
-        h_copy = h_copy.drop(['C-Check?', 'LastDivAdjustDt', 'LastSplitAdjustDt'], axis=1, errors='ignore')
+            h_copy = self._sliceAndAdjust(None, None, adjust_splits, adjust_divs)
 
         log_msg = f"PriceHistory-{self.istr}.get() returning"
         if h_copy.empty:
@@ -1219,6 +1522,7 @@ class PriceHistory:
 
         hist_md = yfcm.ReadCacheDatum(self.ticker, "history_metadata")
         if hist_md is None or 'listingDate' not in hist_md:
+            yfcrl.Acquire("prices")
             listing_date = self.dat.history_metadata["firstTradeDate"]
             if isinstance(listing_date, int):
                 listing_date = pd.to_datetime(listing_date, unit='s', utc=True).tz_convert(tz_exchange)
@@ -1436,6 +1740,48 @@ class PriceHistory:
         elif debug_yfc:
             print(log_msg)
 
+    def _calcVerifySegments(self, h):
+        # Split table into segments (years, or months if intraday),
+        # return hash of each and their start positions.
+        cols = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+        cols += ["Final?", "Repaired?", "CSF", "CDF"]
+        keys = h.index.year.to_numpy()
+        if self.intraday:
+            keys = keys*100 + h.index.month.to_numpy()
+        keys, starts = np.unique(keys, return_index=True)
+        ends = np.append(starts[1:], h.shape[0])
+        row_hashes = yfhs.HashHistoryRows(h[[c for c in cols if c in h.columns]])
+        hashes = {int(keys[i]): zlib.crc32(row_hashes[starts[i]:ends[i]].tobytes()) for i in range(len(keys))}
+        return hashes, starts
+
+    def _getVerifyStart(self, rtol, vol_rtol):
+        # Return first row of first segment not verified since it last changed,
+        # or verified too long ago or with looser tolerances. None if all verified.
+        hashes, starts = self._calcVerifySegments(self.h)
+        verified = yfcm.ReadCacheDatum(self.ticker, self.verified_key)
+        if verified is None or verified["rtol"] > rtol or verified["vol_rtol"] > vol_rtol:
+            return self.h.index[0]
+        max_age = yfcm._option_manager.max_ages.verify
+        max_age = pd.Timedelta(yfcm.verify_max_age_default if max_age is None else max_age)
+        dt_min = pd.Timestamp.now("UTC") - max_age
+        segments = verified["segments"]
+        keys = list(hashes.keys())
+        for i in range(len(keys)):
+            v = segments.get(keys[i])
+            if v is None or v[0] != hashes[keys[i]] or v[1] < dt_min:
+                return self.h.index[starts[i]]
+        return None
+
+    def _updateVerified(self, rtol, vol_rtol):
+        # Record all segments of table as verified now
+        if self.h is None or self.h.empty:
+            return
+        hashes, _ = self._calcVerifySegments(self.h)
+        dt_now = pd.Timestamp.now("UTC")
+        verified = {"rtol": rtol, "vol_rtol": vol_rtol,
+                    "segments": {k: (h, dt_now) for k, h in hashes.items()}}
+        yfcm.StoreCacheDatum(self.ticker, self.verified_key, verified)
+
     def _verifyCachedPrices(self, rtol=0.0001, vol_rtol=0.004, correct=False, discard_old=False, quiet=True, debug=False):
         correct_values = [False, 'one', 'all']
         if correct not in correct_values:
@@ -1555,11 +1901,25 @@ class PriceHistory:
 
                 h = h.loc[fetch_start_min:]
 
+        # Skip segments already verified since they last changed
+        verify_start = self._getVerifyStart(rtol, vol_rtol)
+        incremental = verify_start != self.h.index[0]
+        if incremental:
+            if verify_start is None:
+                h = h.iloc[0:0]
+            else:
+                h = h.loc[verify_start:]
+            if debug:
+                msg = f"already verified up to {verify_start}"
+                yfcl.TracePrint(msg) if yfcl.IsTracingEnabled() else print(f"{self.ticker}: " + msg)
+
         if self.interval == yfcd.Interval.Days1:
             # Also verify dividends
             divs_df = self.manager.GetHistory("Events").GetDivs()
             if divs_df is not None:
                 divs_df = divs_df[(divs_df['Dividends']!=0.0).to_numpy()]
+                if incremental and not h.empty:
+                    divs_df = divs_df.loc[h.index[0]:]
                 if divs_df.empty:
                     divs_df = None
 
@@ -1588,6 +1948,7 @@ class PriceHistory:
                     fetch_start_batch = fetch_end - td_7d
                     while fetch_end_batch > fetch_start:
                         history_args = history_args_base_intraday | {'start': fetch_start_batch, 'end': fetch_end_batch}
+                        yfcrl.Acquire("prices")
                         df_yf_batch = self.dat.history(**history_args)
                         if "Repaired?" not in df_yf_batch.columns:
                             df_yf_batch["Repaired?"] = False
@@ -1603,6 +1964,7 @@ class PriceHistory:
                     df_yf = df_yf.sort_index()
                 else:
                     history_args = history_args_base_intraday | {'start': fetch_start, 'end': fetch_end}
+                    yfcrl.Acquire("prices")
                     df_yf = self.dat.history(**history_args)
                     if "Repaired?" not in df_yf.columns:
                         df_yf["Repaired?"] = False
@@ -1611,20 +1973,17 @@ class PriceHistory:
 
                 # Yahoo doesn't div-adjust intraday
                 history_args_1d = history_args_base | {'interval': '1d', 'start' :df_yf.index[0].date(), 'end': df_yf.index[-1].date()+td_1d, 'auto_adjust': False}
+                yfcrl.Acquire("prices")
                 df_yf_1d = self.dat.history(**history_args_1d)
                 if "Repaired?" not in df_yf_1d.columns:
                     df_yf_1d["Repaired?"] = False
-                df_yf["_indexBackup"] = df_yf.index
-                df_yf["_date"] = df_yf.index.date
-                df_yf_1d["_date"] = df_yf_1d.index.date
-                #
-                df_yf_1d["Adj"] = df_yf_1d["Adj Close"].to_numpy() / df_yf_1d["Close"].to_numpy()
-                df_yf = df_yf.merge(df_yf_1d[["Adj", "_date"]], how="left", on="_date")
-                df_yf["Adj Close"] = df_yf["Close"].to_numpy() * df_yf["Adj"].to_numpy()
-                df_yf = df_yf.drop("Adj", axis=1)
-                #
-                df_yf.index = df_yf["_indexBackup"]
-                df_yf = df_yf.drop(["_indexBackup", "_date"], axis=1)
+                # Map each intraday row to its day's adjustment
+                adj_1d = df_yf_1d["Adj Close"].to_numpy() / df_yf_1d["Close"].to_numpy()
+                days_1d = df_yf_1d.index.tz_localize(None).normalize().to_numpy()
+                days = df_yf.index.tz_localize(None).normalize().to_numpy()
+                i = np.minimum(np.searchsorted(days_1d, days), len(days_1d)-1)
+                adj = np.where(days_1d[i] == days, adj_1d[i], np.nan)
+                df_yf["Adj Close"] = df_yf["Close"].to_numpy() * adj
             else:
                 if self.interval == yfcd.Interval.Days1 and divs_df is not None and not divs_df.empty:
                     # Also use YF data to verify dividends.
@@ -1633,12 +1992,14 @@ class PriceHistory:
                 fetch_start -= self.itd
                 fetch_end += self.itd
                 history_args = history_args_base | {'interval': self.istr, 'start': fetch_start, 'end': fetch_end, 'auto_adjust': False, 'repair': True, 'keepna': True}
+                yfcrl.Acquire("prices")
                 df_yf = self.dat.history(**history_args)
                 if "Repaired?" not in df_yf.columns:
                     df_yf["Repaired?"] = False
                 if df_yf.empty:
                     raise Exception(f"{self.ticker}: YF fetch failed for {self.istr} {fetch_start} -> {fetch_end}")
                 if self.interval == yfcd.Interval.Week:
+                    yfcrl.Acquire("prices")
                     df_yf_adj = self.dat.history(**(history_args|{'auto_adjust':True}))
                 # Make special adjustments for dividends / stock splits released TODAY
                 if self.interval == yfcd.Interval.Days1:
@@ -1663,6 +2024,7 @@ class PriceHistory:
                     while n < 3:
                         fetch_start -= timedelta(days=2)
                         history_args = history_args_1wk_base | {'start': fetch_start, 'end': fetch_end}
+                        yfcrl.Acquire("prices")
                         df_yf = self.dat.history(**history_args)
                         if "Repaired?" not in df_yf.columns:
                             df_yf["Repaired?"] = False
@@ -1673,6 +2035,7 @@ class PriceHistory:
                         raise Exception("Failed to get Monday-aligned weekly data from YF")
                     df_yf = df_yf.loc[h.index[0]:]
                     if self.interval == yfcd.Interval.Week:
+                        yfcrl.Acquire("prices")
                         df_yf_adj = self.dat.history(**(history_args|{'auto_adjust':True}))
                         df_yf_adj = df_yf_adj.loc[h.index[0]:]
 
@@ -1755,8 +2118,10 @@ class PriceHistory:
         if not f_diff_all.any():
             if h_modified:
                 # yfcm.StoreCacheDatum(self.ticker, self.cache_key, h)
-                yfcm.StoreCacheDatum(self.ticker, self.cache_key, h_new)
+                yfhs.StoreCacheHistory(self.ticker, self.cache_key, h_new)
                 self.h = self._getCachedPrices()
+                self._setStoredRows(self.h)
+            self._updateVerified(rtol, vol_rtol)
 
             yfcl.TraceExit(f"PM::_verifyCachedPrices-{self.istr}() returning True")
             return True
@@ -1863,8 +2228,9 @@ class PriceHistory:
             hist1d._updatedCachedPrices(h1d)
 
         if h_modified:
-            yfcm.StoreCacheDatum(self.ticker, self.cache_key, h)
+            yfhs.StoreCacheHistory(self.ticker, self.cache_key, h)
             self.h = self._getCachedPrices()
+            self._setStoredRows(self.h)
 
         yfcl.TraceExit(f"PM::_verifyCachedPrices-{self.istr}() returning False")
         return False
@@ -2140,7 +2506,7 @@ class PriceHistory:
             if self.interday:
                 received_interval_starts = df.index.date
             else:
-                received_interval_starts = df.index.to_pydatetime()
+                received_interval_starts = df.index
         try:
             intervals_missing_df = yfct.IdentifyMissingIntervals(self.exchange, start, end, self.interval, received_interval_starts, ignore_breaks=True)
         except yfcd.NoIntervalsInRangeException:
@@ -2575,6 +2941,7 @@ class PriceHistory:
         yfcu.TypeCheckIntervalDt(end, self.interval, "end")
         yfcu.TypeCheckBool(prepost, "prepost")
         yfcu.TypeCheckBool(debug, "debug")
+        yfcu.CheckFetchAllowed(self.ticker, f"{self.istr} prices")
 
         debug_yfc = False
         # debug_yfc = True
@@ -2625,8 +2992,17 @@ class PriceHistory:
             msg = f"- fetch_start={fetch_start} ; fetch_end={fetch_end}"
             yfcl.TracePrint(msg) if yfcl.IsTracingEnabled() else print(msg)
         try:
-            df = self.dat.history(**history_args)
-            currency = self.dat.history_metadata.get('currency', None)
+            p = _getPrefetchedPrices(self.ticker, self.interval, fetch_start, fetch_end)
+            if p is not None:
+                df, currency = p
+                if debug_yfc:
+                    msg = "- using prefetched prices"
+                    yfcl.TracePrint(msg) if yfcl.IsTracingEnabled() else print(msg)
+            else:
+                yfcrl.Acquire("prices")
+                df = self.dat.history(**history_args)
+                currency = self.dat.history_metadata.get('currency', None)
+            yf_currency = currency
 
             # Ensure same YF currency as cache
             if currency in ['GBp', 'ZAc', 'ILA']:
@@ -2641,6 +3017,8 @@ class PriceHistory:
                 hist_md = {}
             if currency is not None:
                 hist_md['currency'] = currency
+                # Unscaled, so bulk fetches (yfc_multi) know scaling
+                hist_md['yf_currency'] = yf_currency
             yfcm.StoreCacheDatum(self.ticker, "history_metadata", hist_md)
         except yf.exceptions.YFPricesMissingError:
             raise yfcd.NoPriceDataInRangeException(self.ticker, self.istr, start, end)
@@ -2682,6 +3060,7 @@ class PriceHistory:
                     msg = "- weekly data not aligned to Monday, re-fetching from {}".format(fetch_start2)
                     yfcl.TracePrint(msg) if yfcl.IsTracingEnabled() else print(msg)
                 try:
+                    yfcrl.Acquire("prices")
                     df = self.dat.history(**history_args)
                     currency = self.dat.history_metadata['currency']
                     hist_md = yfcm.ReadCacheDatum(self.ticker, "history_metadata")
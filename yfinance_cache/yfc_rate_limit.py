@@ -0,0 +1,102 @@
+import time
+import threading
+
+from . import yfc_cache_manager as yfcm
+from . import yfc_dat as yfcd
+
+# Token bucket per endpoint category, shared by all threads & processes
+# using same cache folder. Rate set in requests/minute via options, e.g.
+#   yfc.options.rate_limits.prices = 60
+# None = no limit. Bucket holds up to 10 seconds of requests, so bursts
+# are allowed. Callers take a token before requesting; if bucket empty
+# they reserve a future token and sleep until then, so waiting is FIFO.
+#
+# State stored in _YFC_ folder, updated under cache lock. So state file
+# isn't rewritten for every request, a process takes up to 'lease_seconds'
+# of available tokens at once and spends them from memory. Unused leased
+# tokens expire after 'lease_seconds'.
+
+categories = ["prices", "fundamentals", "options"]
+burst_seconds = 10
+lease_seconds = 1.0
+
+_state_dirname = "_YFC_"
+_state_name = "rate_limits"
+
+_lease_lock = threading.Lock()
+_leases = {}  # (cache folder, category) -> (tokens, time leased)
+
+_stats_lock = threading.Lock()
+_stats = {c: {"requests": 0, "waited": 0, "wait_seconds": 0.0, "rejected": 0} for c in categories}
+
+
+def GetRateLimitStats():
+    with _stats_lock:
+        return {c: dict(s) for c, s in _stats.items()}
+
+
+def ResetRateLimitStats():
+    with _stats_lock:
+        for s in _stats.values():
+            for k in s:
+                s[k] = 0.0 if k == "wait_seconds" else 0
+
+
+def _reserve(category, rate, max_wait):
+    # Take a token, return seconds to wait for it. Return None if
+    # wait would exceed 'max_wait'.
+    rps = rate / 60.0
+    capacity = max(1.0, rps * burst_seconds)
+    key = (yfcm.GetCacheDirpath(), category)
+    with _lease_lock:
+        now = time.time()
+        lease = _leases.get(key)
+        if lease is not None and lease[0] >= 1.0 and (now - lease[1]) < lease_seconds:
+            _leases[key] = (lease[0] - 1.0, lease[1])
+            return 0.0
+
+        with yfcm.CacheLock(_state_dirname, _state_name):
+            state = yfcm.ReadCacheDatum(_state_dirname, _state_name)
+            state = {} if state is None else state
+            now = time.time()
+            s = state.get(category)
+            if s is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, s["tokens"] + (now - s["t"]) * rps)
+            if tokens >= 1.0:
+                n = float(int(min(tokens, max(1.0, rps * lease_seconds))))
+                wait = 0.0
+            else:
+                n = 1.0
+                wait = (n - tokens) / rps
+                if max_wait is not None and wait > max_wait:
+                    return None
+            state[category] = {"tokens": tokens - n, "t": now}
+            yfcm.StoreCacheDatum(_state_dirname, _state_name, state)
+        _leases[key] = (n - 1.0, now)
+    return wait
+
+
+def Acquire(category):
+    # Call before each request to Yahoo
+    if category not in categories:
+        raise ValueError(f"'category' must be one of {categories}, not '{category}'")
+
+    rate = getattr(yfcm._option_manager.rate_limits, category)
+    wait = 0.0
+    if rate is not None:
+        wait = _reserve(category, rate, yfcm._option_manager.rate_limits.max_wait)
+        if wait is None:
+            with _stats_lock:
+                _stats[category]["rejected"] += 1
+            raise yfcd.RateLimitException(category, rate)
+        if wait > 0.0:
+            time.sleep(wait)
+
+    with _stats_lock:
+        s = _stats[category]
+        s["requests"] += 1
+        if wait > 0.0:
+            s["waited"] += 1
+            s["wait_seconds"] += wait
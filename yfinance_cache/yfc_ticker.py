@@ -1,6 +1,8 @@
 import yfinance as yf
 
 from . import yfc_cache_manager as yfcm
+from . import yfc_history_store as yfhs
+from . import yfc_rate_limit as yfcrl
 from . import yfc_dat as yfcd
 from . import yfc_utils as yfcu
 from . import yfc_logging as yfcl
@@ -17,6 +19,10 @@ import os
 import re
 from collections import namedtuple
 import shutil
+import threading
+import asyncio
+import concurrent.futures
+import json
 # from time import perf_counter
 
 # TODO: Ticker: add method to delete ticker from cache
@@ -31,7 +37,12 @@ class Ticker:
 
         self._yf_lag = None
 
+        # Result of each interval in last verify_cached_prices()
+        self._verify_results = {}
+
         self._histories_manager = None
+        # Guards lazy initialisation, so Ticker can be shared between threads
+        self._lock = threading.RLock()
 
         self._attributes = {}
 
@@ -101,17 +112,6 @@ class Ticker:
         yfcl.TraceEnter(log_msg)
 
         td_1d = datetime.timedelta(days=1)
-        exchange, tz_name, lday = self._getExchangeAndTzAndListingDay()
-        if exchange == 'YHD':
-            raise Exception(f"Ticker symbol '{self._ticker}' not on Yahoo Finance.")
-        tz_exchange = ZoneInfo(tz_name)
-        try:
-            yfct.SetExchangeTzName(exchange, tz_name)
-        except Exception as e:
-            if "Need to add mapping" in str(e):
-                raise Exception(f"Need to add mapping of exchange {exchange} to xcal (ticker={self._ticker})")
-            else:
-                raise
         dt_now = pd.Timestamp.now("UTC")
 
         # Type checks
@@ -150,6 +150,30 @@ class Ticker:
         if not isinstance(interval, yfcd.Interval):
             raise Exception("'interval' must be yfcd.Interval")
 
+        # Fast path: if cached prices can't have changed since last sync, skip setup
+        h = self._historyFresh(interval, max_age, period, start, end, trigger_at_market_close, dt_now)
+        if h is not None:
+            h, start_dt, end_dt = h
+            if h.shape[0] == 0:
+                return pd.DataFrame()
+            return self._processHistory(h, interval, start_dt, end_dt, keepna, adjust_splits, adjust_divs, rounding, log_msg)
+        if yfcu.IsCacheOnly():
+            # Only fresh prices are cheap to serve. Stop before setup & sync,
+            # so caller's retry outside CacheOnly() doesn't repeat them.
+            raise yfcd.CacheMissException(self._ticker, "prices")
+
+        exchange, tz_name, lday = self._getExchangeAndTzAndListingDay()
+        if exchange == 'YHD':
+            raise Exception(f"Ticker symbol '{self._ticker}' not on Yahoo Finance.")
+        tz_exchange = ZoneInfo(tz_name)
+        try:
+            yfct.SetExchangeTzName(exchange, tz_name)
+        except Exception as e:
+            if "Need to add mapping" in str(e):
+                raise Exception(f"Need to add mapping of exchange {exchange} to xcal (ticker={self._ticker})")
+            else:
+                raise
+
         start_d = None ; end_d = None
         start_dt = None ; end_dt = None
         interday = interval in [yfcd.Interval.Days1, yfcd.Interval.Week]#, yfcd.Interval.Months1, yfcd.Interval.Months3]
@@ -196,18 +220,7 @@ class Ticker:
             if start is not None:
                 max_age = min(max_age, dt_now-start_dt)
 
-        if period is not None:
-            if isinstance(period, (datetime.timedelta, pd.Timedelta)):
-                if (dt_now - max_age) < (dt_now - period):
-                    raise Exception(f"max_age={max_age} must be less than period={period}")
-            elif period == yfcd.Period.Ytd:
-                dt_now_ex = dt_now.tz_convert(tz_exchange)
-                dt_year_start = pd.Timestamp(year=dt_now_ex.year, month=1, day=1).tz_localize(tz_exchange)
-                if (dt_now - max_age) < dt_year_start:
-                    raise Exception(f"max_age={max_age} must be less than days since this year start")
-        elif start is not None:
-            if (dt_now - max_age) < start_dt:
-                raise Exception(f"max_age={max_age} must be closer to now than start={start}")
+        self._checkMaxAge(max_age, period, start, start_dt, dt_now, tz_exchange)
 
 
         if start_dt is not None:
@@ -242,16 +255,15 @@ class Ticker:
             if exchange not in yfcd.exchangeToXcalExchange:
                 raise Exception("Need to add mapping of exchange {} to xcal (ticker={})".format(exchange, self._ticker))
 
-        if self._histories_manager is None:
-            self._histories_manager = yfcp.HistoriesManager(self._ticker, exchange, tz_name, lday, self._session)
+        histories_manager = self._getHistoriesManager()
 
         # t1_setup = perf_counter()
 
-        # hist = self._histories_manager.GetHistory(interval)
+        # hist = histories_manager.GetHistory(interval)
         if interval in [yfcd.Interval.Week, yfcd.Interval.Months1, yfcd.Interval.Months3]:
-            hist = self._histories_manager.GetHistory(yfcd.Interval.Days1)
+            hist = histories_manager.GetHistory(yfcd.Interval.Days1)
         else:
-            hist = self._histories_manager.GetHistory(interval)
+            hist = histories_manager.GetHistory(interval)
         if period is not None:
             h = hist.get(start=None, end=None, period=period, max_age=max_age, trigger_at_market_close=trigger_at_market_close, quiet=quiet)
         elif interday:
@@ -263,44 +275,90 @@ class Ticker:
 
         # t2_sync = perf_counter()
 
+        return self._processHistory(h, interval, start_dt, end_dt, keepna, adjust_splits, adjust_divs, rounding, log_msg)
+
+    def _historyFresh(self, interval, max_age, period, start, end, trigger_at_market_close, dt_now):
+        # Return (prices, start_dt, end_dt) if cached daily prices are fresh,
+        # without exchange/schedule setup or sync. Else None.
+        if interval != yfcd.Interval.Days1:
+            return None
+        if self._exchange is None or self._tz is None or self._listing_day is None:
+            return None
+        start_dt = None ; end_dt = None
+        start_d = None ; end_d = None
+        if start is not None:
+            start_dt, start_d = yfcu.ProcessUserDt(start, self._tz)
+            if start_d is None:
+                return None
+        if end is not None:
+            end_dt, end_d = yfcu.ProcessUserDt(end, self._tz)
+            if end_d is None:
+                return None
+        if max_age is None:
+            max_age = datetime.timedelta(hours=4)
+            if start is not None:
+                max_age = min(max_age, dt_now-start_dt)
+        self._checkMaxAge(max_age, period, start, start_dt, dt_now, ZoneInfo(self._tz))
+
+        hist = self._getHistoriesManager().GetHistory(interval)
+        h = hist.getFresh(start_d, end_d, period, max_age, trigger_at_market_close)
+        if h is None:
+            return None
+        return h, start_dt, end_dt
+
+    def _checkMaxAge(self, max_age, period, start, start_dt, dt_now, tz_exchange):
+        if period is not None:
+            if isinstance(period, (datetime.timedelta, pd.Timedelta)):
+                if (dt_now - max_age) < (dt_now - period):
+                    raise Exception(f"max_age={max_age} must be less than period={period}")
+            elif period == yfcd.Period.Ytd:
+                dt_now_ex = dt_now.tz_convert(tz_exchange)
+                dt_year_start = pd.Timestamp(year=dt_now_ex.year, month=1, day=1).tz_localize(tz_exchange)
+                if (dt_now - max_age) < dt_year_start:
+                    raise Exception(f"max_age={max_age} must be less than days since this year start")
+        elif start is not None:
+            if (dt_now - max_age) < start_dt:
+                raise Exception(f"max_age={max_age} must be closer to now than start={start}")
+
+    def _processHistory(self, h, interval, start_dt, end_dt, keepna, adjust_splits, adjust_divs, rounding, log_msg):
+        debug_yfc = self._debug
+
         f_dups = h.index.duplicated()
         if f_dups.any():
             raise Exception("{}: These timepoints have been duplicated: {}".format(self._ticker, h.index[f_dups]))
 
-        h_copied = False
         if (start_dt is not None) and (end_dt is not None):
             # Broad filter: include extra data either side
             itd = yfcd.intervalToTimedelta[interval]
-            h = h.loc[start_dt-itd:end_dt+itd].copy()
-            h_copied = True
+            h = h.loc[start_dt-itd:end_dt+itd]
 
         if not keepna:
             price_data_cols = [c for c in yfcd.yf_data_cols if c in h.columns]
-            mask_nan_or_zero = (np.isnan(h[price_data_cols].to_numpy()) | (h[price_data_cols].to_numpy() == 0)).all(axis=1)
+            price_data = h[price_data_cols].to_numpy()
+            mask_nan_or_zero = (np.isnan(price_data) | (price_data == 0)).all(axis=1)
             if mask_nan_or_zero.any():
                 h = h.drop(h.index[mask_nan_or_zero])
-                h_copied = True
         # t3_filter = perf_counter()
 
         if h.shape[0] == 0:
             return h
 
+        # Build adjusted table in one go, much faster than setting columns one-by-one
+        csf = h["CSF"].to_numpy()
+        cdf = h["CDF"].to_numpy()
+        data = {c: h[c] for c in h.columns if c not in ["CSF", "CDF"]}
+        for c in ["Open", "Close", "Low", "High", "Dividends"]:
+            data[c] = h[c].to_numpy()
         if adjust_splits:
-            if not h_copied:
-                h = h.copy()
             for c in ["Open", "Close", "Low", "High", "Dividends"]:
-                h[c] = np.multiply(h[c].to_numpy(), h["CSF"].to_numpy())
-            h["Volume"] = np.round(np.divide(h["Volume"].to_numpy(), h["CSF"].to_numpy()), 0).astype('int')
+                data[c] = data[c] * csf
+            data["Volume"] = np.round(np.divide(h["Volume"].to_numpy(), csf), 0).astype('int')
         if adjust_divs:
-            if not h_copied:
-                h = h.copy()
             for c in ["Open", "Close", "Low", "High"]:
-                h[c] = np.multiply(h[c].to_numpy(), h["CDF"].to_numpy())
+                data[c] = data[c] * cdf
         else:
-            if not h_copied:
-                h = h.copy()
-            h["Adj Close"] = np.multiply(h["Close"].to_numpy(), h["CDF"].to_numpy())
-        h = h.drop(["CSF", "CDF"], axis=1)
+            data["Adj Close"] = data["Close"] * cdf
+        h = pd.DataFrame(data, index=h.index)
 
         if interval == yfcd.Interval.Week:
             h2 = yfcu.resample_1d_prices(h, '1wk')
@@ -374,23 +432,53 @@ class Ticker:
 
         return h
 
+    async def ahistory(self, *args, limiter=None, **kwargs):
+        # Async version of history(), same arguments. Runs in worker thread.
+        # If must fetch from Yahoo, first waits on 'limiter' e.g. asyncio.Semaphore,
+        # so caller can bound number of concurrent fetches.
+        if limiter is None:
+            return await asyncio.to_thread(self.history, *args, **kwargs)
+        try:
+            # Cheap, only serves fresh prices. Miss leaves Ticker state
+            # loaded, so history() below continues from there.
+            return await asyncio.to_thread(self._history_cache_only, *args, **kwargs)
+        except yfcd.CacheMissException:
+            pass
+        async with limiter:
+            return await asyncio.to_thread(self.history, *args, **kwargs)
+
+    def _history_cache_only(self, *args, **kwargs):
+        with yfcu.CacheOnly():
+            return self.history(*args, **kwargs)
+
     @property
     def history_metadata(self):
-        return yfcm.ReadCacheDatum(self._ticker, "history_metadata")
+        return yfcm.WritableCopy(yfcm.ReadCacheDatum(self._ticker, "history_metadata"))
+
+    def _getHistoriesManager(self):
+        with self._lock:
+            if self._histories_manager is None:
+                exchange, tz_name, lday = self._getExchangeAndTzAndListingDay()
+                self._histories_manager = yfcp.HistoriesManager(self._ticker, exchange, tz_name, lday, self._session)
+            return self._histories_manager
 
     def _getCachedPrices(self, interval):
-        if self._histories_manager is None:
-            exchange, tz_name, lday = self._getExchangeAndTzAndListingDay()
-            self._histories_manager = yfcp.HistoriesManager(self._ticker, exchange, tz_name, lday, self._session)
+        histories_manager = self._getHistoriesManager()
 
         if isinstance(interval, str):
             if interval not in yfcd.intervalStrToEnum.keys():
                 raise Exception("'interval' if str must be one of: {}".format(yfcd.intervalStrToEnum.keys()))
             interval = yfcd.intervalStrToEnum[interval]
 
-        return self._histories_manager.GetHistory(interval).h
+        return histories_manager.GetHistory(interval).h
 
     def _getExchangeAndTzAndListingDay(self):
+        if self._tz is not None and self._exchange is not None and self._listing_day is not None:
+            return self._exchange, self._tz, self._listing_day
+        with self._lock:
+            return self._fetchExchangeAndTzAndListingDay()
+
+    def _fetchExchangeAndTzAndListingDay(self):
         if self._tz is not None and self._exchange is not None and self._listing_day is not None:
             return self._exchange, self._tz, self._listing_day
 
@@ -411,6 +499,8 @@ class Ticker:
                 if lday is not None:
                     lday = lday.tz_convert(tz_name).date()
         except Exception:
+            yfcu.CheckFetchAllowed(self._ticker, "history_metadata")
+            yfcrl.Acquire("prices")
             md = yf.Ticker(self._ticker, session=self._session).history_metadata
             if 'exchangeName' in md:
                 exchange = md['exchangeName']
@@ -449,19 +539,18 @@ class Ticker:
 
         interval = yfcd.Interval.Days1
         cache_key = "history-"+yfcd.intervalToString[interval]
-        if not yfcm.IsDatumCached(self._ticker, cache_key):
+        if not yfhs.IsHistoryCached(self._ticker, cache_key):
             return True
 
         yfcl.TraceEnter(f"Ticker::verify_cached_prices(tkr={self._ticker} {fn_locals})")
 
-        if self._histories_manager is None:
-            exchange, tz_name, lday = self._getExchangeAndTzAndListingDay()
-            self._histories_manager = yfcp.HistoriesManager(self._ticker, exchange, tz_name, lday, self._session)
+        histories_manager = self._getHistoriesManager()
+        self._verify_results = {}
 
         v = True
 
         # First verify 1d
-        dt0 = self._histories_manager.GetHistory(interval)._getCachedPrices().index[0]
+        dt0 = histories_manager.GetHistory(interval)._getCachedPrices().index[0]
         try:
             self.history(start=dt0.date(), quiet=quiet, trigger_at_market_close=True)  # ensure have all dividends
         except yfcd.NoPriceDataInRangeException:
@@ -505,7 +594,7 @@ class Ticker:
                 continue
             istr = yfcd.intervalToString[interval]
             cache_key = "history-"+istr
-            if not yfcm.IsDatumCached(self._ticker, cache_key):
+            if not yfhs.IsHistoryCached(self._ticker, cache_key):
                 continue
             vi = self._verify_cached_prices_interval(interval, rtol, vol_rtol, correct, discard_old, quiet, debug)
             yfcl.TracePrint(f"{istr}: vi={vi}")
@@ -535,16 +624,15 @@ class Ticker:
 
         istr = yfcd.intervalToString[interval]
         cache_key = "history-"+istr
-        if not yfcm.IsDatumCached(self._ticker, cache_key):
+        if not yfhs.IsHistoryCached(self._ticker, cache_key):
             return True
 
         yfcl.TraceEnter(f"Ticker::_verify_cached_prices_interval(tkr={self._ticker}, {fn_locals})")
 
-        if self._histories_manager is None:
-            exchange, tz_name, lday = self._getExchangeAndTzAndListingDay()
-            self._histories_manager = yfcp.HistoriesManager(self._ticker, exchange, tz_name, lday, self._session)
+        histories_manager = self._getHistoriesManager()
 
-        v = self._histories_manager.GetHistory(interval)._verifyCachedPrices(rtol, vol_rtol, correct, discard_old, quiet, debug)
+        v = histories_manager.GetHistory(interval)._verifyCachedPrices(rtol, vol_rtol, correct, discard_old, quiet, debug)
+        self._verify_results[istr] = bool(v)
 
         yfcl.TraceExit(f"Ticker::_verify_cached_prices_interval() returning {v}")
         return v
@@ -554,6 +642,9 @@ class Ticker:
         return yfcu.ProcessUserDt(dt, tz_name)
 
     def get_attribute(self, name, max_age=None, merge=False, metadata=False):
+        return yfcm.WritableCopy(self._get_attribute(name, max_age, merge, metadata))
+
+    def _get_attribute(self, name, max_age=None, merge=False, metadata=False):
         if max_age is None:
             max_age = pd.Timedelta('365D')
         else:
@@ -600,7 +691,9 @@ class Ticker:
         if yfcm._option_manager.session.offline:
             return None if a is None else a['data']
 
+        yfcu.CheckFetchAllowed(self._ticker, name)
         if name in dir(self._dat):
+            yfcrl.Acquire("fundamentals")
             newd = getattr(self._dat, name)
         else:
             raise NotImplementedError(f"Implement fetching from YF: {name}")
@@ -673,6 +766,9 @@ class Ticker:
 
     @property
     def fast_info(self):
+        return yfcm.WritableCopy(self._get_fast_info())
+
+    def _get_fast_info(self):
         if self._fast_info is not None:
             return self._fast_info
 
@@ -688,6 +784,7 @@ class Ticker:
             return self._fast_info if self._fast_info else None
 
         self._fast_info = {}
+        yfcrl.Acquire("fundamentals")
         for k in self._dat.fast_info.keys():
             try:
                 self._fast_info[k] = self._dat.fast_info[k]
@@ -704,6 +801,9 @@ class Ticker:
         return self._fast_info
 
     def get_shares(self, start=None, end=None, max_age='30D'):
+        return yfcm.WritableCopy(self._get_shares(start, end, max_age))
+
+    def _get_shares(self, start=None, end=None, max_age='30D'):
         debug = False
         # debug = True
 
@@ -823,6 +923,7 @@ class Ticker:
 
         end_d = min(end_d, datetime.date.today() + td_1d)
 
+        yfcrl.Acquire("fundamentals")
         df = self._dat.get_shares_full(start_d, end_d)
         if df is None or df.empty:
             return None
@@ -875,46 +976,46 @@ class Ticker:
 
     @property
     def earnings(self):
-        return self._financials_manager.get_earnings()
+        return yfcm.WritableCopy(self._financials_manager.get_earnings())
 
     @property
     def quarterly_earnings(self):
-        return self._financials_manager.get_quarterly_earnings()
+        return yfcm.WritableCopy(self._financials_manager.get_quarterly_earnings())
 
     @property
     def income_stmt(self):
-        return self._financials_manager.get_income_stmt()
+        return yfcm.WritableCopy(self._financials_manager.get_income_stmt())
 
     @property
     def quarterly_income_stmt(self):
-        return self._financials_manager.get_quarterly_income_stmt()
+        return yfcm.WritableCopy(self._financials_manager.get_quarterly_income_stmt())
 
     @property
     def financials(self):
-        return self._financials_manager.get_income_stmt()
+        return yfcm.WritableCopy(self._financials_manager.get_income_stmt())
 
     @property
     def quarterly_financials(self):
-        return self._financials_manager.get_quarterly_income_stmt()
+        return yfcm.WritableCopy(self._financials_manager.get_quarterly_income_stmt())
 
     @property
     def balance_sheet(self):
-        return self._financials_manager.get_balance_sheet()
+        return yfcm.WritableCopy(self._financials_manager.get_balance_sheet())
 
     @property
     def quarterly_balance_sheet(self):
-        return self._financials_manager.get_quarterly_balance_sheet()
+        return yfcm.WritableCopy(self._financials_manager.get_quarterly_balance_sheet())
 
     @property
     def cashflow(self):
-        return self._financials_manager.get_cashflow()
+        return yfcm.WritableCopy(self._financials_manager.get_cashflow())
 
     @property
     def quarterly_cashflow(self):
-        return self._financials_manager.get_quarterly_cashflow()
+        return yfcm.WritableCopy(self._financials_manager.get_quarterly_cashflow())
 
     def get_earnings_dates(self, start):
-        return self._financials_manager.get_earnings_dates(start)
+        return yfcm.WritableCopy(self._financials_manager.get_earnings_dates(start))
 
     def get_release_dates(self, period='quarterly', as_df=False, check=True):
         if period not in ['annual', 'quarterly']:
@@ -927,6 +1028,7 @@ class Ticker:
         releases = self._financials_manager.get_release_dates(period, as_df=as_df, refresh=True, check=check)
         if releases is None:
             return releases
+        releases = yfcm.WritableCopy(releases)
 
         if as_df:
             # Format:
@@ -998,7 +1100,7 @@ class Ticker:
 
     @property
     def calendar(self):
-        return self._financials_manager.get_calendar()
+        return yfcm.WritableCopy(self._financials_manager.get_calendar())
 
     @property
     def isin(self):
@@ -1021,7 +1123,7 @@ class Ticker:
             raise Exception(f"'max_age' must be positive timedelta not {max_age}")
 
         if (self._options is not None) and (max_age > self._options_age):
-            return self._options
+            return yfcm.WritableCopy(self._options)
 
         md = None
         if yfcm.IsDatumCached(self._ticker, "options"):
@@ -1034,11 +1136,12 @@ class Ticker:
                     md = {}
                 self._options_age = pd.Timestamp.now() - md['FetchDate']
                 if self._options_age < max_age:
-                    return self._options
+                    return yfcm.WritableCopy(self._options)
 
         if yfcm._option_manager.session.offline:
-            return self._options if self._options else None
+            return yfcm.WritableCopy(self._options) if self._options else None
 
+        yfcrl.Acquire("options")
         o = self._dat.options
         if md is None:
             md = {}
@@ -1057,7 +1160,7 @@ class Ticker:
 
         self._options_age = pd.Timestamp.now() - md['FetchDate']
 
-        return self._options
+        return yfcm.WritableCopy(self._options)
 
     def option_chain(self, expiry_date, max_age=None):
         if expiry_date not in self.options:
@@ -1082,15 +1185,16 @@ class Ticker:
             age = pd.Timestamp.now() - md['FetchDate']
             # If 'expiry_date' in past, don't bother re-fetching from YF
             if age < max_age or pd.Timestamp(expiry_date) < pd.Timestamp.now():
-                return namedtuple('Options', ['calls', 'puts', 'underlying'])(**{
+                return yfcm.WritableCopy(namedtuple('Options', ['calls', 'puts', 'underlying'])(**{
                     "calls": self._option_chain[expiry_date]['calls'],
                     "puts": self._option_chain[expiry_date]['puts'], 
                     "underlying": self._option_chain[expiry_date]['underlying']
-                })
+                }))
 
         if yfcm._option_manager.session.offline:
             return None
 
+        yfcrl.Acquire("options")
         oc = self._dat.option_chain(expiry_date)
         md = {'FetchDate': pd.Timestamp.now()}
         self._option_chain[expiry_date] = {
@@ -1100,23 +1204,24 @@ class Ticker:
             'metadata': md
         }
         yfcm.StoreCacheDatum(self._ticker, "option_chain", self._option_chain)
-        return oc
+        return yfcm.WritableCopy(oc)
 
     @property
     def news(self):
         if self._news is not None:
-            return self._news
+            return yfcm.WritableCopy(self._news)
 
         if yfcm.IsDatumCached(self._ticker, "news"):
             self._news = yfcm.ReadCacheDatum(self._ticker, "news")
-            return self._news
+            return yfcm.WritableCopy(self._news)
 
         if yfcm._option_manager.session.offline:
             return None
 
+        yfcrl.Acquire("fundamentals")
         self._news = self._dat.news
         yfcm.StoreCacheDatum(self._ticker, "news", self._news)
-        return self._news
+        return yfcm.WritableCopy(self._news)
 
     @property
     def yf_lag(self):
@@ -1136,7 +1241,89 @@ class Ticker:
         return self._yf_lag
 
 
-def verify_cached_tickers_prices(session=None, rtol=0.0001, vol_rtol=0.005, correct=False, delist_action='raise', halt_on_fail=True, resume_from_tkr=None, debug_tkr=None, debug_interval=None):
+def _verify_journal_fp():
+    return os.path.join(yfcm.GetCacheDirpath(), "_YFC_", "verify_journal.jsonl")
+
+
+def _read_verify_journal(params):
+    # Results of interrupted verification with same parameters, else empty
+    fp = _verify_journal_fp()
+    results = {}
+    if not os.path.isfile(fp):
+        return results
+    with open(fp, 'r') as f:
+        lines = f.readlines()
+    try:
+        header = json.loads(lines[0])
+    except (IndexError, json.JSONDecodeError):
+        return results
+    if header.get("params") != params:
+        return results
+    for line in lines[1:]:
+        try:
+            e = json.loads(line)
+        except json.JSONDecodeError:
+            # Killed mid-write
+            continue
+        results[e["ticker"]] = e["result"]
+    return results
+
+
+def _append_verify_journal(lines):
+    fp = _verify_journal_fp()
+    os.makedirs(os.path.dirname(fp), exist_ok=True)
+    with open(fp, 'a') as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _verify_ticker_prices(tkr, session, rtol, vol_rtol, correct, delist_action, debug, debug_interval):
+    # Verify one ticker, return dict with 'status' and result of each interval
+    try:
+        dat = Ticker(tkr, session=session)
+    except Exception as e:
+        # if "exchange and timezone not available" in str(e):
+        if "info missing exchange" in str(e) or \
+            "exchange and timezone not available" in str(e) or \
+            (isinstance(e, KeyError) and 'exchange' in str(e)):
+            # Invalid ticker now, but maybe historically it was listed.
+
+            # First check what is in cache folder - 
+            # if just info.json with invalid data,
+            # then no data to preserve, just delete folder.
+            tkr_dp = yfcm.get_ticker_folder_path(tkr)
+            contents = [x for x in os.listdir(tkr_dp) if not (x.endswith(".meta.pkl") or x.startswith("."))]
+            if len(contents)==1 and contents[0] == 'info.json':
+                # Already know info[] lacks exchange/timezone, so no data.
+                shutil.rmtree(tkr_dp)
+                return {"status": "delisted", "action": "deleted"}
+
+            # There is real data, so user decides action:
+            if delist_action == 'keep':
+                return {"status": "delisted", "action": "kept"}
+            elif delist_action == 'delete':
+                shutil.rmtree(tkr_dp)
+                return {"status": "delisted", "action": "deleted"}
+        raise
+
+    discard_old = correct in ['one', 'all']
+    v = dat.verify_cached_prices(rtol=rtol, vol_rtol=vol_rtol, correct=correct, discard_old=discard_old, quiet=not debug, debug=debug, debug_interval=debug_interval)
+    if debug:
+        return {"status": "pass" if v else "fail", "intervals": dict(dat._verify_results)}
+
+    if correct in ['one', 'all']:
+        v = dat.verify_cached_prices(rtol=rtol, vol_rtol=vol_rtol, correct=correct, discard_old=False, quiet=True, debug=debug, debug_interval=debug_interval)
+    intervals = dict(dat._verify_results)
+
+    if not v and correct != 'all':
+        # Print why
+        dat.verify_cached_prices(rtol=rtol, vol_rtol=vol_rtol, correct=False, discard_old=False, quiet=False, debug=True, debug_interval=debug_interval)
+    return {"status": "pass" if v else "fail", "intervals": intervals}
+
+
+def verify_cached_tickers_prices(session=None, rtol=0.0001, vol_rtol=0.005, correct=False, delist_action='raise', halt_on_fail=True, resume_from_tkr=None, debug_tkr=None, debug_interval=None, threads=None):
     """
     :Parameters:
         session:
@@ -1151,15 +1338,26 @@ def verify_cached_tickers_prices(session=None, rtol=0.0001, vol_rtol=0.005, corr
         resume_from_tkr: str
             Resume verification from this ticker (alphabetical order).
             Because maybe you had to abort verification partway.
+            Not needed to resume with same arguments, progress
+            is journaled in cache folder.
         debug_tkr: str
             Only verify this ticker.
             Because maybe you want to investigate a difference.
+        threads: int
+            Verify this many tickers in parallel. Default one at a time.
+    :Returns:
+        Report dict, also stored in cache folder '_YFC_/verify_report.json'.
+        'tickers' maps ticker -> result: 'status' = 'pass', 'fail' or 'delisted',
+        and 'intervals' maps interval -> True if passed.
     """
 
     if debug_interval is not None and isinstance(debug_interval, str):
         if debug_interval not in yfcd.intervalStrToEnum.keys():
             raise Exception("'debug_interval' if str must be one of: {}".format(yfcd.intervalStrToEnum.keys()))
         debug_interval = yfcd.intervalStrToEnum[debug_interval]
+    if threads is not None:
+        if isinstance(threads, bool) or not isinstance(threads, int) or threads < 1:
+            raise ValueError(f"'threads' must be int >= 1, not '{threads}'")
 
     d = yfcm.GetCacheDirpath()
     tkrs = [x for x in os.listdir(d) if not x.startswith("exchange-") and os.path.isdir(os.path.join(d, x)) and '_' not in x]
@@ -1181,25 +1379,8 @@ def verify_cached_tickers_prices(session=None, rtol=0.0001, vol_rtol=0.005, corr
                 i += 1
             tkrs = tkrs[i:]
 
-    if debug_tkr is not None:
-        tkrs = [debug_tkr]
-    tqdm_loaded = False
-    try:
-        from tqdm import tqdm
-        t = tqdm(range(len(tkrs)))
-        tqdm_loaded = True
-    except ModuleNotFoundError:
-        print("Install Python module 'tqdm' to print progress bar + estimated time to completion")
-        t = range(len(tkrs))
-    for i in t:
-        tkr = tkrs[i]
-        if tqdm_loaded:
-            t.set_description("Verifying " + tkr)
-        else:
-            print(f"{tkr} : {i+1}/{len(tkrs)}")
-
+    if len(tkrs) > 0:
         # Success! Create marker to stop custom message showing on import.
-        d = yfcm.GetCacheDirpath()
         yfc_dp = os.path.join(d, "_YFC_")
         state_fp = os.path.join(yfc_dp, "have-recommended-verify")
         if not os.path.isfile(state_fp):
@@ -1208,48 +1389,90 @@ def verify_cached_tickers_prices(session=None, rtol=0.0001, vol_rtol=0.005, corr
             with open(state_fp, 'w'):
                 pass
 
+    verify_args = (session, rtol, vol_rtol, correct, delist_action, debug, debug_interval)
+    if debug:
         try:
-            dat = Ticker(tkr, session=session)
-        except Exception as e:
-            # if "exchange and timezone not available" in str(e):
-            if "info missing exchange" in str(e) or \
-                "exchange and timezone not available" in str(e) or \
-                (isinstance(e, KeyError) and 'exchange' in str(e)):
-                # Invalid ticker now, but maybe historically it was listed.
-
-                # First check what is in cache folder - 
-                # if just info.json with invalid data,
-                # then no data to preserve, just delete folder.
-                tkr_dp = yfcm.get_ticker_folder_path(tkr)
-                contents = os.listdir(tkr_dp)
-                if len(contents)==1 and contents[0] == 'info.json':
-                    # Already know info[] lacks exchange/timezone, so no data.
-                    shutil.rmtree(tkr_dp)
-                    continue
-
-                # There is real data, so user decides action:
-                if delist_action == 'keep':
-                    continue
-                elif delist_action == 'delete':
-                    shutil.rmtree(tkr_dp)
-                    continue
-            raise
-
-        try:
-            discard_old = correct in ['one', 'all']
-            v = dat.verify_cached_prices(rtol=rtol, vol_rtol=vol_rtol, correct=correct, discard_old=discard_old, quiet=not debug, debug=debug, debug_interval=debug_interval)
+            _verify_ticker_prices(debug_tkr, *verify_args)
         except yfcd.NoPriceDataInRangeException as e:
             print(str(e) + " - is it delisted? Aborting verification so you can investigate.")
-            return
-        if debug:
-            return
+        return
+
+    # Journal progress, so interrupted verification resumes automatically
+    params = {"rtol": rtol, "vol_rtol": vol_rtol, "correct": correct,
+              "debug_interval": None if debug_interval is None else yfcd.intervalToString[debug_interval]}
+    results = _read_verify_journal(params)
+    if len(results) == 0:
+        if os.path.isfile(_verify_journal_fp()):
+            os.remove(_verify_journal_fp())
+        _append_verify_journal([{"params": params, "started": pd.Timestamp.now("UTC").isoformat()}])
+    elif len(tkrs) > 0:
+        print(f"Resuming verification, {len(results)} tickers already verified")
+    tkrs_todo = [tkr for tkr in tkrs if tkr not in results]
 
-        if correct in ['one', 'all']:
-            v = dat.verify_cached_prices(rtol=rtol, vol_rtol=vol_rtol, correct=correct, discard_old=False, quiet=True, debug=debug, debug_interval=debug_interval)
+    tqdm_loaded = False
+    try:
+        from tqdm import tqdm
+        t = tqdm(total=len(tkrs_todo))
+        tqdm_loaded = True
+    except ModuleNotFoundError:
+        print("Install Python module 'tqdm' to print progress bar + estimated time to completion")
+        t = None
 
-        if not v and correct != 'all':
-            v = dat.verify_cached_prices(rtol=rtol, vol_rtol=vol_rtol, correct=False, discard_old=False, quiet=False, debug=True, debug_interval=debug_interval)
-            if halt_on_fail:
-                raise Exception(f"{tkr}: verify failing")
-            else:
-                print(f"{tkr}: verify failing")
+    def _process_result(i, tkr, r):
+        if tqdm_loaded:
+            t.set_description("Verified " + tkr)
+            t.update(1)
+        else:
+            print(f"{tkr} : {i+1}/{len(tkrs_todo)}")
+        if r["status"] == "fail" and correct != 'all' and halt_on_fail:
+            # Not journaled, so resuming verifies again
+            raise Exception(f"{tkr}: verify failing")
+        _append_verify_journal([{"ticker": tkr, "result": r}])
+        results[tkr] = r
+        if r["status"] == "fail" and correct != 'all':
+            print(f"{tkr}: verify failing")
+
+    try:
+        if threads is None or threads == 1:
+            for i in range(len(tkrs_todo)):
+                tkr = tkrs_todo[i]
+                if tqdm_loaded:
+                    t.set_description("Verifying " + tkr)
+                try:
+                    r = _verify_ticker_prices(tkr, *verify_args)
+                except yfcd.NoPriceDataInRangeException as e:
+                    print(str(e) + " - is it delisted? Aborting verification so you can investigate.")
+                    return
+                _process_result(i, tkr, r)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+                futures = {pool.submit(_verify_ticker_prices, tkr, *verify_args): tkr for tkr in tkrs_todo}
+                try:
+                    for i, f in enumerate(concurrent.futures.as_completed(futures)):
+                        tkr = futures[f]
+                        try:
+                            r = f.result()
+                        except yfcd.NoPriceDataInRangeException as e:
+                            print(str(e) + " - is it delisted? Aborting verification so you can investigate.")
+                            for f2 in futures:
+                                f2.cancel()
+                            return
+                        _process_result(i, tkr, r)
+                except BaseException:
+                    for f2 in futures:
+                        f2.cancel()
+                    raise
+    finally:
+        if tqdm_loaded:
+            t.close()
+
+    # Finished, so replace journal with report
+    report = {"params": params,
+              "finished": pd.Timestamp.now("UTC").isoformat(),
+              "counts": {s: 0 for s in ["pass", "fail", "delisted"]},
+              "tickers": {tkr: results[tkr] for tkr in sorted(results.keys())}}
+    for r in results.values():
+        report["counts"][r["status"]] += 1
+    yfcm.StoreCacheDatum("_YFC_", "verify_report", report)
+    os.remove(_verify_journal_fp())
+    return report
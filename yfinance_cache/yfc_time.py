@@ -1,7 +1,11 @@
+import os
+import sys
+import threading
+import zlib
+from collections import OrderedDict
 from pprint import pprint
 import sqlite3 as sql
 from copy import deepcopy
-from functools import lru_cache
 import functools
 
 from datetime import datetime, date, time, timedelta
@@ -19,173 +23,399 @@ from . import yfc_cache_manager as yfcm
 from . import yfc_utils as yfcu
 
 
+# Exchange metadata registry, per cache folder. Loaded once from disk,
+# then reads skip the exchange lock.
 exchangeTzCache = {}
+exchangeYfLagCache = {}
+
+
 def GetExchangeTzName(exchange):
     yfcu.TypeCheckStr(exchange, "exchange")
 
-    if exchange not in exchangeTzCache:
+    key = (yfcm.GetCacheDirpath(), exchange)
+    tz = exchangeTzCache.get(key)
+    if tz is None:
         tz = yfcm.ReadCacheDatum("exchange-"+exchange, "tz")
         if tz is None:
             raise Exception("Do not know timezone for exchange '{}'".format(exchange))
-        exchangeTzCache[exchange] = tz
-    else:
-        tz = exchangeTzCache[exchange]
+        exchangeTzCache[key] = tz
     return tz
+
+
+def _CheckExchangeTz(exchange, tz, tzc):
+    if tzc != tz:
+        # Different names but maybe same tz
+        tzc_zi = ZoneInfo(tzc)
+        tz_zi = ZoneInfo(tz)
+        dt = datetime.now()
+        if tz_zi.utcoffset(dt) != tzc_zi.utcoffset(dt):
+            print("tz_zi = {} ({})".format(tz_zi, type(tz_zi)))
+            print("tzc_zi = {} ({})".format(tzc_zi, type(tzc_zi)))
+            raise Exception("For exchange '{}', new tz {} != cached tz {}".format(exchange, tz, tzc))
+
+
 def SetExchangeTzName(exchange, tz):
     yfcu.TypeCheckStr(exchange, "exchange")
     yfcu.TypeCheckStr(tz, "tz")
 
+    key = (yfcm.GetCacheDirpath(), exchange)
+    tzc = exchangeTzCache.get(key)
+    if tzc is not None:
+        _CheckExchangeTz(exchange, tz, tzc)
+        return
+
     if not yfcd.has_exchange_lock(exchange):
         raise Exception(f"Need to add mapping of exchange {exchange} to xcal")
     exchange_lock = yfcd.get_exchange_lock(exchange)
     with exchange_lock:
         tzc = yfcm.ReadCacheDatum("exchange-"+exchange, "tz")
         if tzc is not None:
-            if tzc != tz:
-                # Different names but maybe same tz
-                tzc_zi = ZoneInfo(tzc)
-                tz_zi = ZoneInfo(tz)
-                dt = datetime.now()
-                if tz_zi.utcoffset(dt) != tzc_zi.utcoffset(dt):
-                    print("tz_zi = {} ({})".format(tz_zi, type(tz_zi)))
-                    print("tzc_zi = {} ({})".format(tzc_zi, type(tzc_zi)))
-                    raise Exception("For exchange '{}', new tz {} != cached tz {}".format(exchange, tz, tzc))
+            _CheckExchangeTz(exchange, tz, tzc)
         else:
-            exchangeTzCache[exchange] = tz
+            tzc = tz
             yfcm.StoreCacheDatum("exchange-"+exchange, "tz", tz)
+        exchangeTzCache[key] = tzc
+
+
+def GetExchangeDataDelay(exchange):
+    yfcu.TypeCheckStr(exchange, "exchange")
 
-calCache = {}
-schedCache = {}
+    key = (yfcm.GetCacheDirpath(), exchange)
+    d = exchangeYfLagCache.get(key)
+    if d is None:
+        d = yfcm.ReadCacheDatum("exchange-"+exchange, "yf_lag")
+        if d is None:
+            d = yfcd.exchangeToYfLag[exchange]
+        exchangeYfLagCache[key] = d
+    return d
+
+
+def _TableNbytes(x):
+    if x is None:
+        return 0
+    if isinstance(x, pd.DataFrame):
+        return int(x.memory_usage(index=True, deep=False).sum())
+    if isinstance(x, pd.IntervalIndex):
+        return x.left.nbytes + x.right.nbytes
+    if isinstance(x, tuple):
+        return sum(_TableNbytes(v) for v in x)
+    if isinstance(x, np.ndarray):
+        return x.nbytes
+    if isinstance(x, xcal.ExchangeCalendar):
+        # Schedule and session arrays, ignore small attributes
+        n = _TableNbytes(x.schedule)
+        n += sum(v.nbytes for v in vars(x).values() if isinstance(v, np.ndarray))
+        return n
+    if isinstance(x, yfcd.DateIntervalIndex):
+        # Object arrays, so also count the Interval and date objects
+        n = x.array.nbytes + x._left.nbytes + x._right.nbytes + x._right_inc.nbytes
+        if len(x) > 0:
+            n += len(x) * (sys.getsizeof(x.array[0]) + 3*sys.getsizeof(x._left[0]))
+        return n
+    return sys.getsizeof(x)
+
+
+class _TableCache:
+    # LRU of schedule tables, keys start with exchange. Values are shared
+    # between callers so must not be modified. Size is estimated
+    # from table arrays, limit set by option 'calendar.cache_mb'.
+
+    def __init__(self):
+        self._d = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _max_bytes(self):
+        mb = yfcm._option_manager.calendar.cache_mb
+        if mb is None:
+            mb = cache_mb_default
+        return mb * 1024 * 1024
+
+    def _pop(self, key):
+        e = self._d.pop(key, None)
+        if e is not None:
+            self.nbytes -= e[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            e = self._d.get(key)
+            if e is None:
+                self.misses += 1
+                return default
+            self._d.move_to_end(key)
+            self.hits += 1
+            return e[1]
+
+    def put(self, key, value):
+        n = _TableNbytes(value)
+        max_bytes = self._max_bytes()
+        if n > max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._d[key] = (n, value)
+            self.nbytes += n
+            while self.nbytes > max_bytes:
+                self._pop(next(iter(self._d)))
+                self.evictions += 1
+
+    def invalidate_exchange(self, exchange):
+        with self._lock:
+            keys = [k for k in self._d if k[0] == exchange]
+            for k in keys:
+                self._pop(k)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._d.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._d)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "invalidations": self.invalidations, "entries": len(self._d), "bytes": self.nbytes}
+
+
+# Thread-safety: sessionIndexCache only extended holding exchange lock.
+# calCache, schedCache and schedIntervalsCache are bounded LRUs with own lock.
+# Worst case two threads calculate same entry.
+# sessionIndexCache: exchange -> SessionIndex
+cache_mb_default = 64
+_cacheMissing = object()
+calCache = _TableCache()
+schedCache = _TableCache()
 schedDbMetadata = {}
 db_mem = sql.connect(":memory:")
-schedIntervalsCache = {}
+schedIntervalsCache = _TableCache()
+sessionIndexCache = {}
 
 
-# TODO: Ensure all methods support Monthly intervals, e.g. GetTimestampCurrentInterval
+def GetScheduleCacheStats():
+    return {"calendars": calCache.stats(), "schedules": schedCache.stats(), "intervals": schedIntervalsCache.stats()}
 
 
-def GetExchangeDataDelay(exchange):
+def InvalidateExchangeSchedules(exchange):
+    # Discard tables derived from exchange calendar, e.g. after calendar extended
     yfcu.TypeCheckStr(exchange, "exchange")
+    calCache.invalidate_exchange(exchange)
+    schedCache.invalidate_exchange(exchange)
+    schedIntervalsCache.invalidate_exchange(exchange)
 
-    d = yfcm.ReadCacheDatum("exchange-"+exchange, "yf_lag")
-    if d is None:
-        d = yfcd.exchangeToYfLag[exchange]
-    return d
 
+def ClearScheduleCaches():
+    calCache.clear()
+    schedCache.clear()
+    schedIntervalsCache.clear()
 
-def Simple247xcal(opens, closes):
-    yfcu.TypeCheckDatetimeIndex(opens, 'opens')
-    yfcu.TypeCheckDatetimeIndex(closes, 'closes')
 
-    # Use any xcal calendar as base
-    cal = xcal.get_calendar('NYSE')
+# TODO: Ensure all methods support Monthly intervals, e.g. GetTimestampCurrentInterval
 
-    cal._opens = opens
-    cal._closes = closes
 
-    cal.schedule = pd.DataFrame(data={"open":opens, "close":closes}, index=opens)
-    cal.schedule.index = cal.schedule.index.tz_localize(None)
-    cal.schedule['break_start'] = pd.NaT
-    cal.schedule['break_end'] = pd.NaT
+def _dt_nanos(x):
+    x = pd.DatetimeIndex(x)
+    if pdV.startswith('3'):
+        x = x.as_unit('ns')
+    return x.asi8
 
-    cal.opens_nanos = np.array([x.value for x in opens])
-    cal.closes_nanos = np.array([x.value for x in closes])
 
-    cal._late_opens = []
-    cal._early_closes = []
+_epoch_ordinal = date(1970, 1, 1).toordinal()
+def _date_nanos(d):
+    return (d.toordinal() - _epoch_ordinal) * 86400 * 1000000000
 
-    cal._break_starts = None
-    cal._break_ends = None
-    if pdV.startswith('3'):
-        cal.break_starts_nanos = cal.schedule['break_start'].as_unit('ns').values.astype(np.int64)
-        cal.break_ends_nanos = cal.schedule['break_end'].as_unit('ns').values.astype(np.int64)
-    else:
-        cal.break_starts_nanos = cal.schedule['break_start'].values.astype(np.int64)
-        cal.break_ends_nanos = cal.schedule['break_end'].values.astype(np.int64)
 
-    return cal
+def _nanos_to_dt(x, tz):
+    # Much faster than pd.to_datetime(x, utc=True)
+    x = np.array(x, dtype=np.int64).view('datetime64[ns]')
+    return pd.DatetimeIndex(x).tz_localize("UTC").tz_convert(tz)
 
 
-def JoinTwoXcals(cal1, cal2):
-    # TODO: Check no overlap, and also they are close together implying no business days between
+def _BuildSessionIndex(exchange, sched):
+    days = _dt_nanos(sched.index)
+    opens = _dt_nanos(sched["open"])
+    closes = _dt_nanos(sched["close"])
+    nats = np.full(len(sched), yfcd.SessionIndex.nat, dtype=np.int64)
+    break_starts = _dt_nanos(sched["break_start"]) if "break_start" in sched.columns else nats
+    break_ends = _dt_nanos(sched["break_end"]) if "break_end" in sched.columns else nats
+    auctions = nats
+    ends = closes
+    if "auction" in sched.columns:
+        auctions = _dt_nanos(sched["auction"])
+        f = auctions != yfcd.SessionIndex.nat
+        if f.any():
+            auction_ends = auctions + pd.Timedelta(yfcd.exchangeAuctionDuration[exchange]).value
+            ends = np.where(f, np.maximum(closes, auction_ends), closes)
+    return yfcd.SessionIndex.from_arrays(days, opens, closes, break_starts, break_ends, auctions, ends)
+
+
+def _FetchSessionIndex(exchange, start_year, end_year):
+    # Calculate sessions with xcal, and apply YFC modifications
+    start = date(start_year, 1, 1)
+    end = date(end_year, 12, 31)
+    tz = ZoneInfo(GetExchangeTzName(exchange))
+
+    if exchange == 'CCC':
+        opens = pd.date_range(start=start, end=end, freq='1d').tz_localize(tz)
+        closes = opens + pd.Timedelta('1d')
+        return yfcd.SessionIndex.from_arrays(_dt_nanos(opens.tz_localize(None)), _dt_nanos(opens), _dt_nanos(closes))
+
+    cal = xcal.get_calendar(yfcd.exchangeToXcalExchange[exchange], start=start, end=end)
+    df = cal.schedule.copy()
+    df["close"] = df["close"].dt.tz_convert(tz)
+    if exchange in yfcd.exchangesWithAuction:
+        df["auction"] = df["close"] + yfcd.exchangeAuctionDelay[exchange]
+    if exchange == "ASX":
+        # Yahoo sometimes returns trading data occurring
+        # between 4pm and 4:01pm. TradingView agress.
+        # Have to assume this is real data.
+        f = df["close"].dt.time == time(16)
+        if f.any():
+            closes = df["close"].to_numpy()
+            closes[f] += timedelta(minutes=1)
+            df["close"] = closes
+    return _BuildSessionIndex(exchange, df)
+
+
+def _JoinSessionIndexes(si1, si2):
+    a = np.concatenate([si1.array, si2.array], axis=1)
+    return yfcd.SessionIndex(a[:, np.argsort(a[0], kind="stable")])
+
+
+def _SessionIndexFilepath(exchange):
+    return os.path.join(yfcm.get_ticker_folder_path("exchange-"+exchange), "sessions.npy")
+
 
-    if cal1.schedule.index[0] > cal2.schedule.index[0]:
-        # Flip
-        tmp = cal1
-        cal1 = cal2
-        cal2 = tmp
+def _ReadSessionIndex(exchange):
+    # Memory-mapped read-only, so processes share same pages
+    fp = _SessionIndexFilepath(exchange)
+    with yfcm.CacheLock("exchange-"+exchange, "sessions", exclusive=False):
+        if not os.path.isfile(fp):
+            return None
+        try:
+            return yfcd.SessionIndex(np.load(fp, mmap_mode='r'))
+        except (ValueError, TypeError, OSError):
+            return None
+
+
+def _StoreSessionIndex(exchange, si):
+    fp = _SessionIndexFilepath(exchange)
+    os.makedirs(os.path.dirname(fp), exist_ok=True)
+    with yfcm.CacheLock("exchange-"+exchange, "sessions"):
+        with yfcm.OpenAtomic(fp, 'wb') as f:
+            np.save(f, si.array)
+        # Discard versioned files of older YFC
+        for fn in os.listdir(os.path.dirname(fp)):
+            if fn.startswith("sessions-") and fn.endswith(".npy"):
+                os.remove(os.path.join(os.path.dirname(fp), fn))
+
+
+def _MigrateCalendarPickle(exchange):
+    # Calendars used to be pickled xcal objects, discarded whenever
+    # xcal/numpy/pandas upgraded. Convert to sessions if still readable.
+    cache_key = "exchange-"+exchange
+    si = None
+    try:
+        cal = yfcm.ReadCacheDatum(cache_key, "cal")
+        if cal is not None:
+            si = _BuildSessionIndex(exchange, cal.schedule)
+    except Exception:
+        si = None
+    if yfcm.GetFilepath(cache_key, "cal") is not None:
+        yfcm.StoreCacheDatum(cache_key, "cal", None)
+    return si
 
-    cal12 = deepcopy(cal1)
 
-    def _safeAppend(a1, a2):
-        if a1 is not None and a2 is not None:
-            return np.append(a1, a2)
-        elif a1 is not None:
-            return a1
+def _GetSessionIndexViaCache(exchange, start_year, end_year):
+    # Calendar persisted as session arrays, independent of xcal/numpy/pandas
+    # versions. Extended by fetching only missing years.
+    if exchange not in yfcd.exchangeToXcalExchange:
+        raise Exception("Need to add mapping of exchange {} to xcal".format(exchange))
+
+    exchange_lock = yfcd.get_exchange_lock(exchange)
+    with exchange_lock:
+        si0 = sessionIndexCache.get(exchange)
+        si = si0
+        if si is None or not si.covers(start_year, end_year):
+            # Maybe another process has extended it
+            si_f = _ReadSessionIndex(exchange)
+            if si_f is not None and (si is None or len(si_f) > len(si)):
+                si = si_f
+        changed = False
+        if si is None:
+            si = _MigrateCalendarPickle(exchange)
+            changed = si is not None
+
+        # Fetch missing years
+        if si is None:
+            si = _FetchSessionIndex(exchange, start_year, end_year)
+            changed = True
         else:
-            return a2
-    #
-    cal12.schedule = pd.concat([cal1.schedule, cal2.schedule])
-    #
-    cal12._opens = _safeAppend(cal1._opens, cal2._opens)
-    cal12._break_starts = _safeAppend(cal1._break_starts, cal2._break_starts)
-    cal12._break_ends = _safeAppend(cal1._break_ends, cal2._break_ends)
-    cal12._closes = _safeAppend(cal1._closes, cal2._closes)
-    #
-    cal12.opens_nanos = _safeAppend(cal1.opens_nanos, cal2.opens_nanos)
-    cal12.break_starts_nanos = _safeAppend(cal1.break_starts_nanos, cal2.break_starts_nanos)
-    cal12.break_ends_nanos = _safeAppend(cal1.break_ends_nanos, cal2.break_ends_nanos)
-    cal12.closes_nanos = _safeAppend(cal1.closes_nanos, cal2.closes_nanos)
-    #
-    cal12._late_opens = _safeAppend(cal1._late_opens, cal2._late_opens)
-    cal12._early_closes = _safeAppend(cal1._early_closes, cal2._early_closes)
-
-    # Clear cached attributes e.g. sessions_nanos
-    parent_class = cal12.__class__.__bases__[0]
-    for name, value in parent_class.__dict__.items():
-        if isinstance(value, functools.cached_property):
-            if name in cal12.__dict__:
-                delattr(cal12, name)
-
-    # Still possible for cal12 to be out-of-order. Probably when 
-    # one has a time-gap in which the other cal fits.
-    sched2 = cal12.schedule.sort_index()
-    if (sched2.index != cal12.schedule.index).any():
-        # Was out-of-order.
-        
-        # Get the sorting indices from pandas
-        sort_indices = cal12.schedule.index.argsort()
-
-        # Apply
-        cal12.schedule           = cal12.schedule.iloc[sort_indices]
-        cal12._opens             = cal12._opens[sort_indices]
-        cal12._break_starts      = cal12._break_starts[sort_indices]
-        cal12._break_ends        = cal12._break_ends[sort_indices]
-        cal12._closes            = cal12._closes[sort_indices]
-        cal12.opens_nanos        = cal12.opens_nanos[sort_indices]
-        cal12.break_starts_nanos = cal12.break_starts_nanos[sort_indices]
-        cal12.break_ends_nanos   = cal12.break_ends_nanos[sort_indices]
-        cal12.closes_nanos       = cal12.closes_nanos[sort_indices]
-        cal12._late_opens        = cal12._late_opens[sort_indices]        if cal12._late_opens else []
-        cal12._early_closes      = cal12._early_closes[sort_indices]      if cal12._early_closes else []
-
-    return cal12
-
-
-@lru_cache(maxsize=1000)
-def GetCalendarViaCache(exchange, start, end=None):
-    global calCache
+            cached_range = si.years
+            if start_year < cached_range[0]:
+                si = _JoinSessionIndexes(_FetchSessionIndex(exchange, start_year, cached_range[0]-1), si)
+                changed = True
+            if end_year > cached_range[1]:
+                si = _JoinSessionIndexes(si, _FetchSessionIndex(exchange, cached_range[1]+1, end_year))
+                changed = True
+
+        if changed:
+            _StoreSessionIndex(exchange, si)
+        if si0 is not si:
+            sessionIndexCache[exchange] = si
+            if si0 is not None:
+                InvalidateExchangeSchedules(exchange)
+    return si
+
+
+def _SessionIndexTradingIntervals(si, start_d, end_d, itd, ignore_breaks, align):
+    # Intervals of sessions start_d <= day < end_d, as UTC nanos. Same as
+    # xcal trading_index(intervals=True, force_close=True, align=align) but
+    # direct from session arrays, so no xcal calendar needed.
+    # 'align' must be negative i.e. first interval starts at/before open.
+    i0, i1 = si.get_day_range(_date_nanos(start_d), _date_nanos(end_d))
+    si = si[i0:i1]
+    if ignore_breaks:
+        f_break = np.full(len(si), False)
+    else:
+        f_break = si.break_starts != yfcd.SessionIndex.nat
+    # Subsessions. Morning interval can run past break start, as xcal.
+    starts = np.concatenate([si.opens[~f_break], si.opens[f_break], si.break_ends[f_break]])
+    ends = np.concatenate([si.closes[~f_break], si.break_starts[f_break], si.closes[f_break]])
+    force_close = np.concatenate([np.full((~f_break).sum(), True), np.full(f_break.sum(), False), np.full(f_break.sum(), True)])
+
+    a = -pd.Timedelta(align).value
+    p = pd.Timedelta(itd).value
+    starts = starts - starts % a
+    n = -((starts - ends) // p)
+    ranges = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    lefts = np.repeat(starts, n) + ranges * p
+    rights = lefts + p
+    f = np.repeat(force_close, n)
+    rights[f] = np.minimum(rights[f], np.repeat(ends, n)[f])
+
+    idx = np.argsort(lefts, kind="stable")
+    lefts, rights = lefts[idx], rights[idx]
+    if (rights[:-1] > lefts[1:]).any():
+        raise xcal.errors.IntervalsOverlapError
+    return lefts, rights
+
 
+def GetCalendarViaCache(exchange, start, end=None):
     debug = False
     # debug = True
 
     if debug:
         log_msg = f"GetCalendarViaCache(exchange={exchange}, start={start}, end={end})"
-        # yfc_logger = yfcl.GetLogger("exchange-"+exchange)
-        # yfc_logger.debug(log_msg)
         if yfcl.IsTracingEnabled():
             yfcl.TraceEnter(log_msg)
-        elif debug_yfc:
+        else:
             print(log_msg)
 
     if isinstance(start, date):
@@ -208,114 +438,13 @@ def GetCalendarViaCache(exchange, start, end=None):
     if end is None:
         end = date.today().year
 
-    cache_key = "exchange-"+exchange
-    if exchange not in yfcd.exchangeToXcalExchange:
-        raise Exception("Need to add mapping of exchange {} to xcal".format(exchange))
-    cal_name = yfcd.exchangeToXcalExchange[exchange]
-
-    cal = None
-
-    exchange_lock = yfcd.get_exchange_lock(exchange)
-
-    def _customModSchedule(cal):
-        tz = ZoneInfo(GetExchangeTzName(exchange))
-        df = cal.schedule
-        df["open"] = df["open"].dt.tz_convert(tz)
-        df["close"] = df["close"].dt.tz_convert(tz)
-        if (exchange in yfcd.exchangesWithAuction) and ("auction" not in df.columns):
-            df["auction"] = df["close"] + yfcd.exchangeAuctionDelay[exchange]
-        df["idx_nanos"] = df.index.values.astype("int64")
-        if exchange == "ASX":
-            # Yahoo sometimes returns trading data occurring
-            # between 4pm and 4:01pm. TradingView agress.
-            # Have to assume this is real data.
-            f = df["close"].dt.time == time(16)
-            if f.any():
-                # df.loc[f, "close"] += timedelta(minutes=1)
-                closes = df["close"].to_numpy()
-                closes[f] += timedelta(minutes=1)
-                df["close"] = closes
-                if pdV.startswith('3'):
-                    cal.closes_nanos = df["close"].as_unit('ns').values.astype(np.int64)
-                else:
-                    cal.closes_nanos = df["close"].values.astype("int64")
+    key = (exchange, start, end)
+    cal = calCache.get(key, _cacheMissing)
+    if cal is not _cacheMissing:
         return cal
 
-    with exchange_lock:
-        # Load from cache
-        if cal_name in calCache:
-            cal = calCache[cal_name]
-        elif yfcm.IsDatumCached(cache_key, "cal"):
-            # xcal pickling and loading is very sensitive to versions of np and pd.
-            # (Luckily, not yfinance dataframes)
-            try:
-                cal, md = yfcm.ReadCacheDatum(cache_key, "cal", True)
-            except NotImplementedError as e:
-                if 'datetime64' in str(e) and 'array' in str(e):
-                    # Pandas 2 does not like df pickled with Pandas 3
-                    cal = None
-            except AttributeError as e:
-                if "__nat_unpickle" in str(e):
-                    # Pandas 3 does not like df pickled with Pandas 2
-                    cal = None
-            else:
-                if xcal.__version__ != md["version"]:
-                    cal = None
-                elif ('np version' not in md) or (md['np version'] != np.__version__):
-                    cal = None
-                elif ('pd version' not in md) or (md['pd version'] != pd.__version__):
-                    cal = None
-            if cal is None:
-                # delete from cache
-                md = None
-                yfcm.StoreCacheDatum(cache_key, "cal", None)
-
-        # Calculate missing data
-        pre_range = None ; post_range = None
-        if cal is not None:
-            cached_range = (cal.schedule.index[0].year, cal.schedule.index[-1].year)
-            if start < cached_range[0]:
-                pre_range = (start, cached_range[0]-1)
-            if end > cached_range[1]:
-                post_range = (cached_range[1]+1, end)
-        else:
-            pre_range = (start, end)
-
-        # Fetch missing data
-        if pre_range is not None:
-            start = date(pre_range[0], 1, 1)
-            end = date(pre_range[1], 12, 31)
-            if exchange == 'CCC':
-                opens = pd.date_range(start=start, end=end, freq='1d').tz_localize(ZoneInfo(GetExchangeTzName(exchange)))
-                ends = opens + pd.Timedelta('1d')
-                pre_cal = Simple247xcal(opens, ends)
-            else:
-                pre_cal = xcal.get_calendar(cal_name, start=start, end=end)
-            pre_cal = _customModSchedule(pre_cal)
-            if cal is None:
-                cal = pre_cal
-            else:
-                cal = JoinTwoXcals(pre_cal, cal)
-        if post_range is not None:
-            start = date(post_range[0], 1, 1)
-            end = date(post_range[1], 12, 31)
-            if exchange == 'CCC':
-                opens = pd.date_range(start=start, end=end, freq='1d').tz_localize(ZoneInfo(GetExchangeTzName(exchange)))
-                ends = opens + pd.Timedelta('1d')
-                post_cal = Simple247xcal(opens, ends)
-            else:
-                post_cal = xcal.get_calendar(cal_name, start=start, end=end)
-            if post_cal is not None:
-                post_cal = _customModSchedule(post_cal)
-                if cal is None:
-                    cal = post_cal
-                else:
-                    cal = JoinTwoXcals(cal, post_cal)
-
-        # Write to cache
-        calCache[cal_name] = cal
-        if pre_range is not None or post_range is not None:
-            yfcm.StoreCacheDatum(cache_key, "cal", cal, metadata={"version": xcal.__version__, 'np version': np.__version__})
+    # Note: plain xcal calendar, without YFC modifications to sessions
+    cal = xcal.get_calendar(yfcd.exchangeToXcalExchange[exchange], start=date(start, 1, 1), end=date(end, 12, 31))
 
     if debug:
         log_msg = f"Returning schedule {cal.schedule.index[0].date()} -> {cal.schedule.index[-1].date()}"
@@ -324,16 +453,81 @@ def GetCalendarViaCache(exchange, start, end=None):
         else:
             print(log_msg)
 
+    calCache.put(key, cal)
     return cal
 
 
+def GetExchangeSessionIndex(exchange, start_d, end_d=None):
+    # Sessions covering at least years of 'start_d' -> 'end_d'.
+    # Shared with other processes via .npy file, see PrepareSharedSessionIndexes().
+    yfcu.TypeCheckStr(exchange, "exchange")
+    yfcu.TypeCheckDateStrict(start_d, "start_d")
+    if end_d is None:
+        end_d = start_d
+    else:
+        yfcu.TypeCheckDateStrict(end_d, "end_d")
+
+    si = sessionIndexCache.get(exchange)
+    if si is not None and si.covers(start_d.year, end_d.year):
+        return si
+    return _GetSessionIndexViaCache(exchange, start_d.year, end_d.year)
+
+
+def PrepareSharedSessionIndexes(exchanges=None, start_d=None):
+    # Ensure session files cover 'start_d' -> today, so worker processes
+    # can memory-map them instead of each loading xcal calendars.
+    # Caller should set 'start_d' to earliest date workers need, e.g.
+    # earliest listing date. Default = earliest year already cached for
+    # each exchange, else this year.
+    # Default exchanges = all with timezone in cache.
+    if start_d is not None:
+        yfcu.TypeCheckDateStrict(start_d, "start_d")
+    if exchanges is None:
+        exchanges = [e for e in yfcd.exchangeToXcalExchange if os.path.isdir(yfcm.get_ticker_folder_path("exchange-"+e))]
+    end_d = date.today()
+    for exchange in exchanges:
+        if exchange not in yfcd.exchangeToXcalExchange:
+            continue
+        try:
+            GetExchangeTzName(exchange)
+        except Exception:
+            # Worker will have to build it
+            continue
+        if start_d is not None:
+            d0 = min(start_d, end_d)
+        else:
+            si = sessionIndexCache.get(exchange)
+            if si is None:
+                si = _ReadSessionIndex(exchange)
+            d0 = end_d if si is None or si.empty else min(date(si.years[0], 1, 1), end_d)
+        si = GetExchangeSessionIndex(exchange, d0, end_d)
+        si_f = _ReadSessionIndex(exchange)
+        if si_f is None or not si_f.covers(d0.year, end_d.year):
+            # In memory but not on disk, e.g. cache folder changed
+            _StoreSessionIndex(exchange, si)
+
+
 def ExchangeOpenOnDay(exchange, d):
     yfcu.TypeCheckStr(exchange, "exchange")
     yfcu.TypeCheckDateStrict(d, "d")
 
-    cal = GetCalendarViaCache(exchange, d)
+    si = GetExchangeSessionIndex(exchange, d)
+
+    return si.get_day_indexer(_date_nanos(d))[0] != -1
 
-    return d.isoformat() in cal.schedule.index
+
+def _SessionIndexToSchedule(exchange, si, start_d, end_d):
+    # DataFrame like xcal schedule of sessions start_d <= day < end_d
+    i0, i1 = si.get_day_range(_date_nanos(start_d), _date_nanos(end_d))
+    if i0 == i1:
+        return None
+    si = si[i0:i1]
+    tz = ZoneInfo(GetExchangeTzName(exchange))
+    data = {"open": _nanos_to_dt(si.opens, tz), "close": _nanos_to_dt(si.closes, tz)}
+    if exchange in yfcd.exchangesWithAuction:
+        data["auction"] = _nanos_to_dt(si.auctions, tz)
+    data["idx_nanos"] = si.days
+    return pd.DataFrame(data, index=pd.to_datetime(si.days))
 
 
 # @lru_cache(maxsize=1000)  # changes index of returned dataframe from datetimeindex to index
@@ -358,22 +552,21 @@ def GetExchangeSchedule(exchange, start_d, end_d):
     if num_years <= 2:
         # Cache
         cache_key = (exchange, start_d.year, num_years)
-        if cache_key in schedCache:
-            s = schedCache[cache_key]
-        else:
-            cal = GetCalendarViaCache(exchange, start_d, end_d)
-            s = cal.schedule.loc[str(start_d.year):str(end_d_sub1.year)].copy()
-            schedCache[cache_key] = s
+        s = schedCache.get(cache_key, _cacheMissing)
+        if s is _cacheMissing:
+            si = GetExchangeSessionIndex(exchange, start_d, end_d_sub1)
+            s = _SessionIndexToSchedule(exchange, si, date(start_d.year, 1, 1), date(end_d_sub1.year+1, 1, 1))
+            schedCache.put(cache_key, s)
     else:
-        cal = GetCalendarViaCache(exchange, start_d, end_d)
-        s = cal.schedule
+        si = GetExchangeSessionIndex(exchange, start_d, end_d_sub1)
+        s = _SessionIndexToSchedule(exchange, si, start_d, end_d)
 
     if s is not None:
         start_ts = pd.Timestamp(start_d)
         end_ts = pd.Timestamp(end_d_sub1)
         slice_start = s["idx_nanos"].values.searchsorted(start_ts.value, side="left")
         slice_end = s["idx_nanos"].values.searchsorted(end_ts.value, side="right")
-        sched = s[slice_start:slice_end].copy()
+        sched = s[slice_start:slice_end]
     else:
         sched = None
 
@@ -383,6 +576,7 @@ def GetExchangeSchedule(exchange, start_d, end_d):
         cols = ["open", "close"]
         if "auction" in sched.columns:
             cols.append("auction")
+        # Selecting columns copies, so cached table safe
         df = sched[cols]
 
     if debug:
@@ -394,7 +588,6 @@ def GetExchangeSchedule(exchange, start_d, end_d):
     return df
 
     # Experiment with sqlite3. But pd.read_sql() -> _parse_date_columns() kills performance
-    global calCache
     global schedDbMetadata
     global db_mem
     if exchange not in schedDbMetadata:
@@ -503,6 +696,169 @@ def MapPeriodToDates(exchange, period, interval):
     return start_d, end_d
 
 
+def _CalcIntradayIntervals(exchange, interval, start_d, end_d, ignore_breaks):
+    itd = yfcd.intervalToTimedelta[interval]
+    istr = yfcd.intervalToString[interval]
+    tz = ZoneInfo(GetExchangeTzName(exchange))
+    td_1d = timedelta(days=1)
+    si = GetExchangeSessionIndex(exchange, start_d, end_d-td_1d)
+    if itd > timedelta(minutes=30):
+        align = "-30m"
+    else:
+        align = "-" + istr
+    lefts, rights = _SessionIndexTradingIntervals(si, start_d, end_d, itd, ignore_breaks, align)
+    if len(lefts) == 0:
+        return None
+    intervals_df = pd.DataFrame(data={"interval_open": _nanos_to_dt(lefts, tz), "interval_close": _nanos_to_dt(rights, tz)})
+    if exchange in yfcd.exchangesWithAuction:
+        sched = GetExchangeSchedule(exchange, start_d, end_d)
+        sched.index = sched.index.date
+
+        # Will map auction time to an interval by flooring relative to market open.
+        # Implemented by flooring then applying offset calculated from floored market open.
+        intervals_grp = intervals_df.groupby(intervals_df["interval_open"].dt.date)
+        # 1 - calculate offset
+        res = 'h' if istr.endswith('h') else istr.replace('m', 'min')
+        market_opens = intervals_grp.min()["interval_open"]
+        if len(market_opens.dt.time.unique()) == 1:
+            open0 = market_opens.iloc[0]
+            offset = open0 - open0.floor(res)
+            auctions_df = sched[["auction"]].copy()
+        else:
+            market_opens.name = "day_open"
+            market_opens.index.name = "day"
+            auctions_df = sched[["auction"]].join(market_opens)
+            offset = auctions_df["day_open"] - auctions_df["day_open"].dt.floor(res)
+        # 2 perform relative flooring:
+        if isinstance(offset, pd.Timedelta) and len(auctions_df["auction"].dt.time.unique()) == 1:
+            auction0 = auctions_df["auction"].iloc[0]
+            auction0_floor = (auction0-offset).floor(res) + offset
+            open_offset = auction0_floor - auction0
+            auctions_df["auction_open"] = auctions_df["auction"] + open_offset
+        else:
+            auctions_df["auction_open"] = (auctions_df["auction"]-offset).dt.floor(res) + offset
+        auctions_df["auction_close"] = auctions_df["auction"] + yfcd.exchangeAuctionDuration[exchange]
+        auctions_df = auctions_df.drop(["day_open", "auction"], axis=1, errors="ignore")
+
+        # Compare auction intervals against last trading interval
+        intervals_df_last = intervals_grp.max()
+        intervals_df_ex_last = intervals_df[~intervals_df["interval_open"].isin(intervals_df_last["interval_open"])]
+        intervals_df_last.index = intervals_df_last["interval_open"].dt.date
+        auctions_df = auctions_df.join(intervals_df_last)
+        # - if auction surrounded by trading, discard auction
+        f_surround = (auctions_df["auction_open"] >= auctions_df["interval_open"]) & \
+                     (auctions_df["auction_close"] <= auctions_df["interval_close"])
+        if f_surround.any():
+            auctions_df.loc[f_surround, ["auction_open", "auction_close"]] = pd.NaT
+        # - if last trading interval surrounded by auction, then replace by auction
+        f_surround = (auctions_df["interval_open"] >= auctions_df["auction_open"]) & \
+                     (auctions_df["interval_close"] <= auctions_df["auction_close"])
+        if f_surround.any():
+            auctions_df.loc[f_surround, ["interval_open", "interval_close"]] = pd.NaT
+        # - no duplicates, no overlaps
+        f_duplicate = (auctions_df["auction_open"] == auctions_df["interval_open"]) & \
+                      (auctions_df["auction_close"] == auctions_df["interval_close"])
+        if f_duplicate.any():
+            print("")
+            print(auctions_df[f_duplicate])
+            raise Exception("Auction intervals are duplicates of normal trading intervals")
+        f_overlap = (auctions_df["auction_open"] >= auctions_df["interval_open"]) & \
+                    (auctions_df["auction_open"] < auctions_df["interval_close"])
+        if f_overlap.any():
+            # First, if total duration is <= interval length, then combine
+            d = auctions_df["auction_close"] - auctions_df["interval_open"]
+            f = d <= itd
+            if f.any():
+                # Combine
+                auctions_df.loc[f, "auction_open"] = auctions_df.loc[f, "interval_open"]
+                auctions_df.loc[f, ["interval_open", "interval_close"]] = pd.NaT
+                f_overlap = f_overlap & (~f)
+            if f_overlap.any():
+                print("")
+                print(auctions_df[f_overlap])
+                raise Exception("Auction intervals are overlapping normal trading intervals")
+        # - combine
+        auctions_df = auctions_df.reset_index(drop=True)
+        intervals_df_last = auctions_df.loc[~auctions_df["interval_open"].isna(), ["interval_open", "interval_close"]]
+        auctions_df = auctions_df.loc[~auctions_df["auction_open"].isna(), ["auction_open", "auction_close"]]
+        rename_cols = {"auction_open": "interval_open", "auction_close": "interval_close"}
+        auctions_df.columns = [rename_cols[col] if col in rename_cols else col for col in auctions_df.columns]
+        intervals_df = pd.concat([intervals_df_ex_last, intervals_df_last, auctions_df], sort=True).sort_values(by="interval_open").reset_index(drop=True)
+
+    return pd.IntervalIndex.from_arrays(intervals_df["interval_open"], intervals_df["interval_close"], closed="left")
+
+
+# Bump if interval calculation changes, to discard stored tables
+_intervalsVersion = 1
+
+
+def _IntervalsFilepath(exchange, interval, year, ignore_breaks):
+    fn = "intervals-" + yfcd.intervalToString[interval]
+    if ignore_breaks:
+        fn += "-nobreaks"
+    fn += f"-{year}.npz"
+    return os.path.join(yfcm.get_ticker_folder_path("exchange-"+exchange), fn)
+
+
+def _SessionIndexYearSig(si, year):
+    # Intervals only need recalculating if sessions of year change
+    i0, i1 = si.get_day_range(_date_nanos(date(year, 1, 1)), _date_nanos(date(year+1, 1, 1)))
+    crc = zlib.crc32(np.ascontiguousarray(si.array[:, i0:i1]).tobytes())
+    return np.array([_intervalsVersion, crc, i1-i0], dtype=np.int64)
+
+
+def _GetYearIntradayIntervals(exchange, interval, year, ignore_breaks, si):
+    # Intervals of sessions in year as int64 array of rows: session day, open, close.
+    # Stored in cache folder, because calculating is slow.
+    cache_key = (exchange, "year", interval, ignore_breaks, year)
+    sig = _SessionIndexYearSig(si, year)
+    e = schedIntervalsCache.get(cache_key)
+    if e is not None and np.array_equal(e[0], sig):
+        return e[1]
+
+    fp = _IntervalsFilepath(exchange, interval, year, ignore_breaks)
+    lock_name = os.path.basename(fp)[:-len(".npz")]
+    arr = None
+    with yfcm.CacheLock("exchange-"+exchange, lock_name, exclusive=False):
+        if os.path.isfile(fp):
+            try:
+                with np.load(fp) as npz:
+                    if np.array_equal(npz["sig"], sig):
+                        arr = npz["intervals"]
+            except (ValueError, KeyError, OSError):
+                arr = None
+
+    if arr is None:
+        arr = np.empty((3, 0), dtype=np.int64)
+        intervals = _CalcIntradayIntervals(exchange, interval, date(year, 1, 1), date(year+1, 1, 1), ignore_breaks)
+        if intervals is not None:
+            opens = _dt_nanos(intervals.left)
+            closes = _dt_nanos(intervals.right)
+            # Map to session via close, because aligned open can precede session open
+            days = si.days[si.get_prev_indexer(closes - 1)]
+            arr = np.stack([days, opens, closes])
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        with yfcm.CacheLock("exchange-"+exchange, lock_name):
+            with yfcm.OpenAtomic(fp, 'wb') as f:
+                np.savez(f, sig=sig, intervals=arr)
+
+    schedIntervalsCache.put(cache_key, (sig, arr))
+    return arr
+
+
+def _GetIntradayIntervals(exchange, interval, start_d, end_d, ignore_breaks):
+    # Intervals of sessions start_d <= day < end_d, from per-year tables
+    si = GetExchangeSessionIndex(exchange, start_d, end_d-timedelta(days=1))
+    arr = [_GetYearIntradayIntervals(exchange, interval, y, ignore_breaks, si) for y in range(start_d.year, (end_d-timedelta(days=1)).year+1)]
+    arr = arr[0] if len(arr) == 1 else np.concatenate(arr, axis=1)
+    i0 = np.searchsorted(arr[0], _date_nanos(start_d))
+    i1 = np.searchsorted(arr[0], _date_nanos(end_d))
+    if i0 == i1:
+        return None
+    tz = ZoneInfo(GetExchangeTzName(exchange))
+    return pd.IntervalIndex.from_arrays(_nanos_to_dt(arr[1, i0:i1], tz), _nanos_to_dt(arr[2, i0:i1], tz), closed="left")
+
+
 def GetExchangeScheduleIntervals(exchange, interval, start, end, discardTimes=None, week7days=True, weekForceStartMonday=True, ignore_breaks=False, exclude_future=True):
     yfcu.TypeCheckStr(exchange, "exchange")
     if start >= end:
@@ -548,9 +904,9 @@ def GetExchangeScheduleIntervals(exchange, interval, start, end, discardTimes=No
         end_d = end.astimezone(tz).date() + td_1d
 
     # First look in cache:
-    cache_key = (exchange, interval, start_d, end_d, discardTimes, week7days)  # todo: frozenset?
-    if cache_key in schedIntervalsCache:
-        s = schedIntervalsCache[cache_key]
+    cache_key = (exchange, interval, start_d, end_d, discardTimes, week7days, ignore_breaks)  # todo: frozenset?
+    s = schedIntervalsCache.get(cache_key, _cacheMissing)
+    if s is not _cacheMissing:
         if s is not None and len(s) > 0:
             if isinstance(s.left[0], datetime):
                 s = s[s.left >= start_dt]
@@ -572,98 +928,14 @@ def GetExchangeScheduleIntervals(exchange, interval, start, end, discardTimes=No
     if debug:
         yfc_logger.debug(f"- week_starts_sunday = {week_starts_sunday}")
 
-    cal = GetCalendarViaCache(exchange, start_d, end_d)
-
     # When calculating intervals use dates not datetimes. Cache the result, and then
     # apply datetime limits.
     intervals = None
     istr = yfcd.intervalToString[interval]
     if intraday:
-        if itd > timedelta(minutes=30):
-            align = "-30m"
-        else:
-            align = "-" + istr
-        ti = cal.trading_index(start_d.isoformat(), (end_d-td_1d).isoformat(), period=istr, intervals=True, force_close=True, ignore_breaks=ignore_breaks, align=align)
-        if len(ti) == 0:
+        intervals = _GetIntradayIntervals(exchange, interval, start_d, end_d, ignore_breaks)
+        if intervals is None:
             return None
-        # Transfer IntervalIndex to DataFrame so can modify
-        intervals_df = pd.DataFrame(data={"interval_open": ti.left.tz_convert(tz), "interval_close": ti.right.tz_convert(tz)})
-        if "auction" in cal.schedule.columns:
-            sched = GetExchangeSchedule(exchange, start_d, end_d)
-            sched.index = sched.index.date
-
-            # Will map auction time to an interval by flooring relative to market open.
-            # Implemented by flooring then applying offset calculated from floored market open.
-            intervals_grp = intervals_df.groupby(intervals_df["interval_open"].dt.date)
-            # 1 - calculate offset
-            res = 'h' if istr.endswith('h') else istr.replace('m', 'min')
-            market_opens = intervals_grp.min()["interval_open"]
-            if len(market_opens.dt.time.unique()) == 1:
-                open0 = market_opens.iloc[0]
-                offset = open0 - open0.floor(res)
-                auctions_df = sched[["auction"]].copy()
-            else:
-                market_opens.name = "day_open"
-                market_opens.index.name = "day"
-                auctions_df = sched[["auction"]].join(market_opens)
-                offset = auctions_df["day_open"] - auctions_df["day_open"].dt.floor(res)
-            # 2 perform relative flooring:
-            if isinstance(offset, pd.Timedelta) and len(auctions_df["auction"].dt.time.unique()) == 1:
-                auction0 = auctions_df["auction"].iloc[0]
-                auction0_floor = (auction0-offset).floor(res) + offset
-                open_offset = auction0_floor - auction0
-                auctions_df["auction_open"] = auctions_df["auction"] + open_offset
-            else:
-                auctions_df["auction_open"] = (auctions_df["auction"]-offset).dt.floor(res) + offset
-            auctions_df["auction_close"] = auctions_df["auction"] + yfcd.exchangeAuctionDuration[exchange]
-            auctions_df = auctions_df.drop(["day_open", "auction"], axis=1, errors="ignore")
-
-            # Compare auction intervals against last trading interval
-            intervals_df_last = intervals_grp.max()
-            intervals_df_ex_last = intervals_df[~intervals_df["interval_open"].isin(intervals_df_last["interval_open"])]
-            intervals_df_last.index = intervals_df_last["interval_open"].dt.date
-            auctions_df = auctions_df.join(intervals_df_last)
-            # - if auction surrounded by trading, discard auction
-            f_surround = (auctions_df["auction_open"] >= auctions_df["interval_open"]) & \
-                         (auctions_df["auction_close"] <= auctions_df["interval_close"])
-            if f_surround.any():
-                auctions_df.loc[f_surround, ["auction_open", "auction_close"]] = pd.NaT
-            # - if last trading interval surrounded by auction, then replace by auction
-            f_surround = (auctions_df["interval_open"] >= auctions_df["auction_open"]) & \
-                         (auctions_df["interval_close"] <= auctions_df["auction_close"])
-            if f_surround.any():
-                auctions_df.loc[f_surround, ["interval_open", "interval_close"]] = pd.NaT
-            # - no duplicates, no overlaps
-            f_duplicate = (auctions_df["auction_open"] == auctions_df["interval_open"]) & \
-                          (auctions_df["auction_close"] == auctions_df["interval_close"])
-            if f_duplicate.any():
-                print("")
-                print(auctions_df[f_duplicate])
-                raise Exception("Auction intervals are duplicates of normal trading intervals")
-            f_overlap = (auctions_df["auction_open"] >= auctions_df["interval_open"]) & \
-                        (auctions_df["auction_open"] < auctions_df["interval_close"])
-            if f_overlap.any():
-                # First, if total duration is <= interval length, then combine
-                d = auctions_df["auction_close"] - auctions_df["interval_open"]
-                f = d <= itd
-                if f.any():
-                    # Combine
-                    auctions_df.loc[f, "auction_open"] = auctions_df.loc[f, "interval_open"]
-                    auctions_df.loc[f, ["interval_open", "interval_close"]] = pd.NaT
-                    f_overlap = f_overlap & (~f)
-                if f_overlap.any():
-                    print("")
-                    print(auctions_df[f_overlap])
-                    raise Exception("Auction intervals are overlapping normal trading intervals")
-            # - combine
-            auctions_df = auctions_df.reset_index(drop=True)
-            intervals_df_last = auctions_df.loc[~auctions_df["interval_open"].isna(), ["interval_open", "interval_close"]]
-            auctions_df = auctions_df.loc[~auctions_df["auction_open"].isna(), ["auction_open", "auction_close"]]
-            rename_cols = {"auction_open": "interval_open", "auction_close": "interval_close"}
-            auctions_df.columns = [rename_cols[col] if col in rename_cols else col for col in auctions_df.columns]
-            intervals_df = pd.concat([intervals_df_ex_last, intervals_df_last, auctions_df], sort=True).sort_values(by="interval_open").reset_index(drop=True)
-
-        intervals = pd.IntervalIndex.from_arrays(intervals_df["interval_open"], intervals_df["interval_close"], closed="left")
 
     elif interval == yfcd.Interval.Days1:
         s = GetExchangeSchedule(exchange, start_d, end_d)
@@ -707,7 +979,7 @@ def GetExchangeScheduleIntervals(exchange, interval, start, end, discardTimes=No
         raise Exception("Need to implement for interval={}".format(interval))
 
     if cache_key is not None:
-        schedIntervalsCache[cache_key] = intervals
+        schedIntervalsCache.put(cache_key, intervals)
 
     # Only after caching can we prune future intervals
     if exclude_future and intraday:
@@ -731,40 +1003,38 @@ def IsTimestampInActiveSession(exchange, ts):
     yfcu.TypeCheckStr(exchange, "exchange")
     yfcu.TypeCheckDatetime(ts, "ts")
 
-    cal = GetCalendarViaCache(exchange, ts)
-    try:
-        s = cal.schedule.loc[ts.date().isoformat()]
-    except Exception:
-        return False
+    si = GetExchangeSessionIndex(exchange, ts.date()-timedelta(days=1), ts.date())
+    return si.get_session_indexer(pd.Timestamp(ts).value)[0] != -1
+
+
+def IsTimestampInActiveSession_batch(exchange, ts):
+    yfcu.TypeCheckStr(exchange, "exchange")
 
-    o = s["open"] ; c = s["close"]
-    if "auction" in cal.schedule.columns:
-        a = s["auction"]
-        if a != pd.NaT:
-            c = max(c, s["auction"]+yfcd.exchangeAuctionDuration[exchange])
+    ts = pd.DatetimeIndex(ts)
+    n = len(ts)
+    if n == 0:
+        return np.full(n, False)
+
+    days = ts.tz_convert(ZoneInfo(GetExchangeTzName(exchange))).date
+    si = GetExchangeSessionIndex(exchange, days.min()-timedelta(days=1), days.max())
+    return si.get_session_indexer(_dt_nanos(ts)) != -1
 
-    return o <= ts and ts < c
+
+def _SessionToDict(exchange, si, i):
+    tz = ZoneInfo(GetExchangeTzName(exchange))
+    return {"market_open": pd.Timestamp(si.opens[i], tz="UTC").tz_convert(tz),
+            "market_close": pd.Timestamp(si.ends[i], tz="UTC").tz_convert(tz)}
 
 
 def GetTimestampCurrentSession(exchange, ts):
     yfcu.TypeCheckStr(exchange, "exchange")
     yfcu.TypeCheckDatetime(ts, "ts")
 
-    cal = GetCalendarViaCache(exchange, ts)
-    try:
-        s = cal.schedule.loc[ts.date().isoformat()]
-    except Exception:
-        return None
-    o = s["open"] ; c = s["close"]
-    if "auction" in cal.schedule.columns:
-        a = s["auction"]
-        if a != pd.NaT:
-            c = max(c, s["auction"]+yfcd.exchangeAuctionDuration[exchange])
-
-    if o <= ts and ts < c:
-        return {"market_open": o, "market_close": c}
-    else:
+    si = GetExchangeSessionIndex(exchange, ts.date()-timedelta(days=1), ts.date())
+    i = si.get_session_indexer(pd.Timestamp(ts).value)[0]
+    if i == -1:
         return None
+    return _SessionToDict(exchange, si, i)
 
 
 def GetTimestampMostRecentSession(exchange, ts):
@@ -773,43 +1043,24 @@ def GetTimestampMostRecentSession(exchange, ts):
 
     # If 'ts' is currently in an active session then that is most recent
 
-    s = GetTimestampCurrentSession(exchange, ts)
-    if s is not None:
-        return s
-    sched = GetExchangeSchedule(exchange, ts.date()-timedelta(days=6), ts.date()+timedelta(days=1))
-    if "auction" in sched.columns:
-        sched = sched.copy()
-        f = ~(sched["auction"].isna())
-        if f.any():
-            if f.all():
-                sched["close"] = np.maximum(sched["close"], sched["auction"]+yfcd.exchangeAuctionDuration[exchange])
-            else:
-                sched.loc[f, "close"] = np.maximum(sched.loc[f, "close"], sched.loc[f, "auction"]+yfcd.exchangeAuctionDuration[exchange])
-    for i in range(sched.shape[0]-1, -1, -1):
-        if sched["open"].iloc[i] <= ts:
-            tz = ZoneInfo(GetExchangeTzName(exchange))
-            return {"market_open": sched["open"].iloc[i].to_pydatetime().astimezone(tz), "market_close": sched["close"].iloc[i].to_pydatetime().astimezone(tz)}
-    raise Exception("Failed to find most recent '{0}' session for ts = {1}".format(exchange, ts))
+    si = GetExchangeSessionIndex(exchange, ts.date()-timedelta(days=6), ts.date())
+    i = si.get_prev_indexer(pd.Timestamp(ts).value)[0]
+    if i == -1:
+        raise Exception("Failed to find most recent '{0}' session for ts = {1}".format(exchange, ts))
+    s = _SessionToDict(exchange, si, i)
+    return {k: v.to_pydatetime() for k, v in s.items()}
 
 
 def GetTimestampNextSession(exchange, ts):
     yfcu.TypeCheckStr(exchange, "exchange")
     yfcu.TypeCheckDatetime(ts, "ts")
 
-    sched = GetExchangeSchedule(exchange, ts.date(), ts.date()+timedelta(days=15))
-    if "auction" in sched.columns:
-        sched = sched.copy()
-        f = ~(sched["auction"].isna())
-        if f.any():
-            if f.all():
-                sched["close"] = np.maximum(sched["close"], sched["auction"]+yfcd.exchangeAuctionDuration[exchange])
-            else:
-                sched.loc[f, "close"] = np.maximum(sched.loc[f, "close"], sched.loc[f, "auction"]+yfcd.exchangeAuctionDuration[exchange])
-    for i in range(sched.shape[0]):
-        if ts < sched["open"].iloc[i]:
-            tz = ZoneInfo(GetExchangeTzName(exchange))
-            return {"market_open": sched["open"].iloc[i].to_pydatetime().astimezone(tz), "market_close": sched["close"].iloc[i].to_pydatetime().astimezone(tz)}
-    raise Exception(f"Failed to find next '{exchange}' session for ts = {ts}")
+    si = GetExchangeSessionIndex(exchange, ts.date(), ts.date()+timedelta(days=15))
+    i = si.get_next_indexer(pd.Timestamp(ts).value)[0]
+    if i == -1:
+        raise Exception(f"Failed to find next '{exchange}' session for ts = {ts}")
+    s = _SessionToDict(exchange, si, i)
+    return {k: v.to_pydatetime() for k, v in s.items()}
 
 
 def GetTimestampCurrentInterval(exchange, ts, interval, discardTimes=None, week7days=True, ignore_breaks=False):
@@ -900,19 +1151,18 @@ def GetTimestampCurrentInterval(exchange, ts, interval, discardTimes=None, week7
             ts_day = ts
         if debug:
             print("- ts_day: {}".format(ts_day))
-        if ExchangeOpenOnDay(exchange, ts_day):
+        si = GetExchangeSessionIndex(exchange, ts_day)
+        i_s = si.get_day_indexer(_date_nanos(ts_day))[0]
+        if i_s != -1:
             if debug:
                 print("- exchange open")
             if discardTimes:
                 i = {"interval_open": ts_day, "interval_close": ts_day+td_1d}
             else:
-                sched = GetExchangeSchedule(exchange, ts_day, ts_day+td_1d)
-                if sched is not None and not sched.empty:
-                    if "auction" in sched.columns:
-                        sched["close"] = sched["auction"] + yfcd.exchangeAuctionDuration[exchange]
-                    i = {"interval_open": sched["open"].iloc[0], "interval_close": sched["close"].iloc[0]}
-                    if ts < i["interval_open"] or ts >= i["interval_close"]:
-                        i = None
+                s = _SessionToDict(exchange, si, i_s)
+                i = {"interval_open": s["market_open"], "interval_close": s["market_close"]}
+                if ts < i["interval_open"] or ts >= i["interval_close"]:
+                    i = None
         else:
             if debug:
                 print("- exchange closed")
@@ -1211,9 +1461,9 @@ def GetTimestampNextInterval(exchange, ts, interval, discardTimes=None, week7day
             else:
                 align = "-"+istr
             d = next_sesh["market_open"].date()
-            cal = GetCalendarViaCache(exchange, ts)
-            ti = cal.trading_index(d.isoformat(), (d+td_1d).isoformat(), period=istr, intervals=True, force_close=True, align=align)
-            next_interval_start = ti.left[0]
+            si = GetExchangeSessionIndex(exchange, d)
+            lefts, rights = _SessionIndexTradingIntervals(si, d, d+td_1d, itd, False, align)
+            next_interval_start = _nanos_to_dt(lefts[:1], ts.tzinfo)[0]
         else:
             next_interval_start = next_sesh["market_open"]
         next_interval_close = min(next_interval_start + interval_td, next_sesh["market_close"])
@@ -1464,15 +1714,14 @@ def TimestampInBreak_batch(exchange, ts, interval):
 
     itd = yfcd.intervalToTimedelta[interval]
     tss = pd.to_datetime(ts)
-    df = pd.DataFrame(data={"_date": tss.date}, index=tss)
-    cal = GetCalendarViaCache(exchange, df["_date"].iloc[0], df["_date"].iloc[-1])
-    s = cal.schedule.copy()
-    s["_date"] = s.index.date
-    df["_indexBackup"] = df.index
-    df = df.merge(s[["break_start", "break_end", "_date"]], how="left", on="_date")
-    df.index = df["_indexBackup"]
-
-    return (df.index >= df["break_start"].to_numpy()) & (df.index+itd <= df["break_end"].to_numpy())
+    days = tss.tz_localize(None).normalize()
+    si = GetExchangeSessionIndex(exchange, days.min().date(), days.max().date())
+    idx = si.get_day_indexer(_dt_nanos(days))
+    f = idx != -1
+    tss = _dt_nanos(tss)
+    in_break = np.full(n, False)
+    in_break[f] = (tss[f] >= si.break_starts[idx[f]]) & (tss[f]+pd.Timedelta(itd).value <= si.break_ends[idx[f]])
+    return in_break
 
 
 def CalcIntervalLastDataDt(exchange, intervalStart, interval, ignore_breaks=False, yf_lag=None):
@@ -1815,6 +2064,120 @@ def IsPriceDatapointExpired(intervalStart, fetch_dt, repaired, max_age, exchange
     return False
 
 
+def IsPriceDatapointExpired_batch(intervalStart, fetch_dt, repaired, max_age, exchange, interval, ignore_breaks=False, triggerExpiryOnClose=True, yf_lag=None, dt_now=None, expire_outside=None):
+    # Same as IsPriceDatapointExpired() but for arrays, returns bool array.
+    # Schedule lookups done once for all rows.
+    # Rows not in an interval raise TimestampOutsideIntervalException,
+    # unless 'expire_outside' is True for that row, then expired.
+    if isinstance(intervalStart, list):
+        intervalStart = np.array(intervalStart)
+    yfcu.TypeCheckNpArray(intervalStart, "intervalStart")
+    n = len(intervalStart)
+    if n > 0:
+        yfcu.TypeCheckIntervalDt(intervalStart[0], interval, "intervalStart", strict=False)
+    if len(fetch_dt) != n:
+        raise ValueError(f"'fetch_dt' length {len(fetch_dt)} != 'intervalStart' length {n}")
+    repaired = np.broadcast_to(np.asarray(repaired, dtype=bool), (n,))
+    yfcu.TypeCheckTimedelta(max_age, "max_age")
+    yfcu.TypeCheckStr(exchange, "exchange")
+    yfcu.TypeCheckInterval(interval, "interval")
+    yfcu.TypeCheckBool(triggerExpiryOnClose, "triggerExpiryOnClose")
+    if expire_outside is not None:
+        expire_outside = np.broadcast_to(np.asarray(expire_outside, dtype=bool), (n,))
+
+    expired = np.full(n, False)
+    if n == 0:
+        return expired
+
+    tz = ZoneInfo(GetExchangeTzName(exchange))
+    if dt_now is not None:
+        yfcu.TypeCheckDatetime(dt_now, "dt_now")
+    else:
+        dt_now = pd.Timestamp.now("UTC").tz_convert(tz)
+    dt_now = pd.Timestamp(dt_now).tz_convert(tz)
+    if yf_lag is not None:
+        yfcu.TypeCheckTimedelta(yf_lag, "yf_lag")
+    else:
+        yf_lag = GetExchangeDataDelay(exchange)
+    fetch_dt = pd.DatetimeIndex(fetch_dt).tz_convert(tz)
+
+    intervals = GetTimestampCurrentInterval_batch(exchange, intervalStart, interval, ignore_breaks=ignore_breaks)
+    f_out = intervals["interval_open"].isna().to_numpy()
+    if f_out.any():
+        f_bad = f_out if expire_outside is None else f_out & ~expire_outside
+        if f_bad.any():
+            raise yfcd.TimestampOutsideIntervalException(exchange, interval, intervalStart[np.argmax(f_bad)])
+        expired[f_out] = True
+    f_in = ~f_out
+    if not f_in.any():
+        return expired
+    interval_dts = intervalStart[f_in]
+    fetch_dt = fetch_dt[f_in]
+    repaired = repaired[f_in]
+
+    lastDataDt = CalcIntervalLastDataDt_batch(exchange, interval_dts, interval, ignore_breaks=ignore_breaks, yf_lag=yf_lag, bfill=False)
+    lastDataDt = pd.to_datetime(pd.Series(lastDataDt), utc=True)
+    f_na = lastDataDt.isna().to_numpy()
+    if f_na.any():
+        # Rare, e.g. exchange closed. Fallback to slow
+        for i in np.where(f_na)[0]:
+            lastDataDt.iloc[i] = CalcIntervalLastDataDt(exchange, interval_dts[i], interval, ignore_breaks=ignore_breaks, yf_lag=yf_lag)
+    lastDataDt = pd.DatetimeIndex(lastDataDt).tz_convert(tz)
+    if repaired.any():
+        # Give Yahoo 1 week to fix their data, so yfinance doesn't have to repair
+        lastDataDt = lastDataDt.where(~repaired, lastDataDt + timedelta(days=7))
+
+    # Decide if was fetched after last Yahoo update
+    if interval in [yfcd.Interval.Days1, yfcd.Interval.Week]:
+        f_closed = fetch_dt >= lastDataDt
+    else:
+        f_closed = fetch_dt > lastDataDt
+
+    expire_dt = fetch_dt + max_age
+    f_aged = expire_dt <= dt_now
+    f_expired = np.full(len(fetch_dt), False)
+    if (f_aged & ~f_closed).any():
+        if IsTimestampInActiveSession(exchange, dt_now - yf_lag):
+            f_expired |= f_aged
+        else:
+            f_expired |= f_aged & IsTimestampInActiveSession_batch(exchange, expire_dt - yf_lag)
+            # Or trading occurred since expiry
+            f = f_aged & ~f_expired & (expire_dt < dt_now)
+            if f.any():
+                sched = GetExchangeSchedule(exchange, expire_dt[f].min().date(), dt_now.date()+timedelta(days=1))
+                if sched is not None:
+                    opens = pd.DatetimeIndex(sched["open"])
+                    if "auction" in sched.columns:
+                        closes = pd.DatetimeIndex(sched["auction"] + yfcd.exchangeAuctionDuration[exchange])
+                    else:
+                        closes = pd.DatetimeIndex(sched["close"])
+                    f_done = np.asarray((closes <= dt_now) & (opens <= pd.Timestamp.now("UTC")))
+                    # For each session, did it or any later session finish
+                    f_done_since = np.logical_or.accumulate(f_done[::-1])[::-1]
+                    idx = opens.searchsorted(expire_dt[f], side="left")
+                    f_traded = np.full(len(idx), False)
+                    f_valid = idx < len(opens)
+                    f_traded[f_valid] = f_done_since[idx[f_valid]]
+                    f_expired[np.where(f)[0][f_traded]] = True
+
+    if triggerExpiryOnClose:
+        # Even though fetched data hasn't fully aged, the candle has since closed so treat as expired
+        f_expired |= (fetch_dt < lastDataDt) & (lastDataDt <= dt_now)
+        if interval in [yfcd.Interval.Days1, yfcd.Interval.Week]:
+            # If last fetch was anytime within interval, even post-market,
+            # and dt_now is next day (or later) then trigger
+            interval_ends = intervals["interval_close"][f_in]
+            if isinstance(interval_ends.iloc[0], datetime):
+                interval_ends = np.array([dt.date() for dt in interval_ends])
+            interval_ends = interval_ends.to_numpy().astype('datetime64[D]') if isinstance(interval_ends, pd.Series) else interval_ends.astype('datetime64[D]')
+            fetch_days = fetch_dt.tz_localize(None).to_numpy().astype('datetime64[D]')
+            d_now = np.datetime64(dt_now.date())
+            f_expired |= (fetch_days <= interval_ends) & (d_now > interval_ends)
+
+    expired[f_in] = f_expired & ~f_closed
+    return expired
+
+
 def IdentifyMissingIntervals(exchange, start, end, interval, knownIntervalStarts, week7days=True, ignore_breaks=False):
     yfcu.TypeCheckStr(exchange, "exchange")
     yfcu.TypeCheckDateEasy(start, "start")
@@ -1822,8 +2185,8 @@ def IdentifyMissingIntervals(exchange, start, end, interval, knownIntervalStarts
     if start >= end:
         raise Exception("start={} must be < end={}".format(start, end))
     if knownIntervalStarts is not None:
-        if not isinstance(knownIntervalStarts, list) and not isinstance(knownIntervalStarts, np.ndarray):
-            raise Exception("'knownIntervalStarts' must be list or numpy array not {0}".format(type(knownIntervalStarts)))
+        if not isinstance(knownIntervalStarts, (list, np.ndarray, pd.DatetimeIndex)):
+            raise Exception("'knownIntervalStarts' must be list, numpy array or DatetimeIndex not {0}".format(type(knownIntervalStarts)))
         if len(knownIntervalStarts) > 0:
             if interval in [yfcd.Interval.Days1, yfcd.Interval.Week]:
                 # Must be date
@@ -1850,17 +2213,7 @@ def IdentifyMissingIntervals(exchange, start, end, interval, knownIntervalStarts
         print("- intervals:")
         pprint(intervals)
 
-    if knownIntervalStarts is not None:
-        intervalStarts = intervals.left
-        if isinstance(intervalStarts[0], (datetime, pd.Timestamp)):
-            intervalStarts = [i.timestamp() for i in intervalStarts.to_pydatetime()]
-            knownIntervalStarts = [x.timestamp() for x in knownIntervalStarts]
-        if debug:
-            print("- intervalStarts:")
-            print(intervalStarts)
-        f_missing = yfcu.np_isin_optimised(intervalStarts, knownIntervalStarts, invert=True)
-    else:
-        f_missing = np.full(intervals.shape[0], True)
+    f_missing = _IntervalsMissingMask(intervals, knownIntervalStarts)
 
     intervals_missing_df = pd.DataFrame(data={"open": intervals[f_missing].left, "close": intervals[f_missing].right}, index=np.where(f_missing)[0])
     if debug:
@@ -1872,6 +2225,29 @@ def IdentifyMissingIntervals(exchange, start, end, interval, knownIntervalStarts
     return intervals_missing_df
 
 
+def _IntervalsMissingMask(intervals, knownIntervalStarts):
+    # True where interval start not in knownIntervalStarts
+    if knownIntervalStarts is None:
+        return np.full(len(intervals), True)
+    if len(knownIntervalStarts) == 0:
+        return np.full(len(intervals), True)
+    if isinstance(intervals, pd.IntervalIndex) and isinstance(intervals.left, pd.DatetimeIndex):
+        starts = _dt_nanos(intervals.left)
+        if isinstance(knownIntervalStarts, pd.DatetimeIndex):
+            known = _dt_nanos(knownIntervalStarts)
+        else:
+            # Faster than pd.to_datetime() on list of datetimes.
+            # Microsecond precision is exact for float timestamps.
+            known = np.array([x.timestamp() for x in knownIntervalStarts])
+            known = np.round(known * 1e6).astype(np.int64)
+            starts = starts // 1000
+    else:
+        starts = np.array(intervals.left, dtype='datetime64[D]')
+        known = [x.date() if isinstance(x, datetime) else x for x in knownIntervalStarts]
+        known = np.array(known, dtype='datetime64[D]')
+    return np.isin(starts, known, invert=True)
+
+
 def IdentifyMissingIntervalRanges(exchange, start, end, interval, knownIntervalStarts, ignore_breaks=False, minDistanceThreshold=5):
     yfcu.TypeCheckStr(exchange, "exchange")
     yfcu.TypeCheckIntervalDt(start, interval, "start", strict=True)
@@ -1879,8 +2255,8 @@ def IdentifyMissingIntervalRanges(exchange, start, end, interval, knownIntervalS
     if start >= end:
         raise Exception("start={} must be < end={}".format(start, end))
     if knownIntervalStarts is not None:
-        if not isinstance(knownIntervalStarts, list) and not isinstance(knownIntervalStarts, np.ndarray):
-            raise Exception("'knownIntervalStarts' must be list or numpy array not {0}".format(type(knownIntervalStarts)))
+        if not isinstance(knownIntervalStarts, (list, np.ndarray, pd.DatetimeIndex)):
+            raise Exception("'knownIntervalStarts' must be list, numpy array or DatetimeIndex not {0}".format(type(knownIntervalStarts)))
         if len(knownIntervalStarts) > 0:
             if interval in [yfcd.Interval.Days1, yfcd.Interval.Week]:
                 # Must be date or datetime
@@ -1911,48 +2287,20 @@ def IdentifyMissingIntervalRanges(exchange, start, end, interval, knownIntervalS
         for i in intervals:
             print(i)
 
-    intervals_missing_df = IdentifyMissingIntervals(exchange, start, end, interval, knownIntervalStarts)
-    if debug:
-        print("- intervals_missing_df:")
-        pprint(intervals_missing_df)
-
-    f_missing = np.full(intervals.shape[0], False) ; f_missing[intervals_missing_df.index] = True
+    f_missing = _IntervalsMissingMask(intervals, knownIntervalStarts)
 
     # Merge together near ranges if the distance between is below threshold.
-    # This is to reduce web requests
-    i_true = np.where(f_missing)[0]
-    for i in range(len(i_true)-1):
-        i0 = i_true[i]
-        i1 = i_true[i+1]
-        if i1-i0 <= minDistanceThreshold+1:
-            # Mark all intervals between as missing, thus merging together
-            # the pair of missing ranges
-            f_missing[i0+1:i1] = True
-    if debug:
-        print("- f_missing:")
-        pprint(f_missing)
-
-    # Scan for contiguous sets of missing intervals:
-    ranges = []
-    i_true = np.where(f_missing)[0]
-    if len(i_true) > 0:
-        start = None ; end = None
-        for i in range(len(f_missing)):
-            v = f_missing[i]
-            if v:
-                if start is None:
-                    start = i ; end = i
-                else:
-                    if i == (end+1):
-                        end = i
-                    else:
-                        r = (intervals[start].left, intervals[end].right)
-                        ranges.append(r)
-                        start = i ; end = i
-
-            if i == (len(f_missing) - 1):
-                r = (intervals[start].left, intervals[end].right)
-                ranges.append(r)
+    # This is to reduce web requests.
+    # Then each run of missing intervals is a range.
+    i_true = np.flatnonzero(f_missing)
+    if len(i_true) == 0:
+        ranges = []
+    else:
+        gaps = np.diff(i_true)
+        f_split = (gaps > 1) & (gaps > minDistanceThreshold+1)
+        i_start = i_true[np.concatenate(([True], f_split))]
+        i_end = i_true[np.concatenate((f_split, [True]))]
+        ranges = list(zip(intervals.left[i_start], intervals.right[i_end]))
 
     if debug:
         print("- ranges:")
@@ -7,6 +7,7 @@ import datetime
 import shutil
 
 from . import yfc_cache_manager as yfcm
+from . import yfc_history_store as yfhs
 from . import yfc_dat as yfcd
 from . import yfc_utils as yfcu
 from . import yfc_time as yfct
@@ -14,6 +15,9 @@ from . import yfc_time as yfct
 
 def _tidy_upgrade_history():
     actions = ["have-recommended-verify"]
+    # Not upgrades, but state that lives here
+    actions += ["rate_limits.json", ".rate_limits.lock"]
+    actions += ["verify_journal.jsonl", "verify_report.json", ".verify_report.lock"]
 
     d = yfcm.GetCacheDirpath()
     yfc_dp = os.path.join(d, "_YFC_")
@@ -203,6 +207,31 @@ def _recommend_verify():
     logger.warning(_RECOMMEND_VERIFY)
 
 
+def migrate_history_storage(fmt=None, quiet=False):
+    # Convert all cached price tables to format 'fmt',
+    # default = yfc.options.storage.history_format.
+    # Tables are also converted one-by-one when next read,
+    # this just does it all now.
+    if fmt is None:
+        fmt = yfhs.GetHistoryFormat()
+    if fmt not in yfhs.history_formats:
+        raise ValueError(f"'fmt' must be one of {yfhs.history_formats}, not '{fmt}'")
+
+    dp = yfcm.GetCacheDirpath()
+    if not os.path.isdir(dp):
+        return 0
+    tkrs = [x for x in os.listdir(dp) if not x.startswith("exchange-") and os.path.isdir(os.path.join(dp, x)) and x != '_YFC_']
+    keys = ["history-"+yfcd.intervalToString[i] for i in yfcd.Interval]
+    n = 0
+    for tkr in sorted(tkrs):
+        for k in keys:
+            if yfhs.MigrateHistory(tkr, k, fmt):
+                n += 1
+    if not quiet:
+        print(f"Migrated {n} price tables to {fmt}")
+    return n
+
+
 def _migrate_dfs_to_pandas3():
     d = yfcm.GetCacheDirpath()
     yfc_dp = os.path.join(d, "_YFC_")
@@ -277,6 +306,8 @@ def _migrate_dfs_to_pandas3():
                     continue
                 elif f in ['annuals.pkl', 'quarterlys.pkl']:
                     continue
+                elif f.endswith('.meta.pkl'):
+                    continue
 
                 if debug:
                     print("- checking:", f)
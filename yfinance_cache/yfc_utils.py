@@ -6,6 +6,8 @@ from pprint import pprint
 import numpy as np
 import math
 import pandas as pd
+import threading
+from contextlib import contextmanager
 
 from . import yfc_dat as yfcd
 
@@ -280,74 +282,64 @@ def ChunkDatesIntoYfFetches(schedule, maxDays, overlapDays):
         print("- maxDays =", maxDays)
         print("- overlap =", overlapDays)
 
-    s = schedule.copy()
-    n = s.shape[0]
-    step = np.full(n, pd.Timedelta(days=1))
-    step[1:] = (s.index.date[1:] - s.index.date[:-1])
-    s["step"] = step ; s["step"] = s["step"].dt.days
+    # Group size = sum of day steps, so use cumulative sum to find where
+    # each group exceeds maxDays. Next group starts 2 sessions back.
+    idx = schedule.index
+    days = idx.values.astype('datetime64[D]').astype(np.int64)
+    n = len(days)
+    steps = np.ones(n, dtype=np.int64)
+    steps[1:] = np.diff(days)
+    csum = np.cumsum(steps)
 
-    # groupStarts = [s.index[0]]
     groupStarts = [0]
     groupEnds = []
-    grpSize = s["step"].iloc[0]
-    # TODO: probably need to compile this loop
-    i = 1
-    ctr = 0
-    while i < s.shape[0]:
-        ctr += 1
-        if ctr > 1000:
-            raise Exception("infinite loop detected")
-
-        size = s["step"].iloc[i]
-        if grpSize + size <= maxDays:
-            # Add to group
-            grpSize += size
-        else:
-            # Close current group
-            # groupEnds.append(s.index[i])
-            groupEnds.append(i)
-            # Start new group, 2 indices back
-            i -= 2
-            # nextStart = s.index[i]
-            # groupStarts.append(nextStart)
-            groupStarts.append(i)
-            grpSize = s["step"].iloc[i]
-        i += 1
+    g = 0
+    while True:
+        base = csum[g] - steps[g]
+        e = max(int(np.searchsorted(csum, base + maxDays, side="right")), g+1)
+        if e >= n:
+            break
+        groupEnds.append(e)
+        if e-2 <= g:
+            raise Exception(f"maxDays={maxDays} too small to chunk schedule")
+        g = e-2
+        groupStarts.append(g)
 
     tz = schedule["close"].iloc[0].tz
 
-    # groupEnds.append(schedule.index[-1] + pd.Timedelta(days=1))
-    # groups = [[groupStarts[i], groupEnds[i]] for i in range(len(groupStarts))]
-    # groups = [[groupStarts[i].tz_localize(tz), groupEnds[i].tz_localize(tz)] for i in range(len(groupStarts))]
-    # return groups
-
     if debug:
-        # print("- groups:")
-        # pprint([ (groupStarts[i], groupEnds[i]) for i in range(len(groupStarts))])
         print("- groupStarts")
         pprint(groupStarts)
         print("- groupEnds")
         pprint(groupEnds)
 
+    # Only localize needed dates, slow with ZoneInfo
+    groupStarts = np.array(groupStarts)
+    groupEnds = np.array(groupEnds, dtype=int)
+    ng = len(groupStarts)
+    dts = idx[np.concatenate([groupStarts, groupStarts+1, groupEnds-1, groupEnds, [n-1]])].tz_localize(tz)
+    fetch_starts = dts[:ng]
+    core_starts = dts[ng:2*ng]
+    core_ends = dts[2*ng:3*ng-1]
+    fetch_ends = dts[3*ng-1:4*ng-2]
     groups = []
     td_1d = pd.Timedelta(days=1)
-    for i in range(len(groupStarts)):
+    for i in range(ng):
         g = {}
-        g["fetch start"] = s.index[groupStarts[i]].tz_localize(tz)
-        g["core start"] = s.index[groupStarts[i]+1].tz_localize(tz)
-        if i == len(groupStarts)-1:
-            g["core end"] = s.index[-1].tz_localize(tz)
+        g["fetch start"] = fetch_starts[i]
+        g["core start"] = core_starts[i]
+        if i == ng-1:
+            g["core end"] = dts[-1]
             g["core end"] = max(g["core end"], g["core start"]+td_1d)
             g["fetch end"] = g["core end"] + td_1d
         else:
-            g["core end"] = s.index[groupEnds[i]-1].tz_localize(tz)
-            g["fetch end"] = s.index[groupEnds[i]].tz_localize(tz)
+            g["core end"] = core_ends[i]
+            g["fetch end"] = fetch_ends[i]
         groups.append(g)
 
     return groups
 
 
-
 def resample_1d_prices(df, target_interval):
     offset = None
     if target_interval == '1wk':
@@ -386,215 +378,284 @@ def resample_1d_prices(df, target_interval):
 
 
 
+def _ComparePricesArrays(h, df_yf, pos, pos_yf, interval, rtol, vol_rtol):
+    # Compare cache & Yahoo tables in one pass over NumPy arrays,
+    # rows aligned by positions 'pos' & 'pos_yf'.
+    # Returns dict of difference masks, formatting left to caller.
+    price_cols = ["Open", "Close", "High", "Low"]
+    interday = interval in [yfcd.Interval.Days1, yfcd.Interval.Week]
+    n = len(pos)
+
+    def _h(c):
+        return h[c].to_numpy()[pos]
+
+    def _yf(c):
+        return df_yf[c].to_numpy()[pos_yf]
+
+    def _stack(df, cols, p):
+        # Faster than df[cols].to_numpy()
+        return np.column_stack([df[c].to_numpy(dtype=float)[p] for c in cols])
+
+    # Use looser tolerance if different 'Repaired?' states
+    h_rep = _h("Repaired?")
+    yf_rep = _yf("Repaired?")
+    f_rep_xor = np.logical_xor(h_rep, yf_rep)
+    f_rep_or = np.logical_or(h_rep, yf_rep)
+
+    def _diff(x, y, tol, f_loose, loose_tol):
+        f = ~np.isclose(x, y, rtol=tol)
+        if f_loose.any():
+            f[f_loose] = ~np.isclose(x[f_loose], y[f_loose], rtol=loose_tol)
+        return f
+
+    masks = {}
+
+    x = _stack(h, price_cols, pos)
+    y = _stack(df_yf, price_cols, pos_yf)
+    f = _diff(x, y, rtol, f_rep_xor, 0.1)
+    for j in range(len(price_cols)):
+        masks[price_cols[j]] = f[:, j]
+
+    # Ignore differences where YF volume = 0, because what has happened
+    # is cached data contains repair but now too old for YF to repair
+    hv = _h("Volume")
+    yv = _yf("Volume")
+    f = _diff(hv, yv, vol_rtol, f_rep_or, 1.0)
+    f_yf_zero_vol = yv == 0
+    f[f_yf_zero_vol] = False
+    masks["Volume"] = f
+    masks["YF zero volume"] = f_yf_zero_vol
+
+    if interday:
+        # Yahoo div-adjusts interday data, so check my div adjustment
+        x_adj = x * _h("CDF")[:, None]
+        if interval == yfcd.Interval.Week:
+            y_adj = _stack(df_yf, ["Adj "+c for c in price_cols], pos_yf)
+        else:
+            y_adj_close = _yf("Adj Close")
+            adj_f = y_adj_close / y[:, price_cols.index("Close")]
+            y_adj = y * adj_f[:, None]
+            y_adj[:, price_cols.index("Close")] = y_adj_close
+        f = _diff(x_adj, y_adj, rtol, f_rep_xor, 0.1)
+        for j in range(len(price_cols)):
+            masks["Adj "+price_cols[j]] = f[:, j]
+
+    # Events: (missing from cache, missing from Yahoo, value differs)
+    f_fetch_na = h["FetchDate"].isna().to_numpy()[pos]
+    for c in ["Dividends", "Stock Splits", "Capital Gains"]:
+        if c not in df_yf.columns:
+            continue
+        yc = _yf(c)
+        f_yf = yc != 0.0
+        if c not in h.columns:
+            masks[c] = (f_yf, np.full(n, False), np.full(n, False))
+            continue
+        hc = _h(c)
+        f_h = (hc != 0.0) & ~np.isnan(hc) & ~f_fetch_na
+        f_both = f_h & f_yf
+        f_value = np.full(n, False)
+        f_value[f_both] = ~np.isclose(hc[f_both], yc[f_both], rtol=rtol)
+        masks[c] = (f_yf & ~f_h, f_h & ~f_yf, f_value)
+
+    return masks
+
+
+def _AdjPricesDfs(h, df_yf, interval):
+    # Div-adjusted tables, only needed for printing diffs
+    h_adj = h.copy()
+    for c in ["Open", "Close", "Low", "High"]:
+        h_adj["Adj " + c] = h_adj[c].to_numpy() * h_adj["CDF"].to_numpy()
+        h_adj = h_adj.drop(c, axis=1)
+    df_yf_adj = df_yf.copy()
+    if interval == yfcd.Interval.Week:
+        for c in ['Open', 'High', 'Low', 'Close']:
+            df_yf_adj = df_yf_adj.drop(c, axis=1)
+    else:
+        adj_f = df_yf["Adj Close"].to_numpy() / df_yf["Close"].to_numpy()
+        df_yf_adj = df_yf_adj.drop("Close", axis=1)
+        for c in ["Open", "Low", "High"]:
+            df_yf_adj["Adj " + c] = df_yf_adj[c].to_numpy() * adj_f
+            df_yf_adj = df_yf_adj.drop(c, axis=1)
+    return h_adj, df_yf_adj
+
+
 def VerifyPricesDf(h, df_yf, interval, rtol=0.0001, vol_rtol=0.005, exit_first_error=False, quiet=False, debug=False):
     if df_yf.empty:
         raise Exception("VerifyPricesDf() has been given empty df_yf")
 
-    f_diff_all = pd.Series(np.full(h.shape[0], False), h.index)
+    f_diff_all = np.full(h.shape[0], False)
     errors_str = ''
 
+    def _result():
+        return pd.Series(f_diff_all, h.index, name=errors_str)
+
     interday = interval in [yfcd.Interval.Days1, yfcd.Interval.Week]#, yfcd.Interval.Months1, yfcd.Interval.Months3]
     istr = yfcd.intervalToString[interval]
 
 
     # Test: no NaNs in dividends & stock splits
-    f_na = h["Dividends"].isna()
+    f_na = h["Dividends"].isna().to_numpy()
     if f_na.any():
         if not quiet:
             print(f"WARNING: {np.sum(f_na)}/{h.shape[0]} NaNs detected in dividends")
-        f_diff_all = f_diff_all | f_na
+        f_diff_all |= f_na
         errors_str = 'Dividends'
-    f_na = h["Stock Splits"].isna()
+    f_na = h["Stock Splits"].isna().to_numpy()
     if f_na.any():
         if not quiet:
             print(f"WARNING: {np.sum(f_na)}/{h.shape[0]} NaNs detected in stock splits")
-        f_diff_all = f_diff_all | f_na
+        f_diff_all |= f_na
         errors_str += ';Splits'
 
-    # Drop NaNs from YF data:
-    df_yf = df_yf[~df_yf[yfcd.yf_price_data_cols].isna().any(axis=1)]
-
-    # Drop mismatching indices for value check
-    h = h[h.index.isin(df_yf.index)].copy()
-    h = h[h['Final?'].to_numpy()]
-    df_yf = df_yf[df_yf.index.isin(h.index)]
-    n = h.shape[0]
-
-    # Apply dividend-adjustment
-    h_adj = h.copy()
-    for c in ["Open", "Close", "Low", "High"]:
-        h_adj["Adj " + c] = h_adj[c].to_numpy() * h_adj["CDF"].to_numpy()
-        h_adj = h_adj.drop(c, axis=1)
-    df_yf_adj = df_yf.copy()
-    if interval == yfcd.Interval.Week:
-        for c in ['Open', 'High', 'Low', 'Close']:
-            df_yf_adj = df_yf_adj.drop(c, axis=1)
-    else:
-        adj_f = df_yf["Adj Close"].to_numpy() / df_yf["Close"].to_numpy()
-        df_yf_adj = df_yf_adj.drop("Close", axis=1)
-        for c in ["Open", "Low", "High"]:
-            df_yf_adj["Adj " + c] = df_yf_adj[c].to_numpy() * adj_f
-            df_yf_adj = df_yf_adj.drop(c, axis=1)
+    # Align rows for value check, without copying tables:
+    # - drop NaNs from YF data
+    # - drop mismatching indices
+    # 'pos' & 'pos_yf' are aligned row positions in h & df_yf.
+    if not df_yf.index.is_unique:
+        raise Exception("VerifyPricesDf() has been given df_yf with duplicate index")
+    f_yf_ok = np.full(df_yf.shape[0], True)
+    for c in yfcd.yf_price_data_cols:
+        f_yf_ok &= ~np.isnan(df_yf[c].to_numpy(dtype=float))
+    ix = df_yf.index.get_indexer(h.index)
+    f = ix != -1
+    f[f] = f_yf_ok[ix[f]]
+    f &= h['Final?'].to_numpy().astype(bool)
+    pos = np.flatnonzero(f)
+    pos_yf = ix[pos]
+    n = len(pos)
+
+    masks = _ComparePricesArrays(h, df_yf, pos, pos_yf, interval, rtol, vol_rtol)
+
+    idx = h.index[pos]
+    idx_yf = df_yf.index[pos_yf]
+    aligned = {}
+
+    def _aligned():
+        # Aligned tables only needed to print diffs
+        if len(aligned) == 0:
+            aligned['h'] = h.iloc[pos]
+            aligned['df_yf'] = df_yf.iloc[pos_yf]
+        return aligned['h'], aligned['df_yf']
 
     # Verify dividends
     # - first compare dates
     c = "Dividends"
-    h_divs = h.loc[h[c] != 0.0, [c, "FetchDate"]].copy().dropna()
-    yf_divs = df_yf.loc[df_yf[c] != 0.0, c]
-    dts_missing_from_cache = yf_divs.index[~yf_divs.index.isin(h_divs.index)]
-    dts_missing_from_yf = h_divs.index[~h_divs.index.isin(yf_divs.index)]
+    f_missing_from_cache, f_missing_from_yf, f_diff = masks[c]
     divs_bad = False
-    if len(dts_missing_from_cache) > 0:
+    if f_missing_from_cache.any():
         if not quiet:
-            print(f"WARNING: Dividends missing from cached {istr}: {dts_missing_from_cache.date.astype(str)}")
-        for dt in dts_missing_from_cache:
-            f_diff_all.loc[dt] = True
+            print(f"WARNING: Dividends missing from cached {istr}: {idx_yf[f_missing_from_cache].date.astype(str)}")
+        f_diff_all[pos[f_missing_from_cache]] = True
         if 'Dividends' not in errors_str:
             errors_str += ';Dividends'
         if exit_first_error:
-            f_diff_all = f_diff_all.rename(errors_str)
-            return f_diff_all
-    if len(dts_missing_from_yf) > 0:
+            return _result()
+    if f_missing_from_yf.any():
         if not quiet:
-            print(f"WARNING: Cached {istr} contains dividends missing from Yahoo: {dts_missing_from_yf.date.astype(str)}")
-        for dt in dts_missing_from_yf:
-            f_diff_all.loc[dt] = True
+            print(f"WARNING: Cached {istr} contains dividends missing from Yahoo: {idx[f_missing_from_yf].date.astype(str)}")
+        f_diff_all[pos[f_missing_from_yf]] = True
         if 'Dividends' not in errors_str:
             errors_str += ';Dividends'
         if exit_first_error:
-            f_diff_all = f_diff_all.rename(errors_str)
-            return f_diff_all
+            return _result()
     # - now compare values
-    h_divs = h_divs[h_divs.index.isin(yf_divs.index)]
-    yf_divs = yf_divs[yf_divs.index.isin(h_divs.index)]
-    if not yf_divs.empty:
-        f_close = np.isclose(h_divs[c].to_numpy(), yf_divs.to_numpy(), rtol=rtol)
-        f_close = pd.Series(f_close, h_divs.index)
-        f_diff = ~f_close
-        if f_diff.any():
-            n_diff = np.sum(f_diff)
-            if not quiet:
-                print(f"WARNING: {istr}: {n_diff}/{n} differences in column {c}")
-            if not quiet:
-                df_diffs = h_divs[f_diff].join(yf_divs[f_diff], lsuffix="_cache", rsuffix="_yf")
-                df_diffs.index = df_diffs.index.tz_convert(h_divs.index.tz)
-                df_diffs = df_diffs.join(h['Close'].rename('Close_yfc'))
-                df_diffs = df_diffs.join(df_yf['Close'].rename('Close_yf'))
-                if interday:
-                    df_diffs.index = df_diffs.index.tz_convert(df_yf.index.tz).date
-                df_diffs["error"] = df_diffs[c+"_cache"] - df_diffs[c+"_yf"]
-                df_diffs["error %"] = (df_diffs["error"]*100 / df_diffs[c+"_yf"]).round(1).astype(str) + '%'
-                print(df_diffs)
-            f_diff_all = f_diff_all | f_diff
-            if 'Dividends' not in errors_str:
-                errors_str += ';Dividends'
-            if exit_first_error:
-                f_diff_all = f_diff_all.rename(errors_str)
-                return f_diff_all
+    if f_diff.any():
+        n_diff = np.sum(f_diff)
+        if not quiet:
+            print(f"WARNING: {istr}: {n_diff}/{n} differences in column {c}")
+            h_al, df_yf_al = _aligned()
+            df_diffs = h_al.loc[f_diff, [c, "FetchDate"]].join(df_yf_al.loc[f_diff, c], lsuffix="_cache", rsuffix="_yf")
+            df_diffs = df_diffs.join(h_al['Close'].rename('Close_yfc'))
+            df_diffs = df_diffs.join(df_yf_al['Close'].rename('Close_yf'))
+            if interday:
+                df_diffs.index = df_diffs.index.tz_convert(df_yf.index.tz).date
+            df_diffs["error"] = df_diffs[c+"_cache"] - df_diffs[c+"_yf"]
+            df_diffs["error %"] = (df_diffs["error"]*100 / df_diffs[c+"_yf"]).round(1).astype(str) + '%'
+            print(df_diffs)
+        f_diff_all[pos[f_diff]] = True
+        if 'Dividends' not in errors_str:
+            errors_str += ';Dividends'
+        if exit_first_error:
+            return _result()
 
     # Verify stock splits
     # - first compare dates
     c = "Stock Splits"
-    h_ss = h.loc[h[c] != 0.0, [c, "FetchDate"]].copy().dropna()
-    yf_ss = df_yf.loc[df_yf[c] != 0.0, c]
-    dts_missing_from_cache = yf_ss.index[~yf_ss.index.isin(h_ss.index)]
-    dts_missing_from_yf = h_ss.index[~h_ss.index.isin(yf_ss.index)]
+    f_missing_from_cache, f_missing_from_yf, f_diff = masks[c]
     splits_bad = False
-    if len(dts_missing_from_cache) > 0:
+    if f_missing_from_cache.any():
         if not quiet:
-            print(f"WARNING: Splits missing from cached {istr}: {dts_missing_from_cache.date.astype(str)}")
-        for dt in dts_missing_from_cache:
-            f_diff_all.loc[dt] = True
-    if len(dts_missing_from_yf) > 0:
+            print(f"WARNING: Splits missing from cached {istr}: {idx_yf[f_missing_from_cache].date.astype(str)}")
+        f_diff_all[pos[f_missing_from_cache]] = True
+    if f_missing_from_yf.any():
         if not quiet:
-            print(f"WARNING: Cached {istr} contains splits missing from Yahoo: {dts_missing_from_yf.date.astype(str)}")
-        for dt in dts_missing_from_yf:
-            f_diff_all.loc[dt] = True
+            print(f"WARNING: Cached {istr} contains splits missing from Yahoo: {idx[f_missing_from_yf].date.astype(str)}")
+        f_diff_all[pos[f_missing_from_yf]] = True
         if 'Stock Splits' not in errors_str:
             errors_str += ';Stock Splits'
         if exit_first_error:
-            f_diff_all = f_diff_all.rename(errors_str)
-            return f_diff_all
+            return _result()
     # - now compare values
-    h_ss = h_ss[h_ss.index.isin(yf_ss.index)]
-    yf_ss = yf_ss[yf_ss.index.isin(h_ss.index)]
-    if not yf_ss.empty:
-        f_close = pd.Series(np.isclose(h_ss[c].to_numpy(), yf_ss.to_numpy(), rtol=rtol), yf_ss.index)
-        f_diff = ~f_close
-        if f_diff.any():
-            n_diff = np.sum(f_diff)
-            if not quiet:
-                print(f"WARNING: {istr}: {n_diff}/{n} differences in column {c}")
-            df_diffs = h_ss.join(yf_ss[f_diff], lsuffix="_cache", rsuffix="_yf")
-            df_diffs.index = df_diffs.index.tz_convert(h_ss.index.tz)
+    if f_diff.any():
+        n_diff = np.sum(f_diff)
+        if not quiet:
+            print(f"WARNING: {istr}: {n_diff}/{n} differences in column {c}")
+            h_al, df_yf_al = _aligned()
+            df_diffs = h_al.loc[f_diff, [c, "FetchDate"]].join(df_yf_al.loc[f_diff, c], lsuffix="_cache", rsuffix="_yf")
             if interday:
                 df_diffs.index = df_diffs.index.tz_convert(df_yf.index.tz).date
             df_diffs["error"] = df_diffs[c+"_cache"] - df_diffs[c+"_yf"]
             df_diffs["error %"] = (df_diffs["error"]*100 / df_diffs[c+"_yf"]).round(2).astype(str) + '%'
-            if not quiet:
-                print(df_diffs)
-            f_diff_all = f_diff_all | f_diff
-            if 'Splits' not in errors_str:
-                errors_str += ';Splits'
-            splits_bad = True
+            print(df_diffs)
+        f_diff_all[pos[f_diff]] = True
+        if 'Splits' not in errors_str:
+            errors_str += ';Splits'
+        splits_bad = True
 
     # Verify capital gains
     # - first compare dates
     c = "Capital Gains"
-    if c in df_yf.columns:
-        yf_cg = df_yf.loc[df_yf[c] != 0.0, c]
-        if not yf_cg.empty:
-            if c not in h.columns:
-                for dt in yf_cg.index:
-                    f_diff_all.loc[dt] = True
+    if c in masks:
+        f_missing_from_cache, f_missing_from_yf, f_diff = masks[c]
+        if c not in h.columns:
+            if f_missing_from_cache.any():
+                f_diff_all[pos[f_missing_from_cache]] = True
                 if not quiet:
                     print(f"ERROR: Cached {istr} missing column 'Capital Gains")
                 if 'Capital Gains' not in errors_str:
                     errors_str += ';Capital Gains'
                 if exit_first_error:
-                    f_diff_all = f_diff_all.rename(errors_str)
-                    return f_diff_all
-            else:
-                h_cg = h.loc[h[c] != 0.0, [c, "FetchDate"]].copy().dropna()
-                dts_missing_from_cache = yf_cg.index[~yf_cg.index.isin(h_cg.index)]
-                dts_missing_from_yf = h_cg.index[~h_cg.index.isin(yf_cg.index)]
-                if len(dts_missing_from_cache) > 0:
-                    if not quiet:
-                        print("WARNING: Capital gains missing from cached {istr}:")
-                        print("- ", dts_missing_from_cache.date())
-                    for dt in dts_missing_from_cache:
-                        f_diff_all.loc[dt] = True
-                if len(dts_missing_from_yf) > 0 and not quiet:
-                    print("ERROR: Cached {istr} contains capital gains missing from Yahoo:")
-                    print([d.date() for d in dts_missing_from_yf])
-                    for dt in dts_missing_from_yf:
-                        f_diff_all.loc[dt] = True
-                    if 'Capital Gains' not in errors_str:
-                        errors_str += ';Capital Gains'
-                    if exit_first_error:
-                        f_diff_all = f_diff_all.rename(errors_str)
-                        return f_diff_all
-                # - now compare values
-                h_cg = h_cg[h_cg.index.isin(yf_cg.index)]
-                yf_cg = yf_cg[yf_cg.index.isin(h_cg.index)]
-                if not yf_cg.empty:
-                    f_close = pd.Series(np.isclose(h_cg[c].to_numpy(), yf_cg.to_numpy(), rtol=rtol), yf_cg.index)
-                    f_diff = ~f_close
-                    if f_diff.any():
-                        n_diff = np.sum(f_diff)
-                        if not quiet:
-                            print(f"WARNING: {istr}: {n_diff}/{n} differences in column {c}")
-                        df_diffs = h_cg.join(yf_cg[f_diff], lsuffix="_cache", rsuffix="_yf")
-                        df_diffs.index = df_diffs.index.tz_convert(h_cg.index.tz)
-                        if interday:
-                            df_diffs.index = df_diffs.index.tz_convert(df_yf.index.tz).date
-                        df_diffs["error"] = df_diffs[c+"_cache"] - df_diffs[c+"_yf"]
-                        df_diffs["error %"] = (df_diffs["error"]*100 / df_diffs[c+"_yf"]).round(2).astype(str) + '%'
-                        if not quiet:
-                            print(df_diffs)
-                        f_diff_all = f_diff_all | f_diff
-                        if 'Capital Gains' not in errors_str:
-                            errors_str += ';Capital Gains'
+                    return _result()
+        else:
+            if f_missing_from_cache.any():
+                if not quiet:
+                    print(f"WARNING: Capital gains missing from cached {istr}:")
+                    print("- ", idx_yf[f_missing_from_cache].date)
+                f_diff_all[pos[f_missing_from_cache]] = True
+            if f_missing_from_yf.any():
+                if not quiet:
+                    print(f"ERROR: Cached {istr} contains capital gains missing from Yahoo:")
+                    print(list(idx[f_missing_from_yf].date))
+                f_diff_all[pos[f_missing_from_yf]] = True
+                if 'Capital Gains' not in errors_str:
+                    errors_str += ';Capital Gains'
+                if exit_first_error:
+                    return _result()
+            # - now compare values
+            if f_diff.any():
+                n_diff = np.sum(f_diff)
+                if not quiet:
+                    print(f"WARNING: {istr}: {n_diff}/{n} differences in column {c}")
+                    h_al, df_yf_al = _aligned()
+                    df_diffs = h_al.loc[f_diff, [c, "FetchDate"]].join(df_yf_al.loc[f_diff, c], lsuffix="_cache", rsuffix="_yf")
+                    if interday:
+                        df_diffs.index = df_diffs.index.tz_convert(df_yf.index.tz).date
+                    df_diffs["error"] = df_diffs[c+"_cache"] - df_diffs[c+"_yf"]
+                    df_diffs["error %"] = (df_diffs["error"]*100 / df_diffs[c+"_yf"]).round(2).astype(str) + '%'
+                    print(df_diffs)
+                f_diff_all[pos[f_diff]] = True
+                if 'Capital Gains' not in errors_str:
+                    errors_str += ';Capital Gains'
 
     def _print_sig_diffs(df, df_yf, column, rtol):
         c = column
@@ -652,117 +713,79 @@ def VerifyPricesDf(h, df_yf, interval, rtol=0.0001, vol_rtol=0.005, exit_first_e
             print(df_diffs)
             return True
 
+
     # Verify volumes match
     c = "Volume"
-    f_close = np.isclose(h[c].to_numpy(), df_yf[c].to_numpy(), vol_rtol)
-    f_close = pd.Series(f_close, h.index)
-    f_diff_vol = ~f_close
-    if f_diff_vol.any():
-        # Use looser tolerance if different 'Repaired?' states
-        f_repair_mismatch = np.logical_or(h["Repaired?"].to_numpy(), df_yf["Repaired?"].to_numpy())
-        if f_repair_mismatch.any():
-            loose_tol = 1.0
-            f_diff_vol[f_repair_mismatch] = ~np.isclose(h[c].to_numpy()[f_repair_mismatch], df_yf[c].to_numpy()[f_repair_mismatch], rtol=loose_tol)
-    f_yfZeroVol = df_yf[c].to_numpy() == 0
-    if f_yfZeroVol.any():
-        # Ignore differences where YF volume = 0, because what has happened
-        # is cached data contains repair but now too old for YF to repair
-        f_diff_vol[f_yfZeroVol] = False
-        if debug:
-            msg = f"ignoring {np.sum(f_yfZeroVol)} diffs where YF volume = 0"
-            print("- " + msg)
+    f_diff_vol = masks[c]
+    if debug and masks["YF zero volume"].any():
+        msg = f"ignoring {np.sum(masks['YF zero volume'])} diffs where YF volume = 0"
+        print("- " + msg)
     if f_diff_vol.any():
         if debug:
-            _print_sig_diffs(h, df_yf, "Volume", vol_rtol)
+            _print_sig_diffs(*_aligned(), "Volume", vol_rtol)
         elif not quiet:
             msg = f"WARNING: {istr}: {np.sum(f_diff_vol)}/{n} differences in 'Volume'"
             # If very few date(times), append to string
             if not interday and np.sum(f_diff_vol) == 1:
-                msg += f" @ {h.index[f_diff_vol]}"
+                msg += f" @ {idx[f_diff_vol]}"
             elif interday and np.sum(f_diff_vol) < 2:
-                msg += f" @ {h.index.date[f_diff_vol]}"
+                msg += f" @ {idx.date[f_diff_vol]}"
             print(msg)
-        f_diff_all = f_diff_all | f_diff_vol
+        f_diff_all[pos[f_diff_vol]] = True
         if 'Volume' not in errors_str:
             errors_str += ';Volume'
 
-    f_diff_prices = pd.Series(np.full(h.shape[0], False), h.index)
+    f_diff_prices = np.full(n, False)
     for c in ["Open", "Close", "High", "Low"]:
-        f_close = np.isclose(h[c].to_numpy(), df_yf[c].to_numpy(), rtol=rtol)
-        f_close = pd.Series(f_close, h.index)
-        f_diff_c = ~f_close
-        if f_diff_c.any():
-            # Use looser tolerance if different 'Repaired?' states
-            f_repair_mismatch = np.logical_xor(h["Repaired?"].to_numpy(), df_yf["Repaired?"].to_numpy())
-            if f_repair_mismatch.any():
-                loose_tol = 0.1
-                f_diff_c[f_repair_mismatch] = ~np.isclose(h[c].to_numpy()[f_repair_mismatch], df_yf[c].to_numpy()[f_repair_mismatch], rtol=loose_tol)
+        f_diff_c = masks[c]
         if f_diff_c.any():
             if debug:
-                _print_sig_diffs(h, df_yf, c, rtol)
+                _print_sig_diffs(*_aligned(), c, rtol)
             elif not quiet:
                 msg = f"WARNING: {istr}: {np.sum(f_diff_c)}/{n} differences in '{c}'"
                 # If very few date(times), append to string
                 if not interday and np.sum(f_diff_c) == 1:
-                    msg += f" @ {h.index[f_diff_c]}"
+                    msg += f" @ {idx[f_diff_c]}"
                 elif interday and np.sum(f_diff_c) < 2:
-                    msg += f" @ {h.index.date[f_diff_c]}"
+                    msg += f" @ {idx.date[f_diff_c]}"
                 print(msg)
-            f_diff_prices = f_diff_prices | f_diff_c
+            f_diff_prices |= f_diff_c
     prices_bad = f_diff_prices.any()
     if prices_bad:
-        f_diff_all = f_diff_all | f_diff_prices
+        f_diff_all[pos[f_diff_prices]] = True
         errors_str += ';Prices'
 
     if not divs_bad and not splits_bad and not prices_bad:
-        f_diff_divs = pd.Series(np.full(h.shape[0], False), h.index)
+        f_diff_divs = np.full(n, False)
         if interday:
-            # Yahoo div-adjusts interday data, so check my div adjustment
-            # Use looser tolerance if different 'Repaired?' states
-            f_repair_mismatch = np.logical_xor(h_adj["Repaired?"].to_numpy(), df_yf_adj["Repaired?"].to_numpy())
-            for c in ["Open", "Close", "High", "Low"]:
-                c = "Adj "+c
-                f_close = np.isclose(h_adj[c].to_numpy(), df_yf_adj[c].to_numpy(), rtol=rtol)
-                f_close = pd.Series(f_close, h.index)
-                if f_repair_mismatch.any():
-                    loose_tol = 0.1
-                    f_close2 = np.isclose(h_adj[c].to_numpy()[f_repair_mismatch], df_yf_adj[c].to_numpy()[f_repair_mismatch], rtol=loose_tol)
-                    f_close[f_repair_mismatch] = f_close2
-                f_diff_c = (~f_close) & (~f_diff_all)
-                f_diff_divs = f_diff_divs | f_diff_c
-        f_diff_divs = f_diff_divs & ~f_diff_all
+            f_diff_divs = masks["Adj Open"] | masks["Adj Close"] | masks["Adj High"] | masks["Adj Low"]
+        f_diff_divs &= ~f_diff_all[pos]
         if f_diff_divs.any():
             if debug:
                 print("Bad div-adjustments detected:")
                 if not f_diff_all.any():
                     print("- no other differences")
+                h_adj, df_yf_adj = _AdjPricesDfs(*_aligned(), interval)
                 for c in ['Close', 'Open', 'High', 'Low']:
                     if _print_sig_diffs(h_adj, df_yf_adj, "Adj "+c, rtol):
                         break
             elif not quiet:
-                print(f"{np.sum(f_diff_divs)}/{h.shape[0]} div-adjustment errors")
+                print(f"{np.sum(f_diff_divs)}/{n} div-adjustment errors")
 
-        if f_diff_divs.any():
             only_div_errors = not f_diff_all.any()
             if only_div_errors and interval == yfcd.Interval.Week:
                 # ignore the div diffs IFF they are limited to ex-div intervals, 
                 # and intervals are multiday. This is because yfinance now handles
                 # them correctly, but YFC doesn't.
-                subset = True
-                div_dts = df_yf_adj.index[df_yf_adj['Dividends']!=0]
-                for dt in f_diff_divs.index[f_diff_divs]:
-                    if dt not in div_dts:
-                        subset = False
-                        break
-                if subset:
+                f_yf_div = df_yf['Dividends'].to_numpy()[pos_yf] != 0
+                if not (f_diff_divs & ~f_yf_div).any():
                     f_diff_divs = None
             if f_diff_divs is not None:
-                f_diff_all = f_diff_all | f_diff_divs
+                f_diff_all[pos[f_diff_divs]] = True
                 if 'Dividends' not in errors_str:
                     errors_str += ';Dividends'
 
-    f_diff_all = f_diff_all.rename(errors_str)
-    return f_diff_all
+    return _result()
 
 
 def np_isin_optimised(a, b, invert=False):
@@ -818,3 +841,24 @@ def display_progress_bar(completed, total):
     bar = "*" * completed_length + " " * (bar_length - completed_length)
     # print(f"\rProgress: |{bar}| {percentage:.0f}% Completed", end='', flush=True)
     print(f"\r[{bar}]  {completed} of {total} completed", end='', flush=True)
+
+
+# Within CacheOnly(), any fetch from Yahoo raises CacheMissException.
+# Lets caller cheaply test if a request can be served from cache.
+_cache_only = threading.local()
+
+@contextmanager
+def CacheOnly():
+    prev = getattr(_cache_only, "enabled", False)
+    _cache_only.enabled = True
+    try:
+        yield
+    finally:
+        _cache_only.enabled = prev
+
+def IsCacheOnly():
+    return getattr(_cache_only, "enabled", False)
+
+def CheckFetchAllowed(ticker, what):
+    if IsCacheOnly():
+        raise yfcd.CacheMissException(ticker, what)